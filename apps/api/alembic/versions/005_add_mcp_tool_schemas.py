@@ -0,0 +1,42 @@
+"""add mcp_tool_schemas table
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create mcp_tool_schemas table (full inputSchema for expandSchema)
+    op.create_table(
+        'mcp_tool_schemas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tool_name', sa.String(length=255), nullable=False),
+        sa.Column('schema_hash', sa.String(length=64), nullable=False),
+        sa.Column('server_name', sa.String(length=255), nullable=True),
+        sa.Column('input_schema', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tool_name', 'schema_hash', name='uq_mcp_tool_schemas_tool_name_schema_hash')
+    )
+    op.create_index(op.f('ix_mcp_tool_schemas_id'), 'mcp_tool_schemas', ['id'], unique=False)
+    op.create_index(op.f('ix_mcp_tool_schemas_tool_name'), 'mcp_tool_schemas', ['tool_name'], unique=False)
+    op.create_index('ix_mcp_tool_schemas_updated_at', 'mcp_tool_schemas', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mcp_tool_schemas_updated_at', table_name='mcp_tool_schemas')
+    op.drop_index(op.f('ix_mcp_tool_schemas_tool_name'), table_name='mcp_tool_schemas')
+    op.drop_index(op.f('ix_mcp_tool_schemas_id'), table_name='mcp_tool_schemas')
+    op.drop_table('mcp_tool_schemas')
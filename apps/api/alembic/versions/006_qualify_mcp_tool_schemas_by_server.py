@@ -0,0 +1,52 @@
+"""qualify mcp_tool_schemas by server
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Same tool name on different servers = different schemas ("" = server unknown)
+    op.execute("UPDATE mcp_tool_schemas SET server_name = '' WHERE server_name IS NULL")
+    op.alter_column(
+        'mcp_tool_schemas', 'server_name',
+        existing_type=sa.String(length=255), nullable=False, server_default=''
+    )
+    op.drop_constraint('uq_mcp_tool_schemas_tool_name_schema_hash', 'mcp_tool_schemas', type_='unique')
+    op.create_unique_constraint(
+        'uq_mcp_tool_schemas_server_name_tool_name_schema_hash',
+        'mcp_tool_schemas',
+        ['server_name', 'tool_name', 'schema_hash']
+    )
+    op.create_index(op.f('ix_mcp_tool_schemas_server_name'), 'mcp_tool_schemas', ['server_name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_mcp_tool_schemas_server_name'), table_name='mcp_tool_schemas')
+    op.drop_constraint('uq_mcp_tool_schemas_server_name_tool_name_schema_hash', 'mcp_tool_schemas', type_='unique')
+    # 同名・同一スキーマのサーバー違いの行は1行に集約
+    op.execute(
+        "DELETE FROM mcp_tool_schemas a USING mcp_tool_schemas b "
+        "WHERE a.tool_name = b.tool_name AND a.schema_hash = b.schema_hash AND a.id < b.id"
+    )
+    op.create_unique_constraint(
+        'uq_mcp_tool_schemas_tool_name_schema_hash',
+        'mcp_tool_schemas',
+        ['tool_name', 'schema_hash']
+    )
+    op.alter_column(
+        'mcp_tool_schemas', 'server_name',
+        existing_type=sa.String(length=255), nullable=True, server_default=None
+    )
+    op.execute("UPDATE mcp_tool_schemas SET server_name = NULL WHERE server_name = ''")
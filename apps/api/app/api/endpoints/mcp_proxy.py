@@ -6,153 +6,301 @@ Claude Code → FastAPI (/mcp/sse) → Docker MCP Gateway (http://mcp-gateway:90
 
 from fastapi import APIRouter, Request, Response
 from fastapi.responses import StreamingResponse
-from typing import Any, Dict, Optional
-import httpx
-import json
+from starlette.background import BackgroundTask, BackgroundTasks
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
 import asyncio
-from ...core.schema_partitioning import schema_partitioner
+import logging
+import time
+import uuid
+import httpx
+from ...core import metrics
+from ...core.catalog_cache import catalog_cache
+from ...core.schema_partitioning import schema_partitioner, tool_server_name
 from ...core.config import settings
+from ...core.json_codec import JSONDecodeError, codec
 from ...core.protocol_logger import protocol_logger
+from ...core.request_coalescing import request_coalescer, tool_call_key
+from ...core.result_cache import result_cache
+from ...core.schema_store import schema_store
+from ...core.schema_usage import schema_usage
+from ...core.shared_schema_cache import shared_schema_cache
+from ...core.sse import SSEChunkCoalescer, SSEEventFramer, event_data, replace_event_data
+from ...core.token_accounting import token_accountant
+from ...core.tracing import SPAN_KIND_CLIENT, SPAN_KIND_SERVER, tracer
+from ...core.upstream_client import upstream_pool
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# tools/list に追加するローカル処理ツール（定義は不変のため1度だけ構築）
+EXPAND_SCHEMA_TOOL = {
+    "name": "expandSchema",
+    "description": "Get detailed schema for specific tool parameters. Use this when you need to know the structure of nested properties.",
+    "inputSchema": {
+        "type": "object",
+        "properties": {
+            "toolName": {
+                "type": "string",
+                "description": "Name of the tool whose schema you want to expand"
+            },
+            "path": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Path to the property to expand (e.g., ['metadata', 'shipping']). Omit for full schema."
+            },
+            "serverName": {
+                "type": "string",
+                "description": "Server providing the tool. Only needed when several servers expose a tool with this name."
+            }
+        },
+        "required": ["toolName"]
+    }
+}
+
+# initialize レスポンス直後にクライアントへ送る通知（不変のため1度だけシリアライズ）
+INITIALIZED_NOTIFICATION_EVENT = (
+    b"data: " + codec.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}) + b"\n\n"
+)
+
+# 書き換え・ログ対象になり得るフレームのマーカー（JSON文字列リテラルとして出現）
+INTERCEPT_MARKERS = (b'"initialize"', b'"tools/list"')
+
+# これより大きい tools/call ペイロードはイベントループ外でトークン計測
+TOKEN_COUNT_OFFLOAD_BYTES = 64 * 1024
+
+# 転送しないヘッダー（hop-by-hop、および再チャンク化で無効になる content-length）
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "content-length",
+})
+
+
+def frame_needs_decode(data: bytes, awaiting_initialize_response: bool) -> bool:
+    """
+    SSE dataフレームをフルデコードする必要があるか判定（プレフィックススキャン）
+
+    initialize / tools/list 以外のフレーム（大半はtools/call結果）は
+    デコード・再シリアライズせずに元のバイト列のまま転送する。
+    誤検知はフルデコードされるだけなので安全側に倒れる。
+
+    Args:
+        data: イベントのdataペイロード
+        awaiting_initialize_response: initialize レスポンス待ちかどうか
+
+    Returns:
+        フルデコードが必要な場合True
+    """
+    for marker in INTERCEPT_MARKERS:
+        if marker in data:
+            return True
+
+    # initialize レスポンスは method を持たないため、待機中は result を含むフレームを検査
+    return awaiting_initialize_response and b'"result"' in data
+
+
+def endpoint_session_id(event: bytes, data: bytes) -> Optional[str]:
+    """
+    SSE endpoint イベント（data: /messages?sessionId=...）からセッションIDを取得
+
+    Args:
+        event: イベント全体
+        data: イベントのdataペイロード
+
+    Returns:
+        セッションID、endpoint イベントでなければ None
+    """
+    if b"sessionId=" not in data or not event.startswith(b"event: endpoint"):
+        return None
+
+    query = parse_qs(urlsplit(data.decode(errors="replace").strip()).query)
+    values = query.get("sessionId")
+    return values[0] if values else None
+
+
+def request_session_id(request: Request) -> Optional[str]:
+    """
+    POST リクエストのセッションID（?sessionId= または Mcp-Session-Id ヘッダー）
+    """
+    return request.query_params.get("sessionId") or request.headers.get("mcp-session-id")
+
 
 async def proxy_sse_stream(request: Request):
     """
     SSEストリームをDocker MCP GatewayからProxyしてschema partitioning適用
 
+    上流の生バイト列をイベント単位に組み立て、書き換え不要なイベントは
+    そのまま、同一readで完成したイベントはまとめて1回で送出する。
+
     Args:
         request: FastAPI Request
 
     Yields:
-        Server-Sent Events
+        Server-Sent Events (bytes)
     """
     initialize_request_id = None  # initialize リクエストIDを追跡
+    # トークン集計用（endpoint イベントで上流のセッションIDが分かれば置き換える）
+    session_id = str(uuid.uuid4())
+    framer = SSEEventFramer()
+    coalescer = SSEChunkCoalescer(settings.SSE_BATCH_MAX_BYTES)
 
-    async with httpx.AsyncClient(timeout=None) as client:
-        async with client.stream(
+    async with upstream_pool.route("sse"):
+        async with upstream_pool.client.stream(
             "GET",
-            f"{settings.MCP_GATEWAY_URL}/sse",
+            "/sse",
             headers=dict(request.headers),
+            timeout=None,
+            extensions=upstream_pool.extensions,
         ) as response:
-            async for line in response.aiter_lines():
-                if not line:
-                    yield "\n"
-                    continue
-
-                # SSE形式: "data: {...}\n\n"
-                if line.startswith("data: "):
-                    data_str = line[6:]  # "data: " を除去
-
-                    try:
-                        data = json.loads(data_str)
-
-                        # initialize リクエストを検出
-                        if isinstance(data, dict) and data.get("method") == "initialize":
-                            initialize_request_id = data.get("id")
-                            print(f"[MCP Proxy] Detected initialize request (id={initialize_request_id})")
-                            # Log initialize request
-                            await protocol_logger.log_message("client→server", data, {"phase": "initialize"})
-
-                        # tools/list レスポンスをインターセプト
-                        if isinstance(data, dict) and data.get("method") == "tools/list":
-                            # Log tools/list request
-                            await protocol_logger.log_message("client→server", data, {"phase": "tools_list"})
-                            data = await apply_schema_partitioning(data)
-                            # Log tools/list response (after partitioning)
-                            await protocol_logger.log_message("server→client", data, {"phase": "tools_list"})
-
-                        # 変換後のデータを返す
-                        yield f"data: {json.dumps(data)}\n\n"
-
-                        # initialize responseを検出したら initialized notification を送信
-                        if (isinstance(data, dict) and
-                            "result" in data and
-                            initialize_request_id is not None and
-                            data.get("id") == initialize_request_id):
-
-                            print(f"[MCP Proxy] Detected initialize response, sending initialized notification")
-                            # Log initialize response
-                            await protocol_logger.log_message("server→client", data, {"phase": "initialize"})
-
-                            # initialized notification を送信
-                            initialized_notification = {
-                                "jsonrpc": "2.0",
-                                "method": "notifications/initialized"
-                            }
-                            yield f"data: {json.dumps(initialized_notification)}\n\n"
-
-                            # リクエストIDをリセット
-                            initialize_request_id = None
-
-                    except json.JSONDecodeError:
-                        # JSONでない場合はそのまま
-                        yield f"{line}\n"
-                else:
-                    yield f"{line}\n"
+            # Content-Encodingがある場合のみデコード済みバイト列を使う
+            if "content-encoding" in response.headers:
+                chunks = response.aiter_bytes()
+            else:
+                chunks = response.aiter_raw()
+
+            async for chunk in chunks:
+                for event in framer.feed(chunk):
+                    outgoing = [event]
+                    data_bytes = event_data(event)
+
+                    if data_bytes is not None:
+                        session_id = endpoint_session_id(event, data_bytes) or session_id
+
+                    # 書き換え候補のイベントのみフルデコード（それ以外は元のバイト列のまま転送）
+                    if data_bytes is not None and frame_needs_decode(
+                        data_bytes, initialize_request_id is not None
+                    ):
+                        try:
+                            data = codec.loads(data_bytes)
+                        except JSONDecodeError:
+                            # JSONでない場合はそのまま
+                            data = None
+
+                        if data is not None:
+                            # initialize リクエストを検出
+                            if isinstance(data, dict) and data.get("method") == "initialize":
+                                initialize_request_id = data.get("id")
+                                print(f"[MCP Proxy] Detected initialize request (id={initialize_request_id})")
+                                # Log initialize request
+                                await protocol_logger.log_message("client→server", data, {"phase": "initialize", "session_id": session_id})
+
+                            # tools/list レスポンスをインターセプト
+                            if isinstance(data, dict) and data.get("method") == "tools/list":
+                                # Log tools/list request
+                                await protocol_logger.log_message("client→server", data, {"phase": "tools_list", "session_id": session_id})
+                                data = await apply_schema_partitioning(data, session_id)
+                                # Log tools/list response (after partitioning)
+                                await protocol_logger.log_message("server→client", data, {"phase": "tools_list", "session_id": session_id})
+
+                            # 変換後のデータを返す
+                            outgoing = [replace_event_data(event, codec.dumps(data))]
+
+                            # initialize responseを検出したら initialized notification を送信
+                            if (isinstance(data, dict) and
+                                "result" in data and
+                                initialize_request_id is not None and
+                                data.get("id") == initialize_request_id):
+
+                                print(f"[MCP Proxy] Detected initialize response, sending initialized notification")
+                                # Log initialize response
+                                await protocol_logger.log_message("server→client", data, {"phase": "initialize", "session_id": session_id})
 
+                                # initialized notification を送信
+                                outgoing.append(INITIALIZED_NOTIFICATION_EVENT)
 
-async def apply_schema_partitioning(data: Dict[str, Any]) -> Dict[str, Any]:
+                                # リクエストIDをリセット
+                                initialize_request_id = None
+
+                    for out in outgoing:
+                        ready = coalescer.push(out)
+                        if ready:
+                            yield ready
+
+                # 1回のreadで完成したイベントをまとめて送出
+                pending = coalescer.drain()
+                if pending:
+                    yield pending
+
+            # 終端の不完全なイベントもそのまま転送
+            tail = framer.flush()
+            if tail:
+                yield tail
+
+
+async def apply_schema_partitioning(
+    data: Dict[str, Any],
+    session_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     tools/list レスポンスにschema partitioning適用
 
     Args:
         data: tools/list JSON-RPC 2.0 レスポンス
+        session_id: トークン集計用のセッションID
 
     Returns:
-        Schema partitioningされたレスポンス
+        Schema partitioningされたレスポンス（新しいdict、入力は変更しない）
     """
     if "result" not in data or "tools" not in data["result"]:
         return data
 
-    tools = data["result"]["tools"]
-    partitioned_tools = []
+    # 分割済みカタログを再利用し、変更されたツールのみ再分割
+    started = time.perf_counter()
+    with tracer.span("schema.partition", tools=len(data["result"]["tools"])):
+        partitioned_tools, estimates = catalog_cache.partition_tools_with_estimates(
+            data["result"]["tools"]
+        )
+    metrics.schema_partition_seconds.observe(time.perf_counter() - started)
 
-    for tool in tools:
-        tool_name = tool.get("name", "")
-        input_schema = tool.get("inputSchema", {})
+    # expandSchema ツールを追加
+    partitioned_tools.append(EXPAND_SCHEMA_TOOL)
 
-        # フルスキーマを保存（expandSchema用）
-        if input_schema:
-            schema_partitioner.store_full_schema(tool_name, input_schema)
+    # 冪等アノテーション付きツールを single-flight の対象として記録
+    request_coalescer.learn_tools(data["result"]["tools"])
 
-        # スキーマを分割
-        partitioned_schema = schema_partitioner.partition_schema(input_schema)
+    # フルスキーマを永続化（再起動後・他ワーカーの expandSchema 用、バックグラウンド）
+    schema_store.persist_tools(data["result"]["tools"])
 
-        # トークン削減効果をログ出力
-        reduction = schema_partitioner.get_token_reduction_estimate(input_schema)
-        print(f"[Schema Partitioning] {tool_name}: {reduction['full']} → {reduction['partitioned']} tokens ({reduction['reduction']}% reduction)")
+    if settings.TOKEN_ACCOUNTING_ENABLED:
+        record_tools_list_tokens(partitioned_tools, estimates, session_id)
 
-        partitioned_tool = {
-            **tool,
-            "inputSchema": partitioned_schema
-        }
-        partitioned_tools.append(partitioned_tool)
+    # 元のメッセージは変更しない（ログ済みメッセージは後で書き込まれるため）
+    return {**data, "result": {**data["result"], "tools": partitioned_tools}}
 
-    # expandSchema ツールを追加
-    expand_schema_tool = {
-        "name": "expandSchema",
-        "description": "Get detailed schema for specific tool parameters. Use this when you need to know the structure of nested properties.",
-        "inputSchema": {
-            "type": "object",
-            "properties": {
-                "toolName": {
-                    "type": "string",
-                    "description": "Name of the tool whose schema you want to expand"
-                },
-                "path": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Path to the property to expand (e.g., ['metadata', 'shipping']). Omit for full schema."
-                }
-            },
-            "required": ["toolName"]
-        }
-    }
-    partitioned_tools.append(expand_schema_tool)
 
-    data["result"]["tools"] = partitioned_tools
-    return data
+def record_tools_list_tokens(
+    partitioned_tools: List[Dict[str, Any]],
+    estimates: List[Dict[str, int]],
+    session_id: Optional[str]
+) -> None:
+    """
+    クライアントに送る tools/list のトークン数をツール単位で集計
+
+    分割済みツールのトークン数はカタログキャッシュの推定値（"tool"）を再利用し、
+    推定値のないツール（expandSchema）のみ計測する（結果はメモ化）。
+    """
+    for index, tool in enumerate(partitioned_tools):
+        if index < len(estimates):
+            tokens = estimates[index]["tool"]
+        else:
+            tokens = token_accountant.count_json(tool)
+        token_accountant.record(
+            "tools_list",
+            tokens,
+            tool_name=tool.get("name"),
+            server_name=tool_server_name(tool),
+            session_id=session_id,
+        )
 
 
 @router.get("/sse")
@@ -163,8 +311,12 @@ async def mcp_sse_proxy(request: Request):
     Claude Code connects here:
     "url": "http://localhost:8001/mcp/sse"
     """
+    stream = proxy_sse_stream(request)
+    if metrics.registry.enabled:
+        stream = instrument_sse_stream(stream)
+
     return StreamingResponse(
-        proxy_sse_stream(request),
+        stream,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -174,6 +326,27 @@ async def mcp_sse_proxy(request: Request):
     )
 
 
+async def instrument_sse_stream(stream):
+    """
+    SSEストリームの計測（TTFB・送信バイト数・接続数）
+
+    METRICS_ENABLED の時のみ挟む（無効時はオーバーヘッドなし）
+    """
+    started = time.perf_counter()
+    first_chunk = True
+    metrics.sse_active_connections.inc()
+    try:
+        async for chunk in stream:
+            if first_chunk:
+                metrics.sse_ttfb_seconds.observe(time.perf_counter() - started)
+                first_chunk = False
+            metrics.sse_bytes_streamed_total.inc(amount=len(chunk))
+            yield chunk
+    finally:
+        metrics.sse_active_connections.dec()
+        await stream.aclose()
+
+
 @router.post("/")
 async def mcp_jsonrpc_proxy(request: Request):
     """
@@ -185,39 +358,662 @@ async def mcp_jsonrpc_proxy(request: Request):
     Returns:
         JSON-RPC 2.0 レスポンス
     """
-    body = await request.body()
-    rpc_request = json.loads(body)
+    span = tracer.start_span(
+        "mcp.jsonrpc",
+        kind=SPAN_KIND_SERVER,
+        traceparent=request.headers.get("traceparent"),
+    )
+    # ストリーミングレスポンスの場合、span は本文の転送完了時に終了する
+    with tracer.activate(span, end_on_exit=False):
+        response = await proxy_jsonrpc_request(request, span)
+    if not isinstance(response, StreamingResponse):
+        span.end()
+    return response
 
-    # expandSchema ツールコール処理
-    if rpc_request.get("method") == "tools/call":
-        params = rpc_request.get("params", {})
-        tool_name = params.get("name", "")
 
-        if tool_name == "expandSchema":
-            # expandSchema は Gateway にproxyしない（ローカル処理）
-            return await handle_expand_schema(rpc_request)
+async def proxy_jsonrpc_request(request: Request, span) -> Response:
+    """
+    JSON-RPC リクエストの処理本体（各ステージを span の子スパンとして記録）
+    """
+    with tracer.span("proxy.parse_body") as parse_span:
+        body = await request.body()
+        try:
+            rpc_request = codec.loads(body)
+        except (JSONDecodeError, UnicodeDecodeError) as e:
+            parse_span.set_error(f"{type(e).__name__}: {e}")
+            return jsonrpc_json_response(jsonrpc_error(None, -32700, "Parse error"))
+    session_id = request_session_id(request)
 
-    # その他のツールコールはGatewayにproxy
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            f"{settings.MCP_GATEWAY_URL}/",
-            content=body,
-            headers={"Content-Type": "application/json"}
-        )
+    if isinstance(rpc_request, list):
+        return await proxy_jsonrpc_batch(request, rpc_request, session_id, span)
+    if not isinstance(rpc_request, dict):
+        return jsonrpc_json_response(jsonrpc_error(None, -32600, "Invalid Request"))
 
+    span.set_attribute("rpc.method", rpc_request.get("method"))
+    tool_name = called_tool_name(rpc_request)
+    if tool_name is not None:
+        span.set_attribute("mcp.tool", tool_name)
+        span.set_attribute("mcp.server", token_accountant.tool_servers.get(tool_name))
+
+    # expandSchema は Gateway にproxyしない（ローカル処理）
+    if tool_name == "expandSchema":
+        return await run_expand_schema(rpc_request, session_id)
+
+    # キャッシュ対象・合流対象のツールは本文を共有するためバッファして返す
+    if uses_shared_result(rpc_request):
+        response_body, cache_status = await resolve_jsonrpc_message(request, rpc_request, span)
         return Response(
-            content=response.content,
-            status_code=response.status_code,
-            headers=dict(response.headers)
+            content=response_body,
+            media_type="application/json",
+            headers={"X-MCP-Cache": cache_status} if cache_status else None,
+            background=tools_call_token_task(tool_name, body, response_body, session_id),
+        )
+
+    # その他のツールコールはGatewayにproxy（共有コネクションプール経由）
+    # 本文はメモリに溜めずにクライアントへストリーミングする。
+    # コネクションとルートの枠は本文の転送が終わるまで保持する。
+    upstream = AsyncExitStack()
+    try:
+        with tracer.span("upstream.call", kind=SPAN_KIND_CLIENT) as upstream_span:
+            await upstream.enter_async_context(upstream_pool.route("rpc"))
+            started = time.perf_counter()
+            response = await upstream.enter_async_context(
+                upstream_pool.client.stream(
+                    "POST",
+                    "/",
+                    content=body,
+                    headers=upstream_headers(request, upstream_span),
+                    extensions=upstream_pool.extensions,
+                )
+            )
+            metrics.tools_call_upstream_seconds.observe(time.perf_counter() - started)
+            upstream_span.set_attribute("http.status_code", response.status_code)
+    except BaseException:
+        await upstream.aclose()
+        raise
+
+    # Content-Encodingがある場合のみデコード済みバイト列を使う（ヘッダーも外す）
+    decoded = "content-encoding" in response.headers
+    chunks = response.aiter_bytes() if decoded else response.aiter_raw()
+
+    # tools/call のトークン数はレスポンス送信後に集計
+    capture = None
+    background = None
+    if tool_name and settings.TOKEN_ACCOUNTING_ENABLED:
+        capture = ResponseBodyCapture(settings.TOKEN_ACCOUNTING_CAPTURE_BYTES)
+        background = BackgroundTask(
+            record_tools_call_tokens, tool_name, body, capture, session_id
         )
 
+    # 転送区間のスパン（本文の転送はハンドラ終了後に行われるため、ここで開始しておく）
+    response_span = tracer.start_span("proxy.response")
+    streaming_response = RelayedStreamingResponse(
+        relay_upstream_body(chunks, upstream, capture, response_span, span),
+        upstream,
+        (response_span, span),
+        status_code=response.status_code,
+        background=background,
+    )
+    streaming_response.raw_headers.extend(
+        filter_response_headers(response.headers.raw, drop_encoding=decoded)
+    )
+    return streaming_response
+
+
+def called_tool_name(rpc_request: Dict[str, Any]) -> Optional[str]:
+    """
+    tools/call の呼び出し対象ツール名（tools/call 以外は None）
+    """
+    if rpc_request.get("method") != "tools/call":
+        return None
+    params = rpc_request.get("params")
+    return params.get("name", "") if isinstance(params, dict) else ""
+
+
+def jsonrpc_error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    """
+    JSON-RPC 2.0 エラーレスポンス
+    """
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+async def run_expand_schema(rpc_request: Dict[str, Any], session_id: Optional[str]) -> Response:
+    """
+    expandSchema をローカル処理（計測・トレース付き）
+    """
+    started = time.perf_counter()
+    with tracer.span("proxy.expand_schema"):
+        response = await handle_expand_schema(rpc_request, session_id)
+    metrics.expand_schema_seconds.observe(time.perf_counter() - started)
+    return response
+
+
+async def proxy_jsonrpc_batch(
+    request: Request,
+    messages: List[Any],
+    session_id: Optional[str],
+    span
+) -> Response:
+    """
+    JSON-RPC バッチ（配列）を処理
+
+    expandSchema はローカルで処理し、それ以外はGatewayへ要素毎に並行転送
+    （MCP_BATCH_UPSTREAM_MODE="batch" なら結果キャッシュ・合流対象以外を1回のバッチとして転送）する。
+    レスポンスは元の順序で組み立て、通知（id なし）には応答しない。
+
+    Args:
+        request: FastAPI Request（トレースヘッダー転送用）
+        messages: デコード済みのバッチ
+        session_id: トークン集計用のセッションID
+        span: mcp.jsonrpc スパン
+
+    Returns:
+        JSON-RPC 2.0 バッチレスポンス（全て通知なら 202 で本文なし）
+    """
+    span.set_attribute("rpc.batch_size", len(messages))
+    if not messages:
+        return jsonrpc_json_response(jsonrpc_error(None, -32600, "Invalid Request"))
+
+    # 要素毎のレスポンス本文（None = 応答なし）
+    results: List[Optional[bytes]] = [None] * len(messages)
+    forwarded: List[int] = []
+    for index, message in enumerate(messages):
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            request_id = message.get("id") if isinstance(message, dict) else None
+            results[index] = codec.dumps(jsonrpc_error(request_id, -32600, "Invalid Request"))
+        elif called_tool_name(message) == "expandSchema":
+            response = await run_expand_schema(message, session_id)
+            if "id" in message:
+                results[index] = response.body
+        else:
+            forwarded.append(index)
+
+    if forwarded:
+        individual = forwarded
+        if settings.MCP_BATCH_UPSTREAM_MODE == "batch":
+            # キャッシュ・合流対象は単発と同じく要素毎に解決し、残りを1回のバッチで送る
+            individual = [index for index in forwarded if uses_shared_result(messages[index])]
+            batched = [index for index in forwarded if not uses_shared_result(messages[index])]
+            if batched:
+                bodies = await forward_jsonrpc_batch(request, [messages[index] for index in batched])
+                if bodies is None:
+                    # 上流がバッチ非対応と明示した（未実行）: 要素毎に転送
+                    individual = forwarded
+                else:
+                    for index, response_body in zip(batched, bodies):
+                        results[index] = response_body
+        bodies = await asyncio.gather(
+            *(forward_jsonrpc_message(request, messages[index]) for index in individual)
+        )
+        for index, response_body in zip(individual, bodies):
+            results[index] = response_body
+
+    # tools/call のトークン数はレスポンス送信後に集計
+    background = BackgroundTasks()
+    for index in forwarded:
+        task = tools_call_token_task(
+            called_tool_name(messages[index]), codec.dumps(messages[index]), results[index], session_id
+        )
+        if task is not None:
+            background.tasks.append(task)
+
+    parts = [result for result in results if result is not None]
+    if not parts:
+        return Response(status_code=202, background=background)
+    return Response(
+        content=b"[" + b",".join(parts) + b"]",
+        media_type="application/json",
+        background=background,
+    )
+
+
+def uses_shared_result(message: Dict[str, Any]) -> bool:
+    """
+    結果キャッシュ・single-flight の対象か（対象なら本文を他の呼び出しと共有する）
+    """
+    tool_name = called_tool_name(message)
+    return "id" in message and (result_cache.applies_to(tool_name) or request_coalescer.applies_to(tool_name))
+
+
+def tools_call_token_task(
+    tool_name: Optional[str],
+    request_body: bytes,
+    response_body: Optional[bytes],
+    session_id: Optional[str]
+) -> Optional[BackgroundTask]:
+    """
+    バッファ済みの tools/call レスポンスのトークン集計タスク（対象外なら None）
+    """
+    if not (tool_name and response_body is not None and settings.TOKEN_ACCOUNTING_ENABLED):
+        return None
+    capture = ResponseBodyCapture(settings.TOKEN_ACCOUNTING_CAPTURE_BYTES)
+    capture.feed(response_body)
+    return BackgroundTask(record_tools_call_tokens, tool_name, request_body, capture, session_id)
+
+
+def with_jsonrpc_id(response_body: bytes, request_id: Any) -> bytes:
+    """
+    共有レスポンスの JSON-RPC id を待機者自身の id に書き換え
+    """
+    message = codec.loads(response_body)
+    if not isinstance(message, dict) or message.get("id") == request_id:
+        return response_body
+    return codec.dumps({**message, "id": request_id})
+
+
+async def resolve_jsonrpc_message(
+    request: Request,
+    message: Dict[str, Any],
+    span=None
+) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    tools/call を結果キャッシュ → single-flight → Gateway の順に解決
+
+    Args:
+        request: FastAPI Request（トレースヘッダー転送用）
+        message: JSON-RPC リクエスト
+        span: キャッシュ・合流の結果を記録するスパン
+
+    Returns:
+        (レスポンス本文, X-MCP-Cache の値 "HIT" | "MISS"、キャッシュ対象外なら None)
+    """
+    tool_name = called_tool_name(message)
+    if "id" not in message or not result_cache.applies_to(tool_name):
+        return await forward_uncached_message(request, message, span), None
+
+    arguments = (message.get("params") or {}).get("arguments")
+    cached = await result_cache.get(tool_name, arguments)
+    if cached is not None:
+        if span is not None:
+            span.set_attribute("mcp.cache", "HIT")
+        return with_jsonrpc_id(cached, message["id"]), "HIT"
+
+    if span is not None:
+        span.set_attribute("mcp.cache", "MISS")
+    response_body = await forward_uncached_message(request, message, span)
+    await result_cache.put(tool_name, arguments, response_body)
+    return response_body, "MISS"
+
+
+async def forward_uncached_message(
+    request: Request,
+    message: Dict[str, Any],
+    span=None
+) -> Optional[bytes]:
+    """
+    冪等ツールは実行中の同一呼び出しに合流、それ以外はそのまま Gateway へ転送
+    """
+    if "id" in message and request_coalescer.applies_to(called_tool_name(message)):
+        response_body, shared = await coalesced_jsonrpc_message(request, message)
+        if span is not None:
+            span.set_attribute("mcp.coalesced", shared)
+        return response_body
+    return await post_jsonrpc_message(request, message)
+
+
+async def coalesced_jsonrpc_message(request: Request, message: Dict[str, Any]) -> Tuple[bytes, bool]:
+    """
+    同一 (tool, arguments) の実行中呼び出しに合流して転送
+
+    Returns:
+        (この呼び出しの id を持つレスポンス本文, 他の呼び出しと共有したか)
+    """
+    tool_name = called_tool_name(message)
+    params = message.get("params") or {}
+    key = tool_call_key(tool_name, params.get("arguments"))
+
+    response_body, shared = await request_coalescer.do(
+        key, lambda: post_jsonrpc_message(request, message)
+    )
+    if shared:
+        metrics.tools_call_coalesced_total.inc()
+        response_body = with_jsonrpc_id(response_body, message["id"])
+    return response_body, shared
+
+
+async def forward_jsonrpc_message(request: Request, message: Dict[str, Any]) -> Optional[bytes]:
+    """
+    バッチの1要素をGatewayへ転送（結果キャッシュ・single-flight を経由）
+    """
+    response_body, _ = await resolve_jsonrpc_message(request, message)
+    return response_body
+
+
+async def post_jsonrpc_message(request: Request, message: Dict[str, Any]) -> Optional[bytes]:
+    """
+    JSON-RPC メッセージ1件をGatewayへPOST（レスポンス本文はバッファする）
+
+    Returns:
+        レスポンス本文（JSONオブジェクト）、通知なら None。
+        上流の失敗は JSON-RPC エラーに変換する（他の要素には影響させない）。
+    """
+    request_id = message.get("id")
+    try:
+        with tracer.span(
+            "upstream.call", kind=SPAN_KIND_CLIENT, **{"mcp.tool": called_tool_name(message)}
+        ) as upstream_span:
+            async with upstream_pool.route("rpc"):
+                started = time.perf_counter()
+                response = await upstream_pool.client.post(
+                    "/",
+                    content=codec.dumps(message),
+                    headers=upstream_headers(request, upstream_span),
+                    extensions=upstream_pool.extensions,
+                )
+                metrics.tools_call_upstream_seconds.observe(time.perf_counter() - started)
+            upstream_span.set_attribute("http.status_code", response.status_code)
+    except httpx.HTTPError as e:
+        if "id" not in message:
+            return None
+        return codec.dumps(jsonrpc_error(request_id, -32603, f"Upstream request failed: {type(e).__name__}"))
+
+    if "id" not in message:
+        return None
+    response_body = response.content.strip()
+    if response.is_success and response_body.startswith(b"{"):
+        return response_body
+    return codec.dumps(jsonrpc_error(request_id, -32603, f"Upstream returned HTTP {response.status_code}"))
+
+
+async def forward_jsonrpc_batch(
+    request: Request,
+    messages: List[Dict[str, Any]]
+) -> Optional[List[Optional[bytes]]]:
+    """
+    バッチの転送対象を1回のバッチリクエストとしてGatewayへ転送
+
+    Returns:
+        messages と同じ順序のレスポンス本文（通知は None）、
+        上流がバッチ非対応と明示した（4xx、または単一の JSON-RPC エラー）場合は None。
+        それ以外の失敗は上流で一部が実行済みの可能性があるため再送させず、
+        全要素を -32603 エラーにする。
+    """
+    error_message = None
+    upstream_results: Any = []
+    try:
+        with tracer.span("upstream.call", kind=SPAN_KIND_CLIENT, **{"rpc.batch_size": len(messages)}) as upstream_span:
+            async with upstream_pool.route("rpc"):
+                started = time.perf_counter()
+                response = await upstream_pool.client.post(
+                    "/",
+                    content=codec.dumps(messages),
+                    headers=upstream_headers(request, upstream_span),
+                    extensions=upstream_pool.extensions,
+                )
+                metrics.tools_call_upstream_seconds.observe(time.perf_counter() - started)
+            upstream_span.set_attribute("http.status_code", response.status_code)
+    except httpx.HTTPError as e:
+        error_message = f"Upstream request failed: {type(e).__name__}"
+    else:
+        try:
+            upstream_results = codec.loads(response.content)
+        except (JSONDecodeError, UnicodeDecodeError):
+            upstream_results = None
+        rejected = isinstance(upstream_results, dict) and "error" in upstream_results
+        if response.is_client_error or (rejected and not response.is_server_error):
+            logger.warning(
+                "Upstream rejected the JSON-RPC batch (HTTP %d), forwarding entries individually",
+                response.status_code,
+            )
+            return None
+        if not (response.is_success and isinstance(upstream_results, list)):
+            upstream_results = []
+            error_message = f"Upstream returned HTTP {response.status_code}"
+
+    # 上流のバッチレスポンスは順不同のため id で対応付ける
+    by_id = {
+        result.get("id"): result
+        for result in upstream_results
+        if isinstance(result, dict) and isinstance(result.get("id"), (str, int))
+    }
+    bodies: List[Optional[bytes]] = []
+    for message in messages:
+        if "id" not in message:
+            bodies.append(None)
+        elif message["id"] in by_id:
+            bodies.append(codec.dumps(by_id[message["id"]]))
+        else:
+            bodies.append(codec.dumps(
+                jsonrpc_error(message["id"], -32603, error_message or "No response from upstream")
+            ))
+    return bodies
+
+
+def filter_response_headers(
+    raw_headers: List[Tuple[bytes, bytes]],
+    drop_encoding: bool = False
+) -> List[Tuple[bytes, bytes]]:
+    """
+    上流レスポンスヘッダーからクライアントに転送するものを選別
+
+    hop-by-hop ヘッダー（Connection で列挙されたものを含む）と content-length を
+    除外する。重複ヘッダー（set-cookie 等）はそのまま残す。
+
+    Args:
+        raw_headers: httpx の Response.headers.raw
+        drop_encoding: 本文をデコードして転送する場合 True（content-encoding も除外）
 
-async def handle_expand_schema(rpc_request: Dict[str, Any]) -> Dict[str, Any]:
+    Returns:
+        ASGI raw headers（小文字名）
+    """
+    excluded = set(HOP_BY_HOP_HEADERS)
+    if drop_encoding:
+        excluded.add("content-encoding")
+    for name, value in raw_headers:
+        if name.lower() == b"connection":
+            excluded.update(
+                token.strip().lower() for token in value.decode("latin-1").split(",")
+            )
+
+    return [
+        (name.lower(), value)
+        for name, value in raw_headers
+        if name.decode("latin-1").lower() not in excluded
+    ]
+
+
+class ResponseBodyCapture:
+    """
+    ストリーミング転送した本文の先頭をトークン集計用に保持（上限まで）
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.total_bytes = 0
+        self._chunks: List[bytes] = []
+        self._kept = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        if self._kept < self.limit:
+            kept = chunk[:self.limit - self._kept]
+            self._chunks.append(kept)
+            self._kept += len(kept)
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(self._chunks)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self._kept
+
+
+class RelayedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always releases the upstream connection
+
+    relay_upstream_body only cleans up once its body is iterated. If the
+    client is gone before that (sending the response start fails), the
+    upstream connection, the rpc route slot and the spans are released here.
+    """
+
+    def __init__(self, content, upstream: AsyncExitStack, spans: Tuple[Any, ...], **kwargs):
+        super().__init__(content, **kwargs)
+        self.upstream = upstream
+        self.spans = spans
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # 未開始・途中のジェネレータを閉じ、上流とルートの枠・スパンを解放（いずれも2回目は何もしない）
+            await self.body_iterator.aclose()
+            await self.upstream.aclose()
+            for span in self.spans:
+                span.end()
+
+
+async def relay_upstream_body(
+    chunks: AsyncIterator[bytes],
+    upstream: AsyncExitStack,
+    capture: Optional[ResponseBodyCapture],
+    response_span,
+    span
+) -> AsyncIterator[bytes]:
+    """
+    上流の本文をチャンク単位でクライアントへ転送
+
+    転送完了（またはクライアント切断）時に上流コネクションとルートの枠を解放し、
+    proxy.response / mcp.jsonrpc スパンを終了する。
+    """
+    sent = 0
+    try:
+        async for chunk in chunks:
+            sent += len(chunk)
+            if capture is not None:
+                capture.feed(chunk)
+            yield chunk
+    finally:
+        await upstream.aclose()
+        metrics.rpc_bytes_relayed_total.inc(amount=sent)
+        response_span.set_attribute("bytes", sent)
+        response_span.end()
+        span.end()
+
+
+def upstream_headers(request: Request, span) -> Dict[str, str]:
+    """
+    Gateway へのJSON-RPCリクエストヘッダー（トレースコンテキストを伝播）
+
+    トレース記録中は upstream.call スパンを親とする traceparent を付与し、
+    記録していない場合はクライアントの traceparent をそのまま転送する。
+    """
+    headers = {"Content-Type": "application/json"}
+    traceparent = span.traceparent or request.headers.get("traceparent")
+    if traceparent:
+        headers["traceparent"] = traceparent
+        tracestate = request.headers.get("tracestate")
+        if tracestate:
+            headers["tracestate"] = tracestate
+    return headers
+
+
+async def record_tools_call_tokens(
+    tool_name: str,
+    request_body: bytes,
+    capture: ResponseBodyCapture,
+    session_id: Optional[str]
+) -> None:
+    """
+    tools/call のリクエスト＋レスポンスのトークン数を集計
+
+    Args:
+        tool_name: 呼び出されたツール名
+        request_body: クライアントからのJSON-RPC本文
+        capture: 転送したレスポンス本文（先頭のみ保持している場合は外挿）
+        session_id: セッションID
+    """
+    payload = request_body + b"\n" + capture.body
+    text = payload.decode(errors="replace")
+    if len(text) > TOKEN_COUNT_OFFLOAD_BYTES:
+        tokens = await asyncio.to_thread(token_accountant.count_text, text)
+    else:
+        tokens = token_accountant.count_text(text)
+
+    if capture.truncated and payload:
+        # 保持上限を超えた分は先頭部分のトークン密度で見積もる
+        total_bytes = len(request_body) + 1 + capture.total_bytes
+        tokens = round(tokens * total_bytes / len(payload))
+
+    token_accountant.record("tools_call", tokens, tool_name=tool_name, session_id=session_id)
+
+
+@router.get("/stats")
+async def mcp_proxy_stats():
+    """
+    MCP Proxy runtime statistics (upstream pool saturation / connection reuse)
+    """
+    return {
+        "upstream": upstream_pool.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "schema_budget": catalog_cache.last_allocation,
+        "protocol_log": protocol_logger.stats(),
+        "tracing": tracer.stats(),
+        "coalescing": request_coalescer.stats(),
+        "result_cache": result_cache.stats(),
+        "schema_store": schema_store.stats(),
+        "shared_schema_cache": shared_schema_cache.stats(),
+        "schema_usage": schema_usage.stats(),
+    }
+
+
+@router.get("/tokens")
+async def mcp_proxy_tokens():
+    """
+    Live token totals by phase / tool / server / session
+    """
+    return token_accountant.snapshot()
+
+
+def jsonrpc_json_response(message: Dict[str, Any]) -> Response:
+    """
+    JSON-RPC メッセージを application/json レスポンスに変換
+    """
+    return Response(content=codec.dumps(message), media_type="application/json")
+
+
+def build_text_result(request_id: Any, text_literal: bytes) -> bytes:
+    """
+    シリアライズ済みテキストから tools/call 結果のJSONバイト列を組み立て
+
+    Args:
+        request_id: JSON-RPC id
+        text_literal: エスケープ済みJSON文字列リテラル
+
+    Returns:
+        JSON-RPC 2.0 レスポンス本文
+    """
+    return (
+        b'{"jsonrpc":"2.0","id":' + codec.dumps(request_id)
+        + b',"result":{"content":[{"type":"text","text":' + text_literal + b'}]}}'
+    )
+
+
+def load_shared_schema(tool_name: str, server_name: Optional[str] = None) -> bool:
+    """
+    他ワーカーが公開したフルスキーマをこのワーカーの SchemaPartitioner に取り込む
+    """
+    shared = shared_schema_cache.get_schema(tool_name, server_name)
+    if shared is None:
+        return False
+    published_server, input_schema = shared
+    schema_partitioner.store_full_schema(tool_name, input_schema, published_server)
+    return True
+
+
+async def handle_expand_schema(
+    rpc_request: Dict[str, Any],
+    session_id: Optional[str] = None
+) -> Response:
     """
     expandSchema ツールコールをローカル処理
 
+    同一 (tool, path) のレスポンス本文はシリアライズ済みキャッシュから返す。
+
     Args:
         rpc_request: JSON-RPC 2.0 リクエスト
+        session_id: トークン集計用のセッションID
 
     Returns:
         JSON-RPC 2.0 レスポンス
@@ -227,11 +1023,14 @@ async def handle_expand_schema(rpc_request: Dict[str, Any]) -> Dict[str, Any]:
 
     tool_name = arguments.get("toolName")
     path = arguments.get("path")
+    # 同名ツールを複数サーバーが提供している場合の指定
+    server_name = arguments.get("serverName")
 
     # Log expandSchema request
     await protocol_logger.log_message("client→server", rpc_request, {
         "phase": "expand_schema",
-        "tool_name": tool_name
+        "tool_name": tool_name,
+        "session_id": session_id
     })
 
     if not tool_name:
@@ -245,28 +1044,56 @@ async def handle_expand_schema(rpc_request: Dict[str, Any]) -> Dict[str, Any]:
         }
         await protocol_logger.log_message("server→client", error_response, {
             "phase": "expand_schema",
-            "tool_name": tool_name
+            "tool_name": tool_name,
+            "session_id": session_id
         })
-        return error_response
+        return jsonrpc_json_response(error_response)
 
-    # フルスキーマから該当パスを取得
-    expanded_schema = schema_partitioner.expand_schema(tool_name, path)
+    # フルスキーマから該当パスを取得（シリアライズ済み）
+    rendered = schema_partitioner.render_expanded_schema(
+        tool_name, path, pretty=settings.EXPAND_SCHEMA_PRETTY, server_name=server_name
+    )
+    servers = schema_partitioner.servers_for(tool_name)
+    ambiguous = server_name is None and len(servers) > 1
+    if (
+        rendered is None
+        and not ambiguous
+        and isinstance(tool_name, str)
+        and isinstance(server_name, (str, type(None)))
+        and not schema_partitioner.has_schema(tool_name, server_name)
+    ):
+        # メモリにない（再起動後・他ワーカーが tools/list を処理した）場合は
+        # ホスト内の共有キャッシュ、次に永続ストアから読み込む
+        if load_shared_schema(tool_name, server_name) or await schema_store.load(tool_name, server_name):
+            rendered = schema_partitioner.render_expanded_schema(
+                tool_name, path, pretty=settings.EXPAND_SCHEMA_PRETTY, server_name=server_name
+            )
 
-    if expanded_schema is None:
+    if rendered is None:
+        if ambiguous:
+            message = (
+                f"Tool {tool_name} is provided by several servers "
+                f"({', '.join(server or '(unknown)' for server in servers)}): "
+                "pass serverName"
+            )
+        else:
+            message = f"Schema not found for tool: {tool_name}"
         error_response = {
             "jsonrpc": "2.0",
             "id": rpc_request.get("id"),
             "error": {
                 "code": -32602,
-                "message": f"Schema not found for tool: {tool_name}"
+                "message": message
             }
         }
         await protocol_logger.log_message("server→client", error_response, {
             "phase": "expand_schema",
-            "tool_name": tool_name
+            "tool_name": tool_name,
+            "session_id": session_id
         })
-        return error_response
+        return jsonrpc_json_response(error_response)
 
+    text, text_literal = rendered
     success_response = {
         "jsonrpc": "2.0",
         "id": rpc_request.get("id"),
@@ -274,7 +1101,7 @@ async def handle_expand_schema(rpc_request: Dict[str, Any]) -> Dict[str, Any]:
             "content": [
                 {
                     "type": "text",
-                    "text": json.dumps(expanded_schema, indent=2)
+                    "text": text
                 }
             ]
         }
@@ -283,7 +1110,29 @@ async def handle_expand_schema(rpc_request: Dict[str, Any]) -> Dict[str, Any]:
     # Log expandSchema response
     await protocol_logger.log_message("server→client", success_response, {
         "phase": "expand_schema",
-        "tool_name": tool_name
+        "tool_name": tool_name,
+        "session_id": session_id
     })
 
-    return success_response
+    if settings.TOKEN_ACCOUNTING_ENABLED:
+        # 展開結果は (tool, path) 毎に同一のためメモ化が効く
+        token_accountant.record(
+            "expand_schema",
+            token_accountant.count_text(text),
+            tool_name=tool_name,
+            session_id=session_id,
+        )
+
+    # 利用頻度を記録（閾値に達したパスは以降の tools/list で展開済みになる）
+    if server_name is None:
+        servers = schema_partitioner.servers_for(tool_name)
+        server_name = servers[0] if len(servers) == 1 else None
+    if schema_usage.record(tool_name, path, server_name):
+        # ホットセットが増えたとき・未保存分が溜まったとき（SCHEMA_HOT_INLINE_SAVE_INTERVAL 毎）に
+        # 保存（バッチ内でも失われないよう応答前に書く）
+        await schema_usage.save_async()
+
+    return Response(
+        content=build_text_result(rpc_request.get("id"), text_literal),
+        media_type="application/json"
+    )
@@ -1,6 +1,7 @@
 """API endpoints for MCP server state management"""
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from ...core.catalog_cache import catalog_cache
 from ...core.database import get_db
 from ...schemas import mcp_server_state as schemas
 from ...crud import mcp_server_state as crud
@@ -50,6 +51,10 @@ async def upsert_server_state(
 ):
     """Create or update server state"""
     state = await crud.upsert_server_state(db, server_id, state_data.enabled)
+    if not state_data.enabled:
+        # 無効化したサーバーのフルスキーマのみ破棄（再有効化後の tools/list で再保存）
+        # server_id は mcp-config.json のサーバー名 = Gateway が tools/list の _meta.server に付ける名前
+        catalog_cache.drop_server(state.server_id)
     return state
 
 
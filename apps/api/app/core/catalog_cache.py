@@ -0,0 +1,447 @@
+"""
+Partitioned tools/list catalog cache
+
+tools/list の結果はほぼ毎回同一なので、ツール単位のスキーマハッシュで
+分割済みエントリを再利用し、変更されたツールのみ再分割する。
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import hashlib
+import logging
+
+from .config import settings
+from .json_codec import codec
+from .schema_partitioning import (
+    PartitionPlan,
+    SchemaPartitioner,
+    greedy_collapse,
+    schema_partitioner,
+    tool_server_name,
+)
+from .schema_compression import SchemaCompressor, schema_compressor
+from .schema_usage import SchemaUsageTracker, schema_usage
+from .shared_schema_cache import SharedSchemaCache, shared_schema_cache
+from .token_accounting import token_accountant
+
+logger = logging.getLogger(__name__)
+
+
+def tool_hash(tool: Dict[str, Any]) -> str:
+    """
+    ツール定義の正規化ハッシュ（キー順に依存しない）
+
+    Args:
+        tool: tools/list の1エントリ
+
+    Returns:
+        16進ダイジェスト
+    """
+    return hashlib.blake2b(codec.canonical(tool), digest_size=16).hexdigest()
+
+
+class PartitionedCatalogCache:
+    """
+    Cache of partitioned tools/list entries
+
+    - catalog level: 全ツールのハッシュ列が一致すれば分割済みリストをそのまま返す
+    - tool level: スキーマが変わったツールのみ再分割
+    - host level (shared 指定時): 他ワーカーが分割済みのカタログ・フルスキーマを再利用
+
+    予算指定時（tool_budget / catalog_budget）は固定深さではなく、予算に収まるまで
+    大きい部分木から畳み込む。小さいスキーマはそのまま送り expandSchema を不要にする。
+
+    usage 指定時は、よく expandSchema されるパス（ホットセット）を分割後に展開して送る。
+    ホットセットが変わるとカタログキーが変わり、ツール単位のエントリは作り直す。
+    compressor 指定時は、最後に説明文の切り詰め・enum の要約などで圧縮する。
+    """
+
+    def __init__(
+        self,
+        partitioner: SchemaPartitioner,
+        max_tools: int = 4096,
+        max_catalogs: int = 8,
+        shared: Optional[SharedSchemaCache] = None,
+        tool_budget: int = 0,
+        catalog_budget: int = 0,
+        usage: Optional[SchemaUsageTracker] = None,
+        compressor: Optional[SchemaCompressor] = None,
+    ):
+        """
+        Initialize PartitionedCatalogCache
+
+        Args:
+            partitioner: full schema を保存する SchemaPartitioner
+            max_tools: ツール単位キャッシュの上限（LRU）
+            max_catalogs: カタログ単位キャッシュの上限（LRU）
+            shared: ワーカー間共有キャッシュ（None = プロセス内のみ）
+            tool_budget: ツール毎の inputSchema トークン予算（0 = 固定深さ1で分割）
+            catalog_budget: tools/list 全体のトークン予算（0 = 無制限）
+            usage: expandSchema の利用頻度（None = ホットパスを展開しない）
+            compressor: 分割後の圧縮（None = 圧縮しない）
+        """
+        self.partitioner = partitioner
+        self.max_tools = max_tools
+        self.max_catalogs = max_catalogs
+        self.shared = shared
+        self.tool_budget = tool_budget
+        self.catalog_budget = catalog_budget
+        self.usage = usage
+        self.compressor = compressor
+        # _tools のエントリを作ったときのホットセット
+        self._usage_fingerprint = ""
+
+        # tool hash -> (partitioned tool, token estimate)
+        self._tools: "OrderedDict[str, Tuple[Dict[str, Any], Dict[str, int]]]" = OrderedDict()
+        # catalog hash -> (partitioned tools, token estimates)
+        self._catalogs: "OrderedDict[str, Tuple[List[Dict[str, Any]], List[Dict[str, int]]]]" = OrderedDict()
+        # server -> tool name -> hash of the schema currently stored in the partitioner
+        self._stored: Dict[str, Dict[str, str]] = {}
+        # tool hash -> (partition plan, paths collapsed for the per-tool budget)
+        self._plans: Dict[str, Tuple[PartitionPlan, Set[Tuple[str, ...]]]] = {}
+        # catalog hash -> budget allocation report
+        self._allocations: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.last_allocation: Optional[Dict[str, Any]] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.catalog_hits = 0
+        self.catalog_misses = 0
+
+    def partition_tools(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        tools/list のツール一覧を分割（キャッシュ利用）
+
+        Args:
+            tools: 上流の tools/list ツール一覧
+
+        Returns:
+            分割済みツール一覧（新しいlist、要素はキャッシュと共有・変更禁止）
+        """
+        partitioned_tools, _ = self.partition_tools_with_estimates(tools)
+        return partitioned_tools
+
+    def partition_tools_with_estimates(
+        self,
+        tools: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, int]]]:
+        """
+        partition_tools と同じだが、ツール毎のトークン推定も返す
+
+        Args:
+            tools: 上流の tools/list ツール一覧
+
+        Returns:
+            (分割済みツール一覧, ツール毎の {"full", "partitioned", "reduction", "tool"})
+        """
+        hashes = [tool_hash(tool) for tool in tools]
+        fingerprint = self.usage.fingerprint() if self.usage is not None else ""
+        if fingerprint != self._usage_fingerprint:
+            # ホットセットが変わった: 展開済みのツール単位エントリは作り直す
+            self._tools.clear()
+            self._usage_fingerprint = fingerprint
+        # 予算・圧縮設定も共有カタログのキーに含める（ワーカー間・再起動前後で設定が異なる場合）
+        signature = self.budget_signature
+        if self.compressor is not None:
+            signature += self.compressor.signature
+        catalog_key = hashlib.blake2b(
+            ("".join(hashes) + fingerprint + signature).encode(), digest_size=16
+        ).hexdigest()
+
+        cached_catalog = self._catalogs.get(catalog_key)
+        if cached_catalog is not None:
+            self.catalog_hits += 1
+            self.hits += len(tools)
+            self._catalogs.move_to_end(catalog_key)
+            self.last_allocation = self._allocations.get(catalog_key)
+            for tool, digest in zip(tools, hashes):
+                self._ensure_stored(tool, digest)
+            partitioned_tools, estimates = cached_catalog
+            return list(partitioned_tools), estimates
+
+        shared_catalog = self.shared.get_catalog(catalog_key) if self.shared is not None else None
+        if shared_catalog is not None:
+            # 他ワーカーが分割済み: 再分割せずカタログ単位でプロセス内キャッシュへ取り込む
+            # （エントリはカタログ予算で畳み込み済みのことがあるので、ツール単位キャッシュには入れない）
+            self.catalog_hits += 1
+            self.hits += len(tools)
+            partitioned_tools, estimates = shared_catalog
+            for tool, digest in zip(tools, hashes):
+                self._ensure_stored(tool, digest)
+            # 予算配分の内訳は分割したワーカーのみが持つ
+            self._remember_catalog(catalog_key, partitioned_tools, estimates, None)
+            return list(partitioned_tools), estimates
+
+        self.catalog_misses += 1
+        partitioned_tools = []
+        estimates = []
+        repartitioned = 0
+        full_tokens = 0
+        partitioned_tokens = 0
+
+        for tool, digest in zip(tools, hashes):
+            self._ensure_stored(tool, digest)
+
+            entry = self._tools.get(digest)
+            if entry is not None:
+                self.hits += 1
+                self._tools.move_to_end(digest)
+            else:
+                self.misses += 1
+                repartitioned += 1
+                entry = self._partition_tool(tool, digest)
+                self._remember_tool(digest, entry)
+
+            partitioned_tool, reduction = entry
+            partitioned_tools.append(partitioned_tool)
+            estimates.append(reduction)
+
+        allocation = None
+        if self.budgeted:
+            allocation = self._allocate_budget(tools, hashes, partitioned_tools, estimates)
+        full_tokens = sum(reduction["full"] for reduction in estimates)
+        partitioned_tokens = sum(reduction["partitioned"] for reduction in estimates)
+
+        self._remember_catalog(catalog_key, partitioned_tools, estimates, allocation)
+        if self.shared is not None:
+            self.shared.put_catalog(catalog_key, partitioned_tools, estimates)
+
+        # トークン削減効果をログ出力（ツール毎ではなくカタログ単位）
+        reduction_pct = int((1 - partitioned_tokens / full_tokens) * 100) if full_tokens > 0 else 0
+        logger.info(
+            "%d tools (%d re-partitioned): %d → %d tokens (%d%% reduction)",
+            len(tools), repartitioned, full_tokens, partitioned_tokens, reduction_pct,
+        )
+        if allocation is not None:
+            logger.info(
+                "budget: %d tokens (catalog budget %s, tool budget %s), %d subtrees collapsed%s",
+                allocation["tokens"], allocation["catalog_budget"] or "-", allocation["tool_budget"] or "-",
+                allocation["collapsed_subtrees"], " — over budget" if allocation["over_budget"] else "",
+            )
+
+        return list(partitioned_tools), estimates
+
+    @property
+    def budgeted(self) -> bool:
+        """
+        予算制分割を使うか（どちらかの予算が指定されている）
+        """
+        return self.tool_budget > 0 or self.catalog_budget > 0
+
+    @property
+    def budget_signature(self) -> str:
+        """
+        予算設定の識別子（キャッシュキー用、予算が変わると別のカタログになる）
+        """
+        return f"budget:{self.tool_budget}:{self.catalog_budget}" if self.budgeted else ""
+
+    def _partition_tool(self, tool: Dict[str, Any], digest: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        input_schema = tool.get("inputSchema", {})
+        if self.budgeted:
+            _, collapsed = self._plan(tool, digest)
+            partitioned_schema = self.partitioner.collapse_paths(input_schema, collapsed)
+        else:
+            partitioned_schema = self.partitioner.partition_schema(input_schema)
+        return self._partitioned_entry(tool, partitioned_schema)
+
+    def _plan(self, tool: Dict[str, Any], digest: str) -> Tuple[PartitionPlan, Set[Tuple[str, ...]]]:
+        # 分割計画とツール毎予算での畳み込みパス（ツール単位でキャッシュ）
+        cached = self._plans.get(digest)
+        if cached is not None:
+            return cached
+
+        input_schema = tool.get("inputSchema", {})
+        if not isinstance(input_schema, dict):
+            cached = (PartitionPlan(0, []), set())
+        else:
+            plan = self.partitioner.plan_partition(input_schema)
+            collapsed: Dict[Any, Set[Tuple[str, ...]]] = {None: set()}
+            if self.tool_budget > 0:
+                greedy_collapse(
+                    ((saved, None, path) for saved, path in plan.candidates),
+                    plan.full_tokens, self.tool_budget, collapsed,
+                )
+            cached = (plan, collapsed[None])
+        self._plans[digest] = cached
+        return cached
+
+    def _allocate_budget(
+        self,
+        tools: List[Dict[str, Any]],
+        hashes: List[str],
+        partitioned_tools: List[Dict[str, Any]],
+        estimates: List[Dict[str, int]],
+    ) -> Dict[str, Any]:
+        # tools/list 全体が予算を超えたら、全ツールの残りの部分木を大きい順に畳み込む
+        # （partitioned_tools / estimates を置き換える。キャッシュ済みエントリは変更しない）
+        plans = [self._plan(tool, digest) for tool, digest in zip(tools, hashes)]
+        collapsed: Dict[Any, Set[Tuple[str, ...]]] = {
+            index: set(paths) for index, (_, paths) in enumerate(plans)
+        }
+        tokens = sum(reduction["tool"] for reduction in estimates)
+
+        if self.catalog_budget > 0 and tokens > self.catalog_budget:
+            hot = [self._hot_paths(tool) for tool in tools]
+            candidates = sorted(
+                (
+                    (saved, index, path)
+                    for index, (plan, _) in enumerate(plans)
+                    for saved, path in plan.candidates
+                    # ホットパス配下は展開し直すので畳み込んでも削減にならない
+                    if not any(path[:length] in hot[index] for length in range(len(path) + 1))
+                ),
+                key=lambda candidate: (-candidate[0], len(candidate[2])),
+            )
+            greedy_collapse(candidates, tokens, self.catalog_budget, collapsed)
+            for index, (_, paths) in enumerate(plans):
+                if collapsed[index] != paths:
+                    input_schema = tools[index].get("inputSchema", {})
+                    partitioned_tools[index], estimates[index] = self._partitioned_entry(
+                        tools[index], self.partitioner.collapse_paths(input_schema, collapsed[index])
+                    )
+            tokens = sum(reduction["tool"] for reduction in estimates)
+
+        return {
+            "catalog_budget": self.catalog_budget or None,
+            "tool_budget": self.tool_budget or None,
+            "full_tokens": sum(reduction["full"] for reduction in estimates),
+            "tokens": tokens,
+            "over_budget": self.catalog_budget > 0 and tokens > self.catalog_budget,
+            "collapsed_subtrees": sum(len(paths) for paths in collapsed.values()),
+            # 畳み込んだ・予算超過のツールのみ（小さいスキーマはそのまま）
+            "tools": [
+                {
+                    "name": tool.get("name"),
+                    "full": reduction["full"],
+                    "partitioned": reduction["partitioned"],
+                    "over_budget": self.tool_budget > 0 and reduction["partitioned"] > self.tool_budget,
+                    "collapsed": sorted(".".join(path) for path in collapsed[index]),
+                }
+                for index, (tool, reduction) in enumerate(zip(tools, estimates))
+                if collapsed[index] or (self.tool_budget > 0 and reduction["partitioned"] > self.tool_budget)
+            ],
+        }
+
+    def _partitioned_entry(
+        self,
+        tool: Dict[str, Any],
+        partitioned_schema: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        input_schema = tool.get("inputSchema", {})
+        hot_paths = self._hot_paths(tool)
+        if hot_paths and isinstance(input_schema, dict):
+            partitioned_schema = self.partitioner.inline_paths(partitioned_schema, input_schema, hot_paths)
+        if self.compressor is not None:
+            partitioned_schema = self.compressor.compress(partitioned_schema)
+        reduction = self.partitioner.get_token_reduction_estimate(input_schema, partitioned_schema)
+
+        partitioned_tool = {
+            **tool,
+            "inputSchema": partitioned_schema
+        }
+        # クライアントに送るツール定義全体のトークン数（トークン集計用）
+        reduction = {**reduction, "tool": token_accountant.count_json(partitioned_tool)}
+        return partitioned_tool, reduction
+
+    def _hot_paths(self, tool: Dict[str, Any]) -> Set[Tuple[str, ...]]:
+        if self.usage is None:
+            return set()
+        return self.usage.hot_paths(tool.get("name", ""), tool_server_name(tool))
+
+    def _remember_tool(self, digest: str, entry: Tuple[Dict[str, Any], Dict[str, int]]) -> None:
+        self._tools[digest] = entry
+        if len(self._tools) > self.max_tools:
+            evicted, _ = self._tools.popitem(last=False)
+            self._plans.pop(evicted, None)
+
+    def _remember_catalog(
+        self,
+        catalog_key: str,
+        partitioned_tools: List[Dict[str, Any]],
+        estimates: List[Dict[str, int]],
+        allocation: Optional[Dict[str, Any]],
+    ) -> None:
+        self._catalogs[catalog_key] = (partitioned_tools, estimates)
+        self._allocations[catalog_key] = allocation
+        self.last_allocation = allocation
+        if len(self._catalogs) > self.max_catalogs:
+            evicted, _ = self._catalogs.popitem(last=False)
+            self._allocations.pop(evicted, None)
+
+    def _ensure_stored(self, tool: Dict[str, Any], digest: str) -> bool:
+        # フルスキーマを保存（expandSchema用）、変更時のみ（保存したら True）
+        tool_name = tool.get("name", "")
+        input_schema = tool.get("inputSchema", {})
+        if not input_schema:
+            return False
+
+        # 同名ツールが複数サーバーにあっても上書きしないよう (server, tool) 単位で保存
+        server_name = tool_server_name(tool)
+        stored = self._stored.setdefault(server_name or "", {})
+        if stored.get(tool_name) != digest or not self.partitioner.has_schema(tool_name, server_name or ""):
+            self.partitioner.store_full_schema(tool_name, input_schema, server_name)
+            stored[tool_name] = digest
+            if self.shared is not None:
+                # expandSchema を他ワーカーでも解決できるよう公開（drop_server 後の再保存も含む）
+                self.shared.put_schema(tool_name, input_schema, server_name)
+            return True
+        return False
+
+    def drop_server(self, server_name: str) -> int:
+        """
+        Drop the stored full schemas of one server (re-stored on its next tools/list)
+
+        Drops this worker's copies and the host-wide shared entries. Other
+        workers keep their in-memory copies until evicted; expandSchema
+        there still answers with the last schema they saw.
+
+        Args:
+            server_name: Server name as tools/list reports it in _meta.server
+
+        Returns:
+            Number of dropped schemas (this worker)
+        """
+        self._stored.pop(server_name, None)
+        if self.shared is not None:
+            self.shared.drop_server(server_name)
+        return self.partitioner.drop_server(server_name)
+
+    def clear(self) -> None:
+        """
+        Drop all cached entries
+        """
+        self._tools.clear()
+        self._catalogs.clear()
+        self._stored.clear()
+        self._plans.clear()
+        self._allocations.clear()
+        self.last_allocation = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters
+
+        Returns:
+            {"hits", "misses", "catalog_hits", "catalog_misses", "cached_tools", "cached_catalogs"}
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "catalog_hits": self.catalog_hits,
+            "catalog_misses": self.catalog_misses,
+            "cached_tools": len(self._tools),
+            "cached_catalogs": len(self._catalogs),
+        }
+
+
+# グローバルインスタンス（FastAPIで共有）
+catalog_cache = PartitionedCatalogCache(
+    schema_partitioner,
+    max_tools=settings.SCHEMA_CATALOG_CACHE_MAX_TOOLS,
+    max_catalogs=settings.SCHEMA_CATALOG_CACHE_MAX_CATALOGS,
+    shared=shared_schema_cache if shared_schema_cache.enabled else None,
+    tool_budget=settings.SCHEMA_TOOL_TOKEN_BUDGET,
+    catalog_budget=settings.SCHEMA_CATALOG_TOKEN_BUDGET,
+    usage=schema_usage if schema_usage.enabled else None,
+    compressor=schema_compressor if schema_compressor.enabled else None,
+)
@@ -12,6 +12,116 @@ class Settings(BaseSettings):
     MCP_CONFIG_PATH: Path = Path("/workspace/github/airis-mcp-gateway/mcp-config.json")
     MCP_GATEWAY_URL: str = "http://mcp-gateway:9090"
 
+    # MCP Gateway upstream connection pool (shared by SSE + JSON-RPC proxy)
+    MCP_UPSTREAM_MAX_CONNECTIONS: int = 100
+    MCP_UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    MCP_UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    MCP_UPSTREAM_TIMEOUT: float = 60.0
+    MCP_UPSTREAM_HTTP2: bool = False
+    # Route別の同時接続上限（SSEは長寿命接続のためtools/callを枯渇させないよう制限）
+    MCP_UPSTREAM_SSE_MAX_STREAMS: int = 50
+    MCP_UPSTREAM_RPC_MAX_CONCURRENCY: int = 50
+
+    # JSON-RPC バッチの転送方式: "concurrent"（要素毎に並行POST）| "batch"（1回のバッチPOST）
+    MCP_BATCH_UPSTREAM_MODE: str = "concurrent"
+
+    # 同一引数の冪等ツール呼び出しを1回の上流呼び出しに合流（single-flight、オプトイン）
+    MCP_COALESCE_ENABLED: bool = False
+    MCP_COALESCE_TOOLS: list[str] = []  # 冪等として扱うツール名
+    MCP_COALESCE_ANNOTATED: bool = True  # tools/list の readOnlyHint / idempotentHint も対象にする
+
+    # 読み取り専用ツールの結果キャッシュ（ツール名 → TTL秒 が許可リスト）
+    MCP_RESULT_CACHE_ENABLED: bool = False
+    MCP_RESULT_CACHE_TTLS: dict[str, float] = {}
+    MCP_RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    MCP_RESULT_CACHE_DISK_DIR: Path | None = None  # 指定時はディスク層も使う（再起動・ワーカー間で共有）
+    MCP_RESULT_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # SSE proxy: 同一readで完成したイベントをまとめて送る上限（0 = イベント毎に送出）
+    SSE_BATCH_MAX_BYTES: int = 65536
+
+    # Schema partitioning: 分割済み tools/list キャッシュ（LRU上限）
+    SCHEMA_CATALOG_CACHE_MAX_TOOLS: int = 4096
+    SCHEMA_CATALOG_CACHE_MAX_CATALOGS: int = 8
+    # 予算制分割: ツール毎の inputSchema / tools/list 全体のトークン予算（0 = 固定深さ1で分割）
+    # 予算内のスキーマはそのまま送り、超える場合は大きい部分木から畳み込む
+    SCHEMA_TOOL_TOKEN_BUDGET: int = 0
+    SCHEMA_CATALOG_TOKEN_BUDGET: int = 0
+    # expandSchema: シリアライズ済みレスポンスのキャッシュ上限と整形（Falseでindentなし）
+    SCHEMA_EXPAND_CACHE_MAX_ENTRIES: int = 2048
+    EXPAND_SCHEMA_PRETTY: bool = True
+    # フルスキーマの永続化（mcp_tool_schemas テーブル）: 起動時にウォームアップし、
+    # expandSchema のメモリミス時はDBから読み込む（再起動後・ワーカー間でも応答可能）
+    SCHEMA_STORE_ENABLED: bool = False
+    SCHEMA_STORE_WARM_LIMIT: int = 4096
+    # メモリに保持するフルスキーマの上限（LRU）
+    SCHEMA_MEMORY_MAX_TOOLS: int = 4096
+    # ワーカー間共有キャッシュ（tmpfs上のファイル、複数ワーカー運用時に有効化）
+    SCHEMA_SHARED_CACHE_ENABLED: bool = False
+    SCHEMA_SHARED_CACHE_DIR: Path | None = None  # 未指定時は /dev/shm/airis-mcp-gateway-schemas
+    # 利用頻度に基づくインライン化: expandSchema が閾値回数に達した (tool, path) の部分木を
+    # 以降の tools/list で展開済みにする（学習したホットセットはファイルに保存）
+    SCHEMA_HOT_INLINE_ENABLED: bool = False
+    SCHEMA_HOT_INLINE_THRESHOLD: int = 20
+    SCHEMA_HOT_INLINE_FILE: Path | None = Path("logs/schema_hot_paths.json")
+    SCHEMA_HOT_INLINE_MAX_TRACKED: int = 10000
+    # 未保存の回数をファイルへ合算する間隔（秒）: 複数ワーカーの回数を足して閾値判定するため
+    SCHEMA_HOT_INLINE_SAVE_INTERVAL: float = 5.0
+    # 分割後の圧縮: 長い description の切り詰め・大きい enum の要約・冗長キーの削除
+    # （元の値は expandSchema で取得可能）
+    SCHEMA_COMPRESSION_ENABLED: bool = False
+    SCHEMA_DESCRIPTION_MAX_CHARS: int = 160
+    SCHEMA_ENUM_MAX_VALUES: int = 16  # これより多い enum は件数と先頭の値のみ
+    SCHEMA_ENUM_PREVIEW_VALUES: int = 5
+
+    # Token accounting: "auto"（tiktokenがあれば使用）| "tiktoken" | "heuristic"（len//4）
+    TOKENIZER: str = "auto"
+    TOKENIZER_ENCODING: str = "cl100k_base"
+    # 起動時のトークナイザ読み込み（BPEファイルのダウンロード）の待ち時間上限、超えたら heuristic
+    TOKENIZER_LOAD_TIMEOUT: float = 10.0
+    TOKEN_ACCOUNTING_ENABLED: bool = True
+    TOKEN_COUNT_MEMO_SIZE: int = 16384
+    TOKEN_ACCOUNTING_MAX_SESSIONS: int = 1000
+    # ストリーミング中の tools/call レスポンスを集計用に保持する上限（超過分は先頭部分から外挿）
+    TOKEN_ACCOUNTING_CAPTURE_BYTES: int = 1024 * 1024
+
+    # Protocol logger: バックグラウンド書き込み（キュー満杯時 "drop" | "block"）
+    PROTOCOL_LOG_QUEUE_SIZE: int = 10000
+    PROTOCOL_LOG_BATCH_MAX_ENTRIES: int = 256
+    PROTOCOL_LOG_FLUSH_INTERVAL: float = 0.2
+    # fsync: "never"（OSに任せる）| "batch"（バッチ毎）| "interval"（FSYNC_INTERVAL秒毎）
+    PROTOCOL_LOG_FSYNC: str = "never"
+    PROTOCOL_LOG_FSYNC_INTERVAL: float = 1.0
+    PROTOCOL_LOG_BACKPRESSURE: str = "drop"
+    # ローテーション（0 = 無効）と閉じたセグメントの圧縮: "none" | "gzip" | "zstd"
+    PROTOCOL_LOG_ROTATE_BYTES: int = 64 * 1024 * 1024
+    PROTOCOL_LOG_ROTATE_SECONDS: float = 86400.0
+    PROTOCOL_LOG_COMPRESSION: str = "gzip"
+    PROTOCOL_LOG_MAX_SEGMENTS: int = 20
+    # この大きさ以上のメッセージは blob store に内容ハッシュで1度だけ保存（0 = 無効）
+    PROTOCOL_LOG_BLOB_THRESHOLD_BYTES: int = 0
+    # Sampling: phase毎の記録率（例 {"tools_call": 0.1}）とセッション単位の記録率
+    PROTOCOL_LOG_SAMPLE_RATES: dict[str, float] = {}
+    PROTOCOL_LOG_SESSION_SAMPLE_RATE: float = 1.0
+    # この大きさ以上のメッセージはサイズ + トークン数のみ記録（0 = 無効）
+    PROTOCOL_LOG_TRUNCATE_BYTES: int = 0
+
+    # JSONコーデック: "auto"（orjsonがあれば使用）| "orjson" | "stdlib"
+    JSON_CODEC: str = "auto"
+
+    # Prometheus形式の /metrics（False でミドルウェア・計測フックを無効化）
+    METRICS_ENABLED: bool = True
+
+    # スパントレーシング（OTLP/JSON を "file" に追記 or "otlp" コレクタへPOST）
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "file"
+    TRACING_FILE: Path = Path("logs/traces.jsonl")
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_SERVICE_NAME: str = "airis-mcp-gateway-api"
+    TRACING_SAMPLE_RATE: float = 1.0  # 新規トレースの記録率（traceparent 付きは送信元の判定に従う）
+    TRACING_EXPORT_INTERVAL: float = 1.0
+    TRACING_MAX_QUEUE: int = 10000
+
     # API
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "AIRIS MCP Gateway API"
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from .config import settings
+from .metrics import install_sqlalchemy_hooks
 
 
 # Create async engine
@@ -10,6 +11,9 @@ engine = create_async_engine(
     future=True,
 )
 
+if settings.METRICS_ENABLED:
+    install_sqlalchemy_hooks(engine)
+
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -0,0 +1,111 @@
+"""
+JSON codec for the proxy hot path
+
+SSE frames, POST bodies, expandSchema responses and protocol log lines all
+go through one codec: orjson (bytes in / bytes out) when installed, the
+stdlib json module otherwise. Both backends produce compact output with
+the same separators; the stdlib backend keeps its (faster) ASCII escaping
+of non-ASCII characters, orjson writes them as UTF-8.
+"""
+
+from typing import Any, Union
+import json
+import logging
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# orjson.JSONDecodeError も json.JSONDecodeError のサブクラス
+JSONDecodeError = json.JSONDecodeError
+
+
+class StdlibCodec:
+    """
+    json module backend
+    """
+
+    name = "stdlib"
+
+    def loads(self, data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def dumps(self, obj: Any, pretty: bool = False) -> bytes:
+        """
+        Serialize to compact (or 2-space indented) UTF-8 JSON
+        """
+        if pretty:
+            return json.dumps(obj, indent=2).encode()
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    def canonical(self, obj: Any) -> bytes:
+        """
+        Key-sorted compact JSON (stable across processes, for hashing)
+        """
+        return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+
+
+class OrjsonCodec:
+    """
+    orjson backend (falls back to stdlib for values orjson rejects, e.g.
+    integers beyond 64 bits, NaN / Infinity)
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._fallback = StdlibCodec()
+        self._pretty = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        self._compact = orjson.OPT_NON_STR_KEYS
+        self._canonical = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def loads(self, data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            # 標準ライブラリで再試行（本当に不正なJSONならこちらも JSONDecodeError）
+            return self._fallback.loads(data)
+
+    def dumps(self, obj: Any, pretty: bool = False) -> bytes:
+        try:
+            return self._orjson.dumps(obj, option=self._pretty if pretty else self._compact)
+        except TypeError:
+            # orjson.JSONEncodeError（TypeError）: 標準ライブラリで再試行
+            return self._fallback.dumps(obj, pretty)
+
+    def canonical(self, obj: Any) -> bytes:
+        try:
+            return self._orjson.dumps(obj, option=self._canonical)
+        except TypeError:
+            return self._fallback.canonical(obj)
+
+
+def create_codec(kind: str = "auto"):
+    """
+    Codec factory
+
+    Args:
+        kind: "auto" | "orjson" | "stdlib"
+
+    Returns:
+        Codec with `name`, `loads(data)`, `dumps(obj, pretty=False) -> bytes`
+        and `canonical(obj) -> bytes`
+    """
+    if kind == "stdlib":
+        return StdlibCodec()
+
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        if kind == "orjson":
+            logger.warning("orjson requested but not installed, falling back to stdlib json")
+        return StdlibCodec()
+
+
+# Global codec (shared across FastAPI requests)
+codec = create_codec(settings.JSON_CODEC)
@@ -0,0 +1,319 @@
+"""
+Prometheus-style metrics for the gateway
+
+Minimal in-process counters, gauges and histograms rendered in the
+Prometheus text exposition format at /metrics. With METRICS_ENABLED=False
+every hook returns immediately and no middleware is installed.
+
+Metrics are updated from the event loop (and SQLAlchemy hooks running on
+it), so no locking is done.
+"""
+
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import time
+
+from .config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """
+    Monotonic counter (optionally labelled)
+    """
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not self.registry.enabled:
+            return
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Gauge set directly, or read from a callback at scrape time
+
+    A labelled gauge needs a callback returning {label values: value}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], Any]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callback = callback
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if self.registry.enabled:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        if self.registry.enabled:
+            self.value -= amount
+
+    def render(self) -> List[str]:
+        value = self.callback() if self.callback is not None else self.value
+        if not self.labelnames:
+            return self.header() + [f"{self.name} {_format_value(value)}"]
+        lines = self.header()
+        for labels, series_value in value.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(series_value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram with fixed upper bounds (optionally labelled)
+    """
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        # 各バケットは非累積で保持し、出力時に累積する
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4)
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: request count and duration per route template
+
+    For streaming responses (SSE) the duration is the connection lifetime.
+    """
+
+    def __init__(self, app, registry: "MetricsRegistry"):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # ルートテンプレートでラベル付け（生のパスはカーディナリティが爆発するため使わない）
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_requests_total.inc(method, route, str(status["code"]))
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, route)
+
+
+def install_sqlalchemy_hooks(engine) -> None:
+    """
+    Time every DB statement via SQLAlchemy cursor events
+
+    Args:
+        engine: AsyncEngine (hooks go on its sync_engine)
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_started"].pop()
+        db_query_duration_seconds.observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        # 失敗したクエリの開始時刻を捨てる（after_cursor_execute は呼ばれない）
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_started"):
+            conn.info["metrics_query_started"].pop()
+
+
+def _result_cache_bytes() -> float:
+    from .result_cache import result_cache
+
+    return result_cache.bytes
+
+
+def _protocol_log_queue_depth() -> float:
+    from .protocol_logger import protocol_logger
+
+    return protocol_logger.stats()["queued"]
+
+
+def _upstream_route_stat(key: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    def read() -> Dict[Tuple[str, ...], float]:
+        from .upstream_client import upstream_pool
+
+        return {(name,): getattr(route, key) for name, route in upstream_pool.routes.items()}
+
+    return read
+
+
+# Global registry and metrics
+registry = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+http_requests_total = Counter(
+    registry, "http_requests_total", "HTTP requests by method, route and status",
+    labelnames=("method", "route", "status"),
+)
+http_request_duration_seconds = Histogram(
+    registry, "http_request_duration_seconds", "HTTP request duration by method and route",
+    labelnames=("method", "route"),
+)
+tools_call_upstream_seconds = Histogram(
+    registry, "mcp_tools_call_upstream_seconds", "Upstream time to response headers of proxied JSON-RPC calls",
+)
+sse_ttfb_seconds = Histogram(
+    registry, "mcp_sse_ttfb_seconds", "Time from SSE connect to the first byte sent to the client",
+)
+schema_partition_seconds = Histogram(
+    registry, "mcp_schema_partition_seconds", "Schema partitioning duration per tools/list response",
+    buckets=FAST_BUCKETS,
+)
+expand_schema_seconds = Histogram(
+    registry, "mcp_expand_schema_seconds", "expandSchema handling latency",
+    buckets=FAST_BUCKETS,
+)
+tools_call_coalesced_total = Counter(
+    registry, "mcp_tools_call_coalesced_total", "tools/call requests served by joining an in-flight identical call",
+)
+result_cache_lookups_total = Counter(
+    registry, "mcp_result_cache_lookups_total", "tools/call result cache lookups by result (hit, disk_hit, miss)",
+    labelnames=("result",),
+)
+sse_bytes_streamed_total = Counter(
+    registry, "mcp_sse_bytes_streamed_total", "Bytes streamed to SSE clients",
+)
+rpc_bytes_relayed_total = Counter(
+    registry, "mcp_rpc_bytes_relayed_total", "Bytes of upstream JSON-RPC responses relayed to clients",
+)
+sse_active_connections = Gauge(
+    registry, "mcp_sse_active_connections", "Open SSE client connections",
+)
+db_query_duration_seconds = Histogram(
+    registry, "db_query_duration_seconds", "Database statement latency",
+    buckets=FAST_BUCKETS + (0.5, 1.0, 2.5),
+)
+result_cache_bytes = Gauge(
+    registry, "mcp_result_cache_bytes", "Bytes held by the in-memory tools/call result cache",
+    callback=_result_cache_bytes,
+)
+protocol_log_queue_depth = Gauge(
+    registry, "mcp_protocol_log_queue_depth", "Entries waiting for the protocol log writer",
+    callback=_protocol_log_queue_depth,
+)
+upstream_route_in_flight = Gauge(
+    registry, "mcp_upstream_route_in_flight", "Upstream requests holding a slot of the route limiter",
+    labelnames=("route",), callback=_upstream_route_stat("in_flight"),
+)
+upstream_route_waiting = Gauge(
+    registry, "mcp_upstream_route_waiting", "Upstream requests waiting for a slot of the route limiter",
+    labelnames=("route",), callback=_upstream_route_stat("waiting"),
+)
+upstream_route_limit = Gauge(
+    registry, "mcp_upstream_route_limit", "Concurrency limit of the upstream route",
+    labelnames=("route",), callback=_upstream_route_stat("limit"),
+)
+upstream_route_wait_seconds = Histogram(
+    registry, "mcp_upstream_route_wait_seconds", "Time spent waiting for a saturated upstream route",
+    labelnames=("route",),
+)
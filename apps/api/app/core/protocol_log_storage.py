@@ -0,0 +1,371 @@
+"""
+Segmented storage for the protocol log
+
+- LogSegmentWriter: rotates protocol_messages.jsonl by size/age into
+  protocol_messages.<timestamp>.jsonl[.gz|.zst], compresses closed segments
+  and keeps at most max_segments of them
+- BlobStore: stores large message payloads once by content hash
+  (logs/blobs/<hh>/<hash>.json[.gz|.zst]); log lines reference them as
+  {"message_ref": {"blob": <hash>, "bytes": <size>}}
+
+Both run in the protocol logger's writer thread (never on the event loop).
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Set
+import gzip
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: ワーカー間のロックなし（単一プロセス運用のみ）
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# ログ行中の blob 参照（sweep時にJSONをパースせずに走査する、区切りの空白は有無とも許容）
+BLOB_REF_PATTERN = re.compile(rb'"message_ref": ?\{"blob": ?"([0-9a-f]+)"')
+
+
+def resolve_compression(compression: str) -> str:
+    """
+    Validate a compression name; zstd falls back to gzip without `zstandard`
+
+    Args:
+        compression: "none" | "gzip" | "zstd"
+
+    Returns:
+        Compression actually used
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {COMPRESSIONS}, got {compression!r}")
+
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            logger.warning("zstd requested but 'zstandard' is not installed, using gzip")
+            return "gzip"
+    return compression
+
+
+def open_compressed(path: Path, mode: str, compression: Optional[str] = None) -> IO:
+    """
+    Open a plain, .gz or .zst file (compression inferred from the suffix)
+
+    Args:
+        path: File path
+        mode: "rb" | "wb" | "rt" | "wt"
+        compression: Override the suffix-based detection
+
+    Returns:
+        File object
+    """
+    if compression is None:
+        compression = {".gz": "gzip", ".zst": "zstd"}.get(path.suffix, "none")
+
+    if compression == "gzip":
+        return gzip.open(path, mode)
+
+    if compression == "zstd":
+        import zstandard
+
+        raw = path.open(mode[0] + "b")
+        if mode[0] == "r":
+            # BufferedReader で行単位の読み出しを可能にする
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return stream if "b" in mode else io.TextIOWrapper(stream, encoding="utf-8")
+
+    return path.open(mode)
+
+
+def compress_file(source: Path, compression: str) -> Path:
+    """
+    Compress a closed file next to itself and remove the original
+
+    Returns:
+        Path of the compressed file (source itself with compression="none")
+    """
+    if compression == "none":
+        return source
+
+    target = source.with_name(source.name + COMPRESSION_SUFFIXES[compression])
+    partial = target.with_name(target.name + ".tmp")
+    with source.open("rb") as src, open_compressed(partial, "wb", compression) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(partial, target)
+    source.unlink()
+    return target
+
+
+class BlobStore:
+    """
+    Content-addressed store for large log payloads (written once per hash)
+    """
+
+    def __init__(self, blob_dir: Path, compression: str = "none"):
+        self.blob_dir = blob_dir
+        self.compression = compression
+        self.suffix = ".json" + COMPRESSION_SUFFIXES[compression]
+
+        self.stored = 0
+        self.deduplicated = 0
+
+    def path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / (digest + self.suffix)
+
+    def put(self, payload: bytes) -> str:
+        """
+        Store a payload unless an identical one exists
+
+        Args:
+            payload: Serialized JSON message
+
+        Returns:
+            Content hash referencing the blob
+        """
+        digest = hashlib.blake2b(payload, digest_size=20).hexdigest()
+        path = self.path(digest)
+        if path.exists():
+            self.deduplicated += 1
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open_compressed(partial, "wb", self.compression) as f:
+            f.write(payload)
+        # 完成したファイルのみ見えるようにする
+        os.replace(partial, path)
+        self.stored += 1
+        return digest
+
+    def sweep(self, referenced: Set[str]) -> int:
+        """
+        Delete blobs no remaining log line references
+
+        Returns:
+            Number of deleted blobs
+        """
+        deleted = 0
+        for path in self.blob_dir.glob("*/*.json*"):
+            if path.name.split(".", 1)[0] not in referenced:
+                path.unlink(missing_ok=True)
+                deleted += 1
+        return deleted
+
+    def clear(self) -> None:
+        shutil.rmtree(self.blob_dir, ignore_errors=True)
+
+
+class LogSegmentWriter:
+    """
+    Append-only JSONL writer with size/age rotation and retention
+
+    Several uvicorn workers append to the same active segment. Writes hold a
+    shared flock on a lock file next to it and rotation an exclusive one, so
+    a segment is never compressed while another worker is writing to it;
+    before each batch a writer reopens the active segment if another worker
+    rotated it (inode changed).
+    """
+
+    def __init__(
+        self,
+        log_file: Path,
+        rotate_bytes: int = 0,
+        rotate_seconds: float = 0,
+        compression: str = "none",
+        max_segments: int = 0,
+        blob_store: Optional[BlobStore] = None,
+    ):
+        """
+        Initialize LogSegmentWriter
+
+        Args:
+            log_file: Active segment (e.g. logs/protocol_messages.jsonl)
+            rotate_bytes: Rotate once the active segment reaches this size (0 = never)
+            rotate_seconds: Rotate segments older than this (0 = never)
+            compression: Compression of closed segments
+            max_segments: Closed segments kept (0 = unlimited)
+            blob_store: Blob store swept when old segments are deleted
+        """
+        self.log_file = log_file
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+        self.max_segments = max_segments
+        self.blob_store = blob_store
+
+        self._file: Optional[IO] = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._lock_path = log_file.with_name(f".{log_file.name}.lock")
+        self._lock_fd: Optional[int] = None
+
+        self.rotations = 0
+        self.deleted_segments = 0
+
+    def segments(self) -> List[Path]:
+        """
+        Closed segments, oldest first (timestamped names sort chronologically)
+        """
+        stem = self.log_file.stem
+        return sorted(
+            path for path in self.log_file.parent.glob(f"{stem}.*{self.log_file.suffix}*")
+            if path != self.log_file and not path.name.endswith(".tmp")
+        )
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        # ワーカー間ロック（書き込みは共有、ローテーションは排他）
+        if fcntl is None:
+            yield
+            return
+        if self._lock_fd is None:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self) -> None:
+        # 他ワーカーがローテーションした（active segment の inode が変わった・消えた）
+        if self._file is None:
+            return
+        try:
+            current = os.stat(self.log_file).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self._file.fileno()).st_ino:
+            self._close_file()
+            self._size = 0
+            self._opened_at = 0.0
+
+    def _due(self) -> bool:
+        self._reopen_if_rotated()
+        # サイズは全ワーカーの書き込みを含む実ファイルのもの
+        try:
+            self._size = self.log_file.stat().st_size
+        except FileNotFoundError:
+            self._size = 0
+        if self._size == 0:
+            return False
+        if not self._opened_at:
+            # 再起動時・他ワーカーの新しい segment は今から数える
+            self._opened_at = time.time()
+
+        too_big = self.rotate_bytes and self._size >= self.rotate_bytes
+        too_old = self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds
+        return bool(too_big or too_old)
+
+    def maybe_rotate(self) -> None:
+        """
+        Rotate the active segment if it is due (call before writing a batch)
+        """
+        if not self._due():
+            return
+        with self._locked(exclusive=True):
+            # ロック待ちの間に他ワーカーがローテーションしていれば引き継ぐだけ
+            if self._due():
+                self._rotate()
+
+    def write_lines(self, lines: Iterable[bytes]) -> None:
+        """
+        Append serialized (UTF-8) lines to the active segment and flush
+        """
+        with self._locked(exclusive=False):
+            self._reopen_if_rotated()
+            if self._file is None:
+                self._file = self.log_file.open("ab")
+                self._size = self._file.tell()
+                self._opened_at = self._opened_at or time.time()
+
+            for line in lines:
+                self._file.write(line)
+                self._size += len(line)
+            self._file.flush()
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def rotate(self) -> None:
+        """
+        Close the active segment, compress it and apply retention
+        """
+        with self._locked(exclusive=True):
+            self._rotate()
+
+    def _rotate(self) -> None:
+        self._close_file()
+        if not self.log_file.exists():
+            return
+
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+        closed = self.log_file.with_name(f"{self.log_file.stem}.{timestamp}{self.log_file.suffix}")
+        os.replace(self.log_file, closed)
+        compress_file(closed, self.compression)
+
+        self.rotations += 1
+        self._size = 0
+        self._opened_at = 0.0
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        if not self.max_segments:
+            return
+
+        segments = self.segments()
+        expired = segments[:-self.max_segments]
+        for path in expired:
+            path.unlink(missing_ok=True)
+            self.deleted_segments += 1
+
+        if expired and self.blob_store is not None:
+            self.blob_store.sweep(self._referenced_blobs())
+
+    def _referenced_blobs(self) -> Set[str]:
+        referenced = set()
+        for path in self.segments() + [self.log_file]:
+            if path.exists():
+                with open_compressed(path, "rb") as f:
+                    for line in f:
+                        for match in BLOB_REF_PATTERN.finditer(line):
+                            referenced.add(match.group(1).decode())
+        return referenced
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        self._close_file()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def clear(self) -> None:
+        """
+        Delete the active and all closed segments
+        """
+        self.close()
+        for path in self.segments():
+            path.unlink(missing_ok=True)
+        self.log_file.unlink(missing_ok=True)
+        self._size = 0
+        self._opened_at = 0.0
@@ -2,13 +2,34 @@
 Protocol Logger for MCP Message Capture
 
 Records all MCP protocol messages for token measurement and analysis.
+
+Entries are queued and written by a background task in batches, so logging
+a full tools/list payload never blocks the SSE stream on disk I/O.
+The log is rotated into compressed segments (see protocol_log_storage).
+
+Under load the volume can be cut by sampling (per phase, and head-based per
+session so a conversation is kept or dropped as a whole) and by truncating
+large payloads to a summary of their size and token count.
 """
 
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
-import json
+from typing import Any, Dict, List, Optional
 import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from .config import settings
+from .json_codec import codec
+from .protocol_log_storage import BlobStore, LogSegmentWriter, resolve_compression
+from .token_accounting import token_accountant
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("never", "batch", "interval")
+BACKPRESSURE_POLICIES = ("drop", "block")
 
 
 class ProtocolLogger:
@@ -17,19 +38,128 @@ class ProtocolLogger:
 
     Captures all MCP protocol messages (client→server, server→client)
     for token measurement analysis.
+
+    start() (app lifespan) launches the background writer; until then, and
+    after close(), entries are written inline. Logged messages are serialized
+    later by the writer, so callers must not mutate them after logging.
     """
 
-    def __init__(self, log_dir: Path = Path("logs")):
+    def __init__(
+        self,
+        log_dir: Path = Path("logs"),
+        queue_size: Optional[int] = None,
+        batch_max_entries: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        fsync: Optional[str] = None,
+        fsync_interval: Optional[float] = None,
+        backpressure: Optional[str] = None,
+        rotate_bytes: Optional[int] = None,
+        rotate_seconds: Optional[float] = None,
+        compression: Optional[str] = None,
+        max_segments: Optional[int] = None,
+        blob_threshold_bytes: Optional[int] = None,
+        sample_rates: Optional[Dict[str, float]] = None,
+        session_sample_rate: Optional[float] = None,
+        truncate_bytes: Optional[int] = None,
+    ):
         """
-        Initialize ProtocolLogger
+        Initialize ProtocolLogger (defaults come from settings)
 
         Args:
             log_dir: Directory for log files
+            queue_size: Entries buffered in memory before backpressure applies
+            batch_max_entries: Entries written per batch at most
+            flush_interval: Seconds a partial batch waits for more entries
+            fsync: "never" | "batch" (every batch) | "interval" (every fsync_interval s)
+            fsync_interval: Seconds between fsyncs with fsync="interval"
+            backpressure: "drop" (count and discard when full) | "block" (wait for room)
+            rotate_bytes: Rotate the active segment at this size (0 = never)
+            rotate_seconds: Rotate the active segment after this age (0 = never)
+            compression: Closed segment compression: "none" | "gzip" | "zstd"
+            max_segments: Closed segments kept (0 = unlimited)
+            blob_threshold_bytes: Store messages of at least this size once in
+                the blob store and reference them by hash (0 = inline)
+            sample_rates: Fraction of messages kept per phase (missing phase = 1.0)
+            session_sample_rate: Fraction of sessions kept (decided once per session id)
+            truncate_bytes: Replace messages of at least this size with
+                {"bytes", "tokens"} (0 = keep full payloads)
         """
         self.log_dir = log_dir
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.log_file = self.log_dir / "protocol_messages.jsonl"
 
+        self.queue_size = queue_size or settings.PROTOCOL_LOG_QUEUE_SIZE
+        self.batch_max_entries = batch_max_entries or settings.PROTOCOL_LOG_BATCH_MAX_ENTRIES
+        self.flush_interval = (
+            settings.PROTOCOL_LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        )
+        self.fsync = fsync or settings.PROTOCOL_LOG_FSYNC
+        self.fsync_interval = (
+            settings.PROTOCOL_LOG_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        )
+        self.backpressure = backpressure or settings.PROTOCOL_LOG_BACKPRESSURE
+
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {self.fsync!r}")
+        if self.backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(
+                f"backpressure must be one of {BACKPRESSURE_POLICIES}, got {self.backpressure!r}"
+            )
+
+        self.sample_rates = settings.PROTOCOL_LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+        self.session_sample_rate = (
+            settings.PROTOCOL_LOG_SESSION_SAMPLE_RATE
+            if session_sample_rate is None else session_sample_rate
+        )
+        self.truncate_bytes = settings.PROTOCOL_LOG_TRUNCATE_BYTES if truncate_bytes is None else truncate_bytes
+
+        self.blob_threshold_bytes = (
+            settings.PROTOCOL_LOG_BLOB_THRESHOLD_BYTES
+            if blob_threshold_bytes is None else blob_threshold_bytes
+        )
+        compression = resolve_compression(compression or settings.PROTOCOL_LOG_COMPRESSION)
+        self._blobs = BlobStore(self.log_dir / "blobs", compression)
+        self._segments = LogSegmentWriter(
+            self.log_file,
+            rotate_bytes=settings.PROTOCOL_LOG_ROTATE_BYTES if rotate_bytes is None else rotate_bytes,
+            rotate_seconds=(
+                settings.PROTOCOL_LOG_ROTATE_SECONDS if rotate_seconds is None else rotate_seconds
+            ),
+            compression=compression,
+            max_segments=settings.PROTOCOL_LOG_MAX_SEGMENTS if max_segments is None else max_segments,
+            blob_store=self._blobs if self.blob_threshold_bytes else None,
+        )
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._last_fsync = time.monotonic()
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.truncated = 0
+
+    async def start(self) -> None:
+        """
+        Start the background writer (called from the app lifespan)
+        """
+        if self._writer is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._writer = asyncio.create_task(self._run_writer())
+
+    async def close(self) -> None:
+        """
+        Write out queued entries and stop the writer (called on app shutdown)
+        """
+        if self._writer is not None:
+            # None = 終了指示（キュー内の残りを書き出してから終了）
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+            self._queue = None
+        await asyncio.to_thread(self._close_file)
+
     async def log_message(
         self,
         direction: str,
@@ -42,8 +172,22 @@ class ProtocolLogger:
         Args:
             direction: "client→server" | "server→client"
             message: MCP protocol message (JSON-RPC 2.0)
-            metadata: Optional metadata (server name, pattern, etc.)
+            metadata: Optional metadata (phase, session_id, tool_name, etc.)
         """
+        phase = metadata.get("phase") if metadata else None
+        session_id = metadata.get("session_id") if metadata else None
+
+        # Head-based sampling: セッション単位で一度だけ決まる（全メッセージを残すか捨てるか）
+        if session_id is not None and not self._sampled(f"session:{session_id}", self.session_sample_rate):
+            self.sampled_out += 1
+            return
+
+        # Phase sampling: request/response が同じ判定になるよう (phase, session, id) で決める
+        phase_rate = self.sample_rates.get(phase, 1.0)
+        if not self._sampled(f"{phase}:{session_id}:{message.get('id')}", phase_rate):
+            self.sampled_out += 1
+            return
+
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "direction": direction,
@@ -56,10 +200,111 @@ class ProtocolLogger:
 
         if metadata:
             log_entry["metadata"] = metadata
+        if phase_rate < 1.0:
+            # 集計側でサンプリング率を補正できるように記録
+            log_entry["sample_rate"] = phase_rate
+
+        if self._writer is None:
+            # Writer未起動（スクリプト・テスト）: 従来通りその場で追記
+            self._write_batch([log_entry])
+            return
+
+        if self.backpressure == "block":
+            await self._queue.put(log_entry)
+            return
+
+        try:
+            self._queue.put_nowait(log_entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is None:
+                break
+
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+
+            # 件数上限に達するか flush_interval が経過するまでまとめる
+            while len(batch) < self.batch_max_entries:
+                try:
+                    entry = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        entry = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                # ログ書き込み失敗でプロキシを止めない
+                self.dropped += len(batch)
+                logger.warning("Failed to write %d entries: %s", len(batch), e)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        # ローテーションは書き込み前（retention の blob sweep がこのバッチの blob を消さないように）
+        self._segments.maybe_rotate()
 
         # Append to JSONL file
-        with self.log_file.open("a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        self._segments.write_lines(self._serialize(log_entry) for log_entry in batch)
+
+        if self.fsync == "batch" or (
+            self.fsync == "interval"
+            and time.monotonic() - self._last_fsync >= self.fsync_interval
+        ):
+            os.fsync(self._segments.fileno())
+            self._last_fsync = time.monotonic()
+
+        self.written += len(batch)
+        self.batches += 1
+
+    @staticmethod
+    def _sampled(key: str, rate: float) -> bool:
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        # ハッシュで決定的に判定（プロセス・ワーカー間で同じ結果）
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") < rate * 2 ** 64
+
+    def _serialize(self, log_entry: Dict[str, Any]) -> bytes:
+        if self.truncate_bytes or self.blob_threshold_bytes:
+            payload = codec.dumps(log_entry["message"])
+
+            if self.truncate_bytes and len(payload) >= self.truncate_bytes:
+                # メタデータ + サイズ + トークン数のみ残す
+                log_entry = {key: value for key, value in log_entry.items() if key != "message"}
+                log_entry["message_summary"] = {
+                    "bytes": len(payload),
+                    "tokens": token_accountant.count_text(payload.decode()),
+                    "tokenizer": token_accountant.tokenizer.name,
+                }
+                self.truncated += 1
+            elif self.blob_threshold_bytes and len(payload) >= self.blob_threshold_bytes:
+                # 大きなペイロード（tools/list 等）は内容ハッシュで1度だけ保存
+                digest = self._blobs.put(payload)
+                log_entry = {key: value for key, value in log_entry.items() if key != "message"}
+                log_entry["message_ref"] = {"blob": digest, "bytes": len(payload)}
+
+        return codec.dumps(log_entry) + b"\n"
+
+    def _close_file(self) -> None:
+        self._segments.close()
 
     async def log_initialize(
         self,
@@ -125,10 +370,36 @@ class ProtocolLogger:
 
     def clear_logs(self) -> None:
         """
-        Clear existing log file
+        Clear existing log file (including rotated segments and blobs)
         """
-        if self.log_file.exists():
-            self.log_file.unlink()
+        self._segments.clear()
+        self._blobs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Writer queue and backpressure counters
+
+        Returns:
+            {"running", "queued", "queue_size", "written", "batches", "dropped",
+             "sampled_out", "truncated", "fsync", "backpressure", "rotations",
+             "deleted_segments", "blobs_stored", "blobs_deduplicated"}
+        """
+        return {
+            "running": self._writer is not None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "truncated": self.truncated,
+            "fsync": self.fsync,
+            "backpressure": self.backpressure,
+            "rotations": self._segments.rotations,
+            "deleted_segments": self._segments.deleted_segments,
+            "blobs_stored": self._blobs.stored,
+            "blobs_deduplicated": self._blobs.deduplicated,
+        }
 
 
 # Global singleton instance
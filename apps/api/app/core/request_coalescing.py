@@ -0,0 +1,154 @@
+"""
+Single-flight coalescing of identical idempotent tool calls
+
+Concurrent tools/call requests for the same tool with the same (canonical)
+arguments share one upstream call; every waiter gets the shared response
+(the proxy rewrites the JSON-RPC id per waiter). Calls that arrive after the
+shared call finished start a new one — nothing is cached here.
+
+Only tools marked idempotent are coalesced: listed in MCP_COALESCE_TOOLS,
+or (MCP_COALESCE_ANNOTATED) announced in tools/list with a readOnlyHint or
+idempotentHint annotation.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+import asyncio
+import hashlib
+
+from .config import settings
+from .json_codec import codec
+
+
+def tool_call_key(tool_name: str, arguments: Any) -> str:
+    """
+    (tool, arguments) の正規化キー（引数のキー順に依存しない）
+
+    Args:
+        tool_name: ツール名
+        arguments: tools/call の arguments
+
+    Returns:
+        16進ダイジェスト
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(tool_name.encode())
+    digest.update(b"\0")
+    digest.update(codec.canonical(arguments if arguments is not None else {}))
+    return digest.hexdigest()
+
+
+def is_idempotent_tool(tool: Dict[str, Any]) -> bool:
+    """
+    tools/list のアノテーションで読み取り専用 / 冪等と宣言されているか
+    """
+    annotations = tool.get("annotations")
+    if not isinstance(annotations, dict):
+        return False
+    return annotations.get("readOnlyHint") is True or annotations.get("idempotentHint") is True
+
+
+class RequestCoalescer:
+    """
+    Keyed single-flight: one shared task per in-flight key
+
+    The shared call runs as its own task, so a waiter that disconnects (and
+    is cancelled) does not cancel the call for the others.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        tools: Optional[Iterable[str]] = None,
+        use_annotations: Optional[bool] = None,
+    ):
+        """
+        Initialize RequestCoalescer (defaults come from settings)
+
+        Args:
+            enabled: Coalesce at all
+            tools: Tool names treated as idempotent
+            use_annotations: Also treat tools annotated readOnlyHint /
+                idempotentHint in tools/list as idempotent
+        """
+        self.enabled = settings.MCP_COALESCE_ENABLED if enabled is None else enabled
+        self.tools: Set[str] = set(settings.MCP_COALESCE_TOOLS if tools is None else tools)
+        self.use_annotations = (
+            settings.MCP_COALESCE_ANNOTATED if use_annotations is None else use_annotations
+        )
+        self.annotated_tools: Set[str] = set()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def learn_tools(self, tools: Iterable[Dict[str, Any]]) -> None:
+        """
+        Pick up idempotent annotations from a tools/list response
+
+        Merged per tool name: a paginated or partial listing only updates
+        the tools it contains, and a tool is removed only when a later
+        listing of it drops the hint.
+        """
+        if not (self.enabled and self.use_annotations):
+            return
+        for tool in tools:
+            name = tool.get("name")
+            if not isinstance(name, str):
+                continue
+            if is_idempotent_tool(tool):
+                self.annotated_tools.add(name)
+            else:
+                self.annotated_tools.discard(name)
+
+    def applies_to(self, tool_name: Optional[str]) -> bool:
+        """
+        Whether calls of this tool may be coalesced
+        """
+        return self.enabled and bool(tool_name) and (
+            tool_name in self.tools or tool_name in self.annotated_tools
+        )
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run call() once per key among concurrent callers
+
+        Args:
+            key: Coalescing key (tool_call_key)
+            call: Upstream call, only invoked by the first caller
+
+        Returns:
+            (result, shared): shared is True for callers that joined an
+            in-flight call instead of starting it
+        """
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+
+        # 待機側のキャンセルは共有タスクに伝播させない
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # 全待機者が切断済みでも例外を「未取得」にしない
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tools": len(self.tools | self.annotated_tools),
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+# Global coalescer (shared across FastAPI requests)
+request_coalescer = RequestCoalescer()
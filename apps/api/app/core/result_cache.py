@@ -0,0 +1,311 @@
+"""
+TTL result cache for read-only MCP tool calls
+
+tools/call results of allowlisted tools (MCP_RESULT_CACHE_TTLS: tool -> TTL
+seconds) are cached by (tool, canonical arguments). The memory tier is an
+LRU bounded by total body bytes; an optional disk tier (one file per key,
+written atomically) keeps results across restarts and shares them between
+workers on the same host.
+
+The disk directory must be owned by the gateway's user (it is created
+with mode 0o700); otherwise the disk tier is disabled.
+
+Only successful results are cached (no JSON-RPC error, no MCP isError).
+Bodies are stored as received; the proxy rewrites the JSON-RPC id on hits.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from . import metrics
+from .config import settings
+from .json_codec import JSONDecodeError, codec
+from .request_coalescing import tool_call_key
+from .shared_schema_cache import ensure_private_dir
+
+logger = logging.getLogger(__name__)
+
+
+def is_cacheable_result(response_body: bytes) -> bool:
+    """
+    成功した tools/call 結果か（エラー・isError の結果はキャッシュしない）
+    """
+    try:
+        message = codec.loads(response_body)
+    except JSONDecodeError:
+        return False
+    if not isinstance(message, dict) or "error" in message:
+        return False
+    result = message.get("result")
+    return isinstance(result, dict) and result.get("isError") is not True
+
+
+class DiskResultCache:
+    """
+    File-per-key disk tier: <dir>/<key[:2]>/<key>, header line + body
+
+    Writes go to a temp file in the same directory and are moved into
+    place with os.replace, so readers (other workers) never see partial
+    entries. Runs in worker threads (asyncio.to_thread).
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._bytes: Optional[int] = None
+        # 初回アクセス時にディレクトリの所有者を確認（None = 未確認）
+        self._private: Optional[bool] = None
+
+    @property
+    def usable(self) -> bool:
+        """
+        Whether the directory is private to this user (checked once)
+        """
+        if self._private is None:
+            try:
+                ensure_private_dir(self.cache_dir)
+                self._private = True
+            except OSError as e:
+                # 他ユーザーのディレクトリの内容は信用しない
+                logger.warning("disk tier disabled: %s", e)
+                self._private = False
+        return self._private
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        if not self.usable:
+            return None
+        path = self._path(key)
+        try:
+            with path.open("rb") as f:
+                header = codec.loads(f.readline())
+                body = f.read()
+        except (OSError, JSONDecodeError):
+            return None
+
+        expires_at = header.get("expires_at", 0) if isinstance(header, dict) else 0
+        if expires_at <= time.time():
+            self._unlink(path)
+            return None
+        return expires_at, body
+
+    def put(self, key: str, expires_at: float, body: bytes) -> None:
+        if not self.usable:
+            return
+        path = self._path(key)
+        path.parent.mkdir(mode=0o700, exist_ok=True)
+        data = codec.dumps({"expires_at": expires_at}) + b"\n" + body
+
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            self._unlink(Path(tmp))
+            raise
+
+        if self._bytes is None:
+            self._bytes = self._scan_bytes()
+        else:
+            self._bytes += len(data)
+        if self._bytes > self.max_bytes:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        Delete expired entries, then the oldest until under max_bytes
+
+        Returns:
+            Number of deleted entries
+        """
+        if not self.usable:
+            return 0
+        now = time.time()
+        entries = []
+        deleted = 0
+        for path in self.cache_dir.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = path.stat()
+                with path.open("rb") as f:
+                    header = codec.loads(f.readline())
+            except (OSError, JSONDecodeError):
+                continue
+            if not isinstance(header, dict) or header.get("expires_at", 0) <= now:
+                deleted += self._unlink(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            deleted += self._unlink(path)
+            total -= size
+
+        self._bytes = total
+        return deleted
+
+    def clear(self) -> None:
+        if not self.usable:
+            return
+        for path in self.cache_dir.glob("*/*"):
+            self._unlink(path)
+        self._bytes = 0
+
+    def _scan_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.cache_dir.glob("*/*") if path.is_file())
+
+    @staticmethod
+    def _unlink(path: Path) -> int:
+        try:
+            path.unlink()
+            return 1
+        except OSError:
+            return 0
+
+
+class ResultCache:
+    """
+    Allowlisted tools/call result cache (memory LRU + optional disk tier)
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        max_bytes: Optional[int] = None,
+        disk_dir: Optional[Path] = None,
+        disk_max_bytes: Optional[int] = None,
+    ):
+        """
+        Initialize ResultCache (defaults come from settings)
+
+        Args:
+            enabled: Cache at all
+            ttls: Tool name -> TTL seconds (the allowlist)
+            max_bytes: Memory tier cap on total cached body bytes
+            disk_dir: Directory of the disk tier (None = memory only)
+            disk_max_bytes: Disk tier cap on total file bytes
+        """
+        self.enabled = settings.MCP_RESULT_CACHE_ENABLED if enabled is None else enabled
+        self.ttls = settings.MCP_RESULT_CACHE_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes or settings.MCP_RESULT_CACHE_MAX_BYTES
+
+        disk_dir = disk_dir or settings.MCP_RESULT_CACHE_DISK_DIR
+        self.disk = (
+            DiskResultCache(disk_dir, disk_max_bytes or settings.MCP_RESULT_CACHE_DISK_MAX_BYTES)
+            if disk_dir else None
+        )
+
+        # key -> (expires_at, body)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def applies_to(self, tool_name: Optional[str]) -> bool:
+        """
+        Whether results of this tool are cached
+        """
+        return self.enabled and bool(tool_name) and self.ttls.get(tool_name, 0) > 0
+
+    async def get(self, tool_name: str, arguments: Any) -> Optional[bytes]:
+        """
+        Cached response body, or None on a miss / expired entry
+        """
+        key = tool_call_key(tool_name, arguments)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, body = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.result_cache_lookups_total.inc("hit")
+                return body
+            self._remove(key)
+
+        if self.disk is not None:
+            stored = await asyncio.to_thread(self.disk.get, key)
+            if stored is not None:
+                # ディスク層のヒットはメモリ層へ昇格
+                self._store(key, *stored)
+                self.disk_hits += 1
+                metrics.result_cache_lookups_total.inc("disk_hit")
+                return stored[1]
+
+        self.misses += 1
+        metrics.result_cache_lookups_total.inc("miss")
+        return None
+
+    async def put(self, tool_name: str, arguments: Any, response_body: Optional[bytes]) -> bool:
+        """
+        Cache a response body if it is a successful result
+
+        Returns:
+            True if the body was cached
+        """
+        if response_body is None or not is_cacheable_result(response_body):
+            return False
+
+        key = tool_call_key(tool_name, arguments)
+        expires_at = time.time() + self.ttls[tool_name]
+        self._store(key, expires_at, response_body)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, expires_at, response_body)
+        return True
+
+    def _store(self, key: str, expires_at: float, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (expires_at, body)
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "tools": sorted(tool for tool, ttl in self.ttls.items() if ttl > 0),
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "disk": self.disk is not None,
+        }
+
+
+# Global result cache (shared across FastAPI requests)
+result_cache = ResultCache()
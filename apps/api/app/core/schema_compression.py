@@ -0,0 +1,154 @@
+"""
+Optional compression pass for partitioned tools/list schemas
+
+Partitioning keeps description / enum / default verbatim, so catalogs with
+many servers still spend most of their tokens on long descriptions and
+enum lists. This pass runs on the partitioned inputSchema (the full schema
+stays available via expandSchema):
+
+- descriptions longer than SCHEMA_DESCRIPTION_MAX_CHARS are truncated
+- enums with more than SCHEMA_ENUM_MAX_VALUES values become a count plus
+  the first SCHEMA_ENUM_PREVIEW_VALUES values in the description (a
+  shortened enum would reject valid values)
+- redundant keys are dropped: empty "required" and the root "$schema"
+
+The root "type": "object" is kept: MCP requires it on inputSchema and SDK
+clients validate it.
+"""
+
+from typing import Any, Dict, Optional
+
+from .config import settings
+from .json_codec import codec
+
+# 値がスキーマの dict（名前 -> スキーマ）
+SCHEMA_MAP_KEYS = ("properties", "patternProperties", "$defs", "definitions", "dependentSchemas")
+# 値がスキーマ
+SCHEMA_KEYS = ("items", "additionalProperties", "not", "if", "then", "else", "contains", "propertyNames")
+# 値がスキーマの list
+SCHEMA_LIST_KEYS = ("anyOf", "oneOf", "allOf", "prefixItems", "items")
+
+ELLIPSIS = "…"
+
+
+class SchemaCompressor:
+    """
+    Truncates descriptions, collapses large enums and drops redundant keys
+
+    Copy-on-write: unchanged subtrees are shared with the input.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        description_max_chars: Optional[int] = None,
+        enum_max_values: Optional[int] = None,
+        enum_preview_values: Optional[int] = None,
+    ):
+        """
+        Initialize SchemaCompressor (defaults come from settings)
+
+        Args:
+            enabled: Compress partitioned schemas at all
+            description_max_chars: Descriptions longer than this are truncated
+            enum_max_values: Enums with more values are collapsed
+            enum_preview_values: Number of values listed for a collapsed enum
+        """
+        self.enabled = settings.SCHEMA_COMPRESSION_ENABLED if enabled is None else enabled
+        self.description_max_chars = description_max_chars or settings.SCHEMA_DESCRIPTION_MAX_CHARS
+        self.enum_max_values = enum_max_values or settings.SCHEMA_ENUM_MAX_VALUES
+        self.enum_preview_values = enum_preview_values or settings.SCHEMA_ENUM_PREVIEW_VALUES
+
+    @property
+    def signature(self) -> str:
+        """
+        圧縮設定の識別子（キャッシュキー用、設定が変わると別のカタログになる）
+        """
+        return f"compress:{self.description_max_chars}:{self.enum_max_values}:{self.enum_preview_values}"
+
+    def compress(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        分割済み inputSchema を圧縮
+
+        Args:
+            schema: 分割済みスキーマ（変更しない）
+
+        Returns:
+            圧縮後のスキーマ（変更がなければ schema そのもの）
+        """
+        if not isinstance(schema, dict):
+            return schema
+        compressed = self._compress(schema)
+        if "$schema" in compressed:
+            compressed = {key: value for key, value in compressed.items() if key != "$schema"}
+        return compressed
+
+    def _compress(self, node: Any) -> Any:
+        if not isinstance(node, dict):
+            return node
+
+        compressed: Dict[str, Any] = {}
+        changed = False
+        for key, value in node.items():
+            if key == "description" and isinstance(value, str):
+                new_value = self.truncate(value)
+            elif key in SCHEMA_MAP_KEYS and isinstance(value, dict):
+                new_value = self._compress_map(value)
+            elif key in SCHEMA_KEYS and isinstance(value, dict):
+                new_value = self._compress(value)
+            elif key in SCHEMA_LIST_KEYS and isinstance(value, list):
+                new_value = self._compress_list(value)
+            elif key == "required" and value == []:
+                changed = True
+                continue
+            else:
+                new_value = value
+            changed = changed or new_value is not value
+            compressed[key] = new_value
+
+        enum = node.get("enum")
+        if isinstance(enum, list) and len(enum) > self.enum_max_values:
+            del compressed["enum"]
+            description = compressed.get("description")
+            summary = self._enum_summary(enum)
+            compressed["description"] = f"{description} {summary}" if description else summary
+            changed = True
+
+        return compressed if changed else node
+
+    def _compress_map(self, schemas: Dict[str, Any]) -> Dict[str, Any]:
+        compressed = {name: self._compress(child) for name, child in schemas.items()}
+        if all(compressed[name] is child for name, child in schemas.items()):
+            return schemas
+        return compressed
+
+    def _compress_list(self, schemas: list) -> list:
+        compressed = [self._compress(child) for child in schemas]
+        if all(new is old for new, old in zip(compressed, schemas)):
+            return schemas
+        return compressed
+
+    def truncate(self, text: str) -> str:
+        """
+        説明文を上限文字数に切り詰める（できれば単語境界で、末尾に …）
+        """
+        limit = self.description_max_chars
+        if len(text) <= limit:
+            return text
+        cut = text[:limit]
+        # 末尾2割以内に空白があれば単語の途中で切らない
+        space = cut.rfind(" ", int(limit * 0.8))
+        if space > 0:
+            cut = cut[:space]
+        return cut.rstrip(" ,;:.-") + ELLIPSIS
+
+    def _enum_summary(self, enum: list) -> str:
+        preview = ", ".join(
+            value if isinstance(value, str) else codec.dumps(value).decode()
+            for value in enum[:self.enum_preview_values]
+        )
+        return f"One of {len(enum)} values: {preview}, {ELLIPSIS} (expandSchema for the full list)"
+
+
+# Global compressor (shared across FastAPI requests)
+schema_compressor = SchemaCompressor()
@@ -4,8 +4,83 @@ OpenMCP Lazy Loading Pattern実装
 トークン消費を75-90%削減するためのスキーマ分割ロジック。
 """
 
-from typing import Any, Dict, List, Optional
-import copy
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import sys
+
+from .config import settings
+from .json_codec import codec
+from .token_accounting import token_accountant
+
+
+def tool_server_name(tool: Dict[str, Any]) -> Optional[str]:
+    """
+    ツールを提供するMCPサーバー名（上流が _meta で付与している場合）
+
+    Args:
+        tool: tools/list の1エントリ
+
+    Returns:
+        サーバー名、または None（不明な場合）
+    """
+    meta = tool.get("_meta")
+    if isinstance(meta, dict):
+        for key in ("server", "serverName"):
+            if isinstance(meta.get(key), str):
+                return meta[key]
+    return None
+
+
+# 分割後のプロパティに残すキー（選択肢・バリデーション・デフォルト値）
+KEPT_PROPERTY_KEYS = ("type", "description", "enum", "const", "format", "pattern", "required", "default")
+
+
+def slim_property(value: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    分割後のプロパティ（KEPT_PROPERTY_KEYS のみ、ネストした properties などは削除）
+    """
+    return {kept: value[kept] for kept in KEPT_PROPERTY_KEYS if kept in value}
+
+
+class PartitionPlan(NamedTuple):
+    """
+    Collapsible subtrees of a schema (budget-driven partitioning)
+    """
+
+    # inputSchema 全体のトークン数
+    full_tokens: int
+    # (畳み込みで削減できるトークン数, パス)、削減量の大きい順
+    candidates: List[Tuple[int, Tuple[str, ...]]]
+
+
+def greedy_collapse(
+    candidates: Iterable[Tuple[int, Any, Tuple[str, ...]]],
+    tokens: int,
+    budget: int,
+    collapsed: Dict[Any, Set[Tuple[str, ...]]],
+) -> int:
+    """
+    予算に収まるまで削減量の大きい部分木から畳み込む（貪欲法）
+
+    Args:
+        candidates: (削減トークン数, スキーマのキー, パス)、削減量の大きい順
+        tokens: 現在のトークン数
+        budget: トークン予算
+        collapsed: スキーマのキー -> 畳み込み済みパス（更新される）
+
+    Returns:
+        畳み込み後のトークン数（推定）
+    """
+    for saved, key, path in candidates:
+        if tokens <= budget:
+            break
+        paths = collapsed.setdefault(key, set())
+        # 祖先が畳み込み済みなら削減済み
+        if path in paths or any(path[:length] in paths for length in range(1, len(path))):
+            continue
+        paths.add(path)
+        tokens -= saved
+    return tokens
 
 
 class SchemaPartitioner:
@@ -15,21 +90,183 @@ class SchemaPartitioner:
     OpenMCP Pattern:
     - tools/list: 軽量なスキーマ（トップレベルのみ）を返す
     - expandSchema: 必要に応じて詳細を段階的に取得
+
+    Copy-on-write: 入力スキーマは変更せず、分割結果・保存済みスキーマ・
+    expand結果は元の部分木を共有する（呼び出し側は読み取り専用として扱うこと）。
     """
 
-    def __init__(self):
-        # フルスキーマをメモリにキャッシュ
-        self.full_schemas: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_rendered: int = 2048, max_fallback_paths: int = 256, max_schemas: int = 4096):
+        """
+        Initialize SchemaPartitioner
 
-    def store_full_schema(self, tool_name: str, full_schema: Dict[str, Any]):
+        Args:
+            max_rendered: シリアライズ済みexpandSchemaレスポンスのキャッシュ上限（LRU）
+            max_fallback_paths: 索引外パス（直接キー経由など）をツール毎に索引へ追加する上限
+            max_schemas: メモリに保持するフルスキーマの上限（LRU、溢れた分は schema_store から再読込）
+        """
+        # (server, tool) -> slot（サーバー不明は ""、文字列は intern 済み）
+        self._slots: Dict[Tuple[str, str], int] = {}
+        # slot 毎のキー・フルスキーマ（共有参照、読み取り専用）・パス索引・索引外パス数
+        self._keys: List[Optional[Tuple[str, str]]] = []
+        self._schemas: List[Optional[Dict[str, Any]]] = []
+        self._path_index: List[Optional[Dict[Tuple[str, ...], Any]]] = []
+        self._fallback_paths: List[int] = []
+        self._free_slots: List[int] = []
+        # tool -> server -> slot（serverName 省略時の解決用）
+        self._tool_slots: Dict[str, Dict[str, int]] = {}
+        # server -> tool -> slot（サーバー単位の破棄用）
+        self._server_slots: Dict[str, Dict[str, int]] = {}
+        # slot の LRU 順
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        # (slot, path tuple, pretty) -> (text, JSON文字列リテラル)
+        self._rendered: "OrderedDict[Tuple[int, Tuple[str, ...], bool], Tuple[str, bytes]]" = OrderedDict()
+        self._rendered_keys: Dict[int, Set[Tuple[int, Tuple[str, ...], bool]]] = {}
+        self.max_rendered = max_rendered
+        self.max_fallback_paths = max_fallback_paths
+        self.max_schemas = max_schemas
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def store_full_schema(self, tool_name: str, full_schema: Dict[str, Any], server_name: Optional[str] = None):
         """
         フルスキーマを保存（expandSchema用）
 
+        deepcopyせず参照を保持する。上流から受け取ったスキーマは
+        以後変更されない前提（partition_schema も入力を変更しない）。
+
         Args:
             tool_name: ツール名
             full_schema: 完全なinputSchema
+            server_name: 提供元サーバー名（tool_server_name、不明なら None）
+        """
+        key = (sys.intern(server_name or ""), sys.intern(tool_name))
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._free_slots.pop() if self._free_slots else self._new_slot()
+            self._slots[key] = slot
+            self._keys[slot] = key
+            self._tool_slots.setdefault(key[1], {})[key[0]] = slot
+            self._server_slots.setdefault(key[0], {})[key[1]] = slot
+        else:
+            # 古いシリアライズ結果を破棄
+            self._drop_rendered(slot)
+
+        # パス索引を再構築
+        index: Dict[Tuple[str, ...], Any] = {}
+        self._index_paths(full_schema, (), index)
+        self._schemas[slot] = full_schema
+        self._path_index[slot] = index
+        self._fallback_paths[slot] = 0
+        self._lru[slot] = None
+        self._lru.move_to_end(slot)
+
+        while len(self._lru) > self.max_schemas:
+            self._drop_slot(next(iter(self._lru)))
+
+    def _new_slot(self) -> int:
+        self._keys.append(None)
+        self._schemas.append(None)
+        self._path_index.append(None)
+        self._fallback_paths.append(0)
+        return len(self._keys) - 1
+
+    def has_schema(self, tool_name: str, server_name: Optional[str] = None) -> bool:
+        """
+        フルスキーマを保持しているか（server_name 省略時は一意に解決できる場合のみ True）
+        """
+        return self._resolve(tool_name, server_name) is not None
+
+    def servers_for(self, tool_name: str) -> List[str]:
+        """
+        同名ツールを提供しているサーバー名の一覧（サーバー不明は ""）
+        """
+        if not isinstance(tool_name, str):
+            return []
+        return sorted(self._tool_slots.get(tool_name, ()))
+
+    def _resolve(self, tool_name: Any, server_name: Any) -> Optional[int]:
+        if not isinstance(tool_name, str):
+            return None
+        if server_name is not None:
+            if not isinstance(server_name, str):
+                return None
+            return self._slots.get((server_name, tool_name))
+
+        # serverName 省略: 同名ツールが1サーバーのみなら解決、複数なら曖昧
+        servers = self._tool_slots.get(tool_name)
+        if not servers or len(servers) != 1:
+            return None
+        return next(iter(servers.values()))
+
+    def drop_full_schema(self, tool_name: str, server_name: Optional[str] = None) -> None:
         """
-        self.full_schemas[tool_name] = copy.deepcopy(full_schema)
+        保存済みフルスキーマと索引・シリアライズ結果を破棄
+
+        Args:
+            tool_name: ツール名
+            server_name: 提供元サーバー名（不明なら None）
+        """
+        slot = self._slots.get((server_name or "", tool_name))
+        if slot is not None:
+            self._drop_slot(slot)
+
+    def drop_server(self, server_name: str) -> int:
+        """
+        サーバーの全ツールのフルスキーマを破棄（O(そのサーバーのツール数)）
+
+        Args:
+            server_name: サーバー名
+
+        Returns:
+            破棄したスキーマ数
+        """
+        slots = list(self._server_slots.get(server_name, {}).values())
+        for slot in slots:
+            self._drop_slot(slot)
+        return len(slots)
+
+    def _drop_slot(self, slot: int) -> None:
+        server_name, tool_name = self._keys[slot]
+        del self._slots[(server_name, tool_name)]
+        for owner, name, mapping in (
+            (tool_name, server_name, self._tool_slots),
+            (server_name, tool_name, self._server_slots),
+        ):
+            del mapping[owner][name]
+            if not mapping[owner]:
+                del mapping[owner]
+
+        self._drop_rendered(slot)
+        self._lru.pop(slot, None)
+        self._keys[slot] = None
+        self._schemas[slot] = None
+        self._path_index[slot] = None
+        self._free_slots.append(slot)
+
+    def _drop_rendered(self, slot: int) -> None:
+        for key in self._rendered_keys.pop(slot, ()):
+            self._rendered.pop(key, None)
+
+    def _index_paths(self, node: Any, prefix: Tuple[str, ...], index: Dict[Tuple[str, ...], Any]):
+        # expand_schema のパス解決と同じ規則: properties は省略可、直接キーが優先
+        if not isinstance(node, dict):
+            return
+
+        properties = node.get("properties")
+        if isinstance(properties, dict):
+            for key, child in properties.items():
+                if key in node:
+                    continue
+                path = prefix + (key,)
+                index[path] = child
+                self._index_paths(child, path, index)
+
+        items = node.get("items")
+        if isinstance(items, dict):
+            path = prefix + ("items",)
+            index[path] = items
+            self._index_paths(items, path, index)
 
     def partition_schema(self, schema: Dict[str, Any], depth: int = 1) -> Dict[str, Any]:
         """
@@ -74,63 +311,220 @@ class SchemaPartitioner:
         if not isinstance(schema, dict):
             return schema
 
-        partitioned = copy.deepcopy(schema)
+        # 必要なキーのみ新しいdictを構築し、それ以外は元の値を共有（deepcopyしない）
+        partitioned = {}
 
-        # propertiesが存在する場合
-        if "properties" in partitioned and depth > 0:
-            new_properties = {}
+        for key, value in schema.items():
+            # propertiesが存在する場合
+            if key == "properties" and depth > 0 and isinstance(value, dict):
+                partitioned[key] = self._slim_properties(value)
 
-            for key, value in partitioned["properties"].items():
-                if isinstance(value, dict):
-                    # トップレベルのtypeとdescriptionのみ残す
-                    new_prop = {}
+            # itemsが存在する場合（配列）
+            elif key == "items" and isinstance(value, dict):
+                partitioned[key] = self.partition_schema(value, depth - 1)
 
-                    if "type" in value:
-                        new_prop["type"] = value["type"]
-
-                    if "description" in value:
-                        new_prop["description"] = value["description"]
+            else:
+                partitioned[key] = value
 
-                    # enumやconstは残す（選択肢が必要）
-                    if "enum" in value:
-                        new_prop["enum"] = value["enum"]
+        return partitioned
 
-                    if "const" in value:
-                        new_prop["const"] = value["const"]
+    def _slim_properties(self, properties: Dict[str, Any]) -> Dict[str, Any]:
+        new_properties = {}
 
-                    # format, pattern等のバリデーションは残す
-                    if "format" in value:
-                        new_prop["format"] = value["format"]
+        for key, value in properties.items():
+            if isinstance(value, dict):
+                # type, description, enum/const（選択肢）, format/pattern（バリデーション）,
+                # required, default のみ残す。ネストしたpropertiesは削除（トークン削減）
+                new_properties[key] = slim_property(value)
+            else:
+                new_properties[key] = value
 
-                    if "pattern" in value:
-                        new_prop["pattern"] = value["pattern"]
+        return new_properties
 
-                    # required, default も残す
-                    if "required" in value:
-                        new_prop["required"] = value["required"]
+    def plan_partition(self, schema: Dict[str, Any]) -> PartitionPlan:
+        """
+        予算制分割の計画: 畳み込み可能な部分木と、畳み込みで削減できるトークン数
 
-                    if "default" in value:
-                        new_prop["default"] = value["default"]
+        部分木のサイズはコンパクトJSONのバイト数を1パスで積み上げ、スキーマ全体の
+        トークン数/バイト数の比でトークン数に換算する（部分木毎にトークン計測しない）。
 
-                    # ネストしたpropertiesは削除（type情報のみ残る）
-                    # これによりトークン削減
+        Args:
+            schema: 元のJSON Schema
 
-                    new_properties[key] = new_prop
+        Returns:
+            PartitionPlan（候補は削減量の大きい順、同量なら浅い順）
+        """
+        candidates: List[Tuple[int, Tuple[str, ...]]] = []
+        size = self._measure(schema, (), candidates)
+        full_tokens = token_accountant.count_json(schema)
+        ratio = full_tokens / size if size else 0.0
+
+        scaled = [(int(saved * ratio), path) for saved, path in candidates]
+        scaled = [(saved, path) for saved, path in scaled if saved > 0]
+        scaled.sort(key=lambda candidate: (-candidate[0], len(candidate[1])))
+        return PartitionPlan(full_tokens, scaled)
+
+    def _measure(self, node: Any, prefix: Optional[Tuple[str, ...]], out: List[Tuple[int, Tuple[str, ...]]]) -> int:
+        # コンパクトJSONのバイト数。prefix がある（expandSchema で辿れる）ノードの
+        # properties の各要素と items を候補として out に追加する
+        if isinstance(node, dict):
+            size = 1 + max(len(node), 1)
+            properties = node.get("properties")
+            for key, value in node.items():
+                size += len(codec.dumps(key)) + 1
+                if key == "properties" and prefix is not None and isinstance(value, dict):
+                    size += 1 + max(len(value), 1)
+                    for name, child in value.items():
+                        size += len(codec.dumps(name)) + 1
+                        # 直接キーと同名のプロパティはパスで辿れない（_index_paths と同じ規則）
+                        child_prefix = prefix + (name,) if name not in node else None
+                        size += self._measure_child(child, child_prefix, out)
+                elif key == "items" and prefix is not None and isinstance(value, dict):
+                    shadowed = isinstance(properties, dict) and "items" in properties and "items" not in node
+                    size += self._measure_child(value, None if shadowed else prefix + ("items",), out)
                 else:
-                    new_properties[key] = value
+                    size += self._measure(value, None, out)
+            return size
 
-            partitioned["properties"] = new_properties
+        if isinstance(node, list):
+            return 1 + max(len(node), 1) + sum(self._measure(value, None, out) for value in node)
 
-        # itemsが存在する場合（配列）
-        if "items" in partitioned and isinstance(partitioned["items"], dict):
-            partitioned["items"] = self.partition_schema(partitioned["items"], depth - 1)
+        return len(codec.dumps(node))
 
-        return partitioned
+    def _measure_child(self, child: Any, path: Optional[Tuple[str, ...]], out: List[Tuple[int, Tuple[str, ...]]]) -> int:
+        size = self._measure(child, path, out)
+        if path is not None and isinstance(child, dict):
+            saved = size - len(codec.dumps(slim_property(child)))
+            if saved > 0:
+                out.append((saved, path))
+        return size
+
+    def collapse_paths(self, schema: Dict[str, Any], paths: Iterable[Tuple[str, ...]]) -> Dict[str, Any]:
+        """
+        指定パスの部分木だけを分割後の形（KEPT_PROPERTY_KEYS のみ）に畳み込む
+
+        変更されるのはパス上のdictのみで、それ以外は元の値を共有する（copy-on-write）。
+
+        Args:
+            schema: 元のJSON Schema
+            paths: expandSchema と同じ規則のパス
+
+        Returns:
+            畳み込み後のスキーマ（paths が空なら schema そのもの）
+        """
+        trie = self._path_trie(paths)
+        if not trie:
+            return schema
+        return self._collapse(schema, trie)
+
+    @staticmethod
+    def _path_trie(paths: Iterable[Tuple[str, ...]]) -> Dict[Any, Any]:
+        # パスのトライ（終端は None キー）
+        trie: Dict[Any, Any] = {}
+        for path in paths:
+            node = trie
+            for key in path:
+                node = node.setdefault(key, {})
+            node[None] = True
+        return trie
+
+    def _collapse(self, node: Any, trie: Dict[Any, Any]) -> Any:
+        if not isinstance(node, dict):
+            return node
+        if None in trie:
+            return slim_property(node)
+
+        collapsed = dict(node)
+        properties = node.get("properties")
+        new_properties = None
+        for key, subtrie in trie.items():
+            if isinstance(properties, dict) and key in properties and key not in node:
+                if new_properties is None:
+                    new_properties = dict(properties)
+                new_properties[key] = self._collapse(properties[key], subtrie)
+            elif key == "items":
+                collapsed["items"] = self._collapse(node.get("items"), subtrie)
+        if new_properties is not None:
+            collapsed["properties"] = new_properties
+        return collapsed
+
+    def inline_paths(
+        self,
+        partitioned: Dict[str, Any],
+        full_schema: Dict[str, Any],
+        paths: Iterable[Tuple[str, ...]]
+    ) -> Dict[str, Any]:
+        """
+        分割済みスキーマの指定パスに元の部分木を展開する（よく expandSchema されるパス用）
+
+        畳み込まれた祖先は slim_property に子プロパティ（分割後の形）を加えて復元する。
+        copy-on-write: 変更されるのはパス上のdictのみ。
+
+        Args:
+            partitioned: 分割済みスキーマ
+            full_schema: 元のJSON Schema
+            paths: expandSchema と同じ規則のパス（() = スキーマ全体）
+
+        Returns:
+            展開後のスキーマ（paths が空なら partitioned そのもの）
+        """
+        trie = self._path_trie(paths)
+        if not trie:
+            return partitioned
+        return self._inline(partitioned, full_schema, trie)
+
+    def _inline(self, node: Any, full: Any, trie: Dict[Any, Any]) -> Any:
+        if not isinstance(full, dict):
+            return node
+        if None in trie:
+            return full
+
+        inlined = dict(node) if isinstance(node, dict) else slim_property(full)
+        full_properties = full.get("properties")
+        properties = None
+        for key, subtrie in trie.items():
+            if isinstance(full_properties, dict) and key in full_properties and key not in full:
+                if properties is None:
+                    current = inlined.get("properties")
+                    properties = (
+                        dict(current) if isinstance(current, dict) else self._slim_properties(full_properties)
+                    )
+                properties[key] = self._inline(properties.get(key), full_properties[key], subtrie)
+            elif key == "items" and isinstance(full.get("items"), dict):
+                inlined["items"] = self._inline(inlined.get("items"), full["items"], subtrie)
+        if properties is not None:
+            inlined["properties"] = properties
+        return inlined
+
+    def partition_to_budget(
+        self,
+        schema: Dict[str, Any],
+        budget: int,
+        plan: Optional[PartitionPlan] = None
+    ) -> Tuple[Dict[str, Any], Set[Tuple[str, ...]]]:
+        """
+        トークン予算に収まるまで大きい部分木から順に畳み込む（小さいスキーマはそのまま）
+
+        Args:
+            schema: 元のJSON Schema
+            budget: inputSchema のトークン予算
+            plan: plan_partition の結果（省略時は計算する）
+
+        Returns:
+            (分割後のスキーマ, 畳み込んだパス)。全て畳み込んでも予算を超える場合は
+            畳み込める部分木を全て畳み込んだ結果
+        """
+        if plan is None:
+            plan = self.plan_partition(schema)
+        collapsed: Dict[Any, Set[Tuple[str, ...]]] = {None: set()}
+        greedy_collapse(((saved, None, path) for saved, path in plan.candidates), plan.full_tokens, budget, collapsed)
+        return self.collapse_paths(schema, collapsed[None]), collapsed[None]
 
     def expand_schema(
         self,
         tool_name: str,
-        path: Optional[List[str]] = None
+        path: Optional[List[str]] = None,
+        server_name: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         指定されたパスのスキーマ詳細を取得
@@ -139,24 +533,49 @@ class SchemaPartitioner:
             tool_name: ツール名
             path: スキーマパス（例: ["metadata", "shipping"]）
                   Noneの場合は完全なスキーマを返す
+            server_name: 提供元サーバー名（省略時は同名ツールが1つの場合のみ解決）
 
         Returns:
-            指定パスのスキーマ、またはNone（見つからない場合）
+            指定パスのスキーマ（保存済みスキーマと共有、読み取り専用）、
+            またはNone（見つからない場合）
 
         Example:
             expand_schema("stripe_create_payment", ["metadata", "shipping"])
             → metadata.shipping 配下の完全なスキーマを返す
         """
-        if tool_name not in self.full_schemas:
+        slot = self._resolve(tool_name, server_name)
+        if slot is None:
             return None
+        return self._expand_slot(slot, path)
 
-        schema = self.full_schemas[tool_name]
+    def _expand_slot(self, slot: int, path: Optional[List[str]]) -> Optional[Any]:
+        schema = self._schemas[slot]
+        self._lru.move_to_end(slot)
 
         # パス指定なし = 完全なスキーマ
         if not path:
-            return copy.deepcopy(schema)
+            return schema
 
-        # パスをたどる
+        # 索引からO(1)で取得
+        index = self._path_index[slot]
+        try:
+            key = tuple(path)
+            node = index.get(key)
+        except TypeError:
+            # ハッシュ不可能なパス要素（不正な引数）は索引を使わない
+            key = None
+            node = None
+
+        if node is None:
+            node = self._walk(schema, path)
+            if node is not None and key is not None and self._fallback_paths[slot] < self.max_fallback_paths:
+                index[key] = node
+                self._fallback_paths[slot] += 1
+
+        return node
+
+    def _walk(self, schema: Dict[str, Any], path: List[str]) -> Optional[Any]:
+        # パスをたどる（索引にないパス用）
         current = schema
         for key in path:
             if isinstance(current, dict):
@@ -169,26 +588,80 @@ class SchemaPartitioner:
             else:
                 return None
 
-        return copy.deepcopy(current)
+        return current
 
-    def get_token_reduction_estimate(self, full_schema: Dict[str, Any]) -> Dict[str, int]:
+    def render_expanded_schema(
+        self,
+        tool_name: str,
+        path: Optional[List[str]] = None,
+        pretty: bool = True,
+        server_name: Optional[str] = None
+    ) -> Optional[Tuple[str, bytes]]:
         """
-        トークン削減効果の推定
+        expandSchema レスポンス本文をシリアライズ済みで取得（(server, tool, path)毎にキャッシュ）
+
+        Args:
+            tool_name: ツール名
+            path: スキーマパス
+            pretty: indent=2 で整形するか（Falseでトークン削減）
+            server_name: 提供元サーバー名（省略時は同名ツールが1つの場合のみ解決）
+
+        Returns:
+            (テキスト, JSONレスポンスに埋め込めるJSON文字列リテラル)、
+            またはNone（見つからない場合）
+        """
+        slot = self._resolve(tool_name, server_name)
+        if slot is None:
+            return None
+
+        try:
+            key = (slot, tuple(path or ()), pretty)
+            rendered = self._rendered.get(key)
+        except TypeError:
+            key = None
+            rendered = None
+
+        if rendered is not None:
+            self._rendered.move_to_end(key)
+            self._lru.move_to_end(slot)
+            return rendered
+
+        expanded_schema = self._expand_slot(slot, path)
+        if expanded_schema is None:
+            return None
+
+        text = codec.dumps(expanded_schema, pretty=pretty).decode()
+        rendered = (text, codec.dumps(text))
+
+        if key is not None:
+            self._rendered[key] = rendered
+            self._rendered_keys.setdefault(slot, set()).add(key)
+            if len(self._rendered) > self.max_rendered:
+                evicted, _ = self._rendered.popitem(last=False)
+                self._rendered_keys[evicted[0]].discard(evicted)
+
+        return rendered
+
+    def get_token_reduction_estimate(
+        self,
+        full_schema: Dict[str, Any],
+        partitioned_schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, int]:
+        """
+        トークン削減効果の推定（token_accountant のトークナイザで計測、結果はメモ化）
 
         Args:
             full_schema: 完全なスキーマ
+            partitioned_schema: 分割済みスキーマ（省略時は再分割する）
 
         Returns:
             {"full": フルトークン数推定, "partitioned": 分割後トークン数推定, "reduction": 削減率%}
         """
-        import json
-
-        full_json = json.dumps(full_schema)
-        partitioned_json = json.dumps(self.partition_schema(full_schema))
+        if partitioned_schema is None:
+            partitioned_schema = self.partition_schema(full_schema)
 
-        # JSON長をトークン数の近似値とする（実際は約4文字 = 1トークン）
-        full_tokens = len(full_json) // 4
-        partitioned_tokens = len(partitioned_json) // 4
+        full_tokens = token_accountant.count_json(full_schema)
+        partitioned_tokens = token_accountant.count_json(partitioned_schema)
 
         reduction = int((1 - partitioned_tokens / full_tokens) * 100) if full_tokens > 0 else 0
 
@@ -200,4 +673,7 @@ class SchemaPartitioner:
 
 
 # グローバルインスタンス（FastAPIで共有）
-schema_partitioner = SchemaPartitioner()
+schema_partitioner = SchemaPartitioner(
+    max_rendered=settings.SCHEMA_EXPAND_CACHE_MAX_ENTRIES,
+    max_schemas=settings.SCHEMA_MEMORY_MAX_TOOLS,
+)
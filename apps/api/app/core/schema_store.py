@@ -0,0 +1,233 @@
+"""
+Persistent store of full tool schemas (expandSchema backend)
+
+The SchemaPartitioner keeps full schemas in a per-process LRU, which is
+empty after a restart and differs between uvicorn workers. Schemas seen in
+tools/list are persisted (mcp_tool_schemas table, keyed by tool name +
+schema hash, with the providing server) so that every worker can answer
+expandSchema immediately:
+
+- startup: the most recently seen schema of each (server, tool) is loaded
+- tools/list: new (server, tool, hash) entries are written in the background
+- expandSchema memory miss: the latest schema is loaded from the store
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import logging
+
+from .config import settings
+from .json_codec import codec
+from .schema_partitioning import SchemaPartitioner, schema_partitioner, tool_server_name
+
+logger = logging.getLogger(__name__)
+
+
+def schema_hash(input_schema: Dict[str, Any]) -> str:
+    """
+    inputSchema の正規化ハッシュ（キー順に依存しない）
+    """
+    return hashlib.blake2b(codec.canonical(input_schema), digest_size=16).hexdigest()
+
+
+class DatabaseSchemaBackend:
+    """
+    mcp_tool_schemas table backend (one session per operation)
+    """
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from .database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    async def load_latest(self, limit: int) -> List[Tuple[str, Optional[str], Dict[str, Any]]]:
+        from ..crud import tool_schema as crud
+
+        async with self._session() as db:
+            rows = await crud.get_latest_tool_schemas(db, limit)
+            return [(row.tool_name, row.server_name or None, row.input_schema) for row in rows]
+
+    async def load(
+        self,
+        tool_name: str,
+        server_name: Optional[str] = None
+    ) -> Optional[Tuple[Optional[str], Dict[str, Any]]]:
+        from ..crud import tool_schema as crud
+
+        async with self._session() as db:
+            row = await crud.get_latest_tool_schema(db, tool_name, server_name)
+            return (row.server_name or None, row.input_schema) if row is not None else None
+
+    async def save(self, entries: List[Tuple[str, str, Optional[str], Dict[str, Any]]]) -> int:
+        from ..crud import tool_schema as crud
+
+        async with self._session() as db:
+            return await crud.upsert_tool_schemas(db, entries)
+
+
+class SchemaStore:
+    """
+    Write-behind persistence + read-through loading for SchemaPartitioner
+
+    Store errors (database down, table not migrated) are logged and never
+    fail the request: expandSchema then behaves as without the store.
+    """
+
+    def __init__(
+        self,
+        partitioner: SchemaPartitioner,
+        enabled: Optional[bool] = None,
+        backend=None,
+        warm_limit: Optional[int] = None,
+    ):
+        """
+        Initialize SchemaStore (defaults come from settings)
+
+        Args:
+            partitioner: SchemaPartitioner to warm / fill on misses
+            enabled: Persist and load schemas at all
+            backend: Object with async load_latest(limit), load(tool_name,
+                server_name) and save(entries) (default: DatabaseSchemaBackend)
+            warm_limit: Maximum number of tools loaded at startup
+        """
+        self.partitioner = partitioner
+        self.enabled = settings.SCHEMA_STORE_ENABLED if enabled is None else enabled
+        self.backend = backend or DatabaseSchemaBackend()
+        self.warm_limit = warm_limit or settings.SCHEMA_STORE_WARM_LIMIT
+
+        # 永続化済みの (server, tool, hash)（同じカタログを毎回書き込まない）
+        self._persisted: Set[Tuple[str, str, str]] = set()
+        self._pending: Set[asyncio.Task] = set()
+
+        self.warmed = 0
+        self.saved = 0
+        self.loads = 0
+        self.load_misses = 0
+        self.errors = 0
+
+    async def warm(self) -> int:
+        """
+        Load the latest schema of each stored (server, tool) into the partitioner
+
+        Returns:
+            Number of schemas loaded
+        """
+        if not self.enabled:
+            return 0
+        try:
+            entries = await self.backend.load_latest(self.warm_limit)
+        except Exception as e:
+            self._error("warm-up", e)
+            return 0
+
+        # 古い順に保存し、最近使われたツールを LRU の新しい側に残す
+        for tool_name, server_name, input_schema in reversed(entries):
+            self._store(tool_name, server_name, input_schema)
+        self.warmed = len(entries)
+        logger.info("Warmed %d tool schemas", len(entries))
+        return len(entries)
+
+    def persist_tools(self, tools: Iterable[Dict[str, Any]]) -> Optional[asyncio.Task]:
+        """
+        Persist not-yet-stored schemas of a tools/list in the background
+
+        Args:
+            tools: 上流の tools/list ツール一覧（分割前）
+
+        Returns:
+            Background task, or None if there is nothing to write
+        """
+        if not self.enabled:
+            return None
+
+        entries = []
+        for tool in tools:
+            tool_name = tool.get("name")
+            input_schema = tool.get("inputSchema")
+            if not isinstance(tool_name, str) or not isinstance(input_schema, dict) or not input_schema:
+                continue
+            server_name = tool_server_name(tool)
+            key = (server_name or "", tool_name, schema_hash(input_schema))
+            if key not in self._persisted:
+                self._persisted.add(key)
+                entries.append((tool_name, key[2], server_name, input_schema))
+        if not entries:
+            return None
+
+        task = asyncio.ensure_future(self._save(entries))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _save(self, entries: List[Tuple[str, str, Optional[str], Dict[str, Any]]]) -> None:
+        try:
+            self.saved += await self.backend.save(entries)
+        except Exception as e:
+            # 次の tools/list で再試行
+            self._persisted.difference_update(
+                (server or "", name, digest) for name, digest, server, _ in entries
+            )
+            self._error("save", e)
+
+    async def load(self, tool_name: str, server_name: Optional[str] = None) -> bool:
+        """
+        Load a tool's latest schema into the partitioner (expandSchema miss)
+
+        Args:
+            tool_name: ツール名
+            server_name: 提供元サーバー名（None = サーバーを問わず最新）
+
+        Returns:
+            True if the schema was found
+        """
+        if not self.enabled:
+            return False
+        try:
+            stored = await self.backend.load(tool_name, server_name)
+        except Exception as e:
+            self._error("load", e)
+            return False
+
+        if stored is None:
+            self.load_misses += 1
+            return False
+        self.loads += 1
+        self._store(tool_name, *stored)
+        return True
+
+    def _store(self, tool_name: str, server_name: Optional[str], input_schema: Dict[str, Any]) -> None:
+        self.partitioner.store_full_schema(tool_name, input_schema, server_name)
+        self._persisted.add((server_name or "", tool_name, schema_hash(input_schema)))
+
+    async def flush(self) -> None:
+        """
+        Wait for background writes (shutdown / tests)
+        """
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def _error(self, operation: str, error: Exception) -> None:
+        self.errors += 1
+        logger.warning("%s failed: %s", operation, error)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "memory_schemas": len(self.partitioner),
+            "warmed": self.warmed,
+            "saved": self.saved,
+            "loads": self.loads,
+            "load_misses": self.load_misses,
+            "errors": self.errors,
+            "pending_writes": len(self._pending),
+        }
+
+
+# Global schema store (shared across FastAPI requests)
+schema_store = SchemaStore(schema_partitioner)
@@ -0,0 +1,337 @@
+"""
+Usage-driven schema inlining (learned expandSchema hot set)
+
+Clients often expand the same nested fields on every call. expandSchema
+requests are counted per (server, tool, path); once a path reaches
+SCHEMA_HOT_INLINE_THRESHOLD it joins the hot set and the catalog cache
+inlines that subtree into the partitioned tools/list schema, saving the
+expandSchema round trip in later sessions.
+
+The hot set and counts are persisted to a JSON file (temp file +
+os.replace). Each worker keeps the calls it has not saved yet and adds them
+to the counts on disk under an exclusive file lock, so workers sharing the
+file count towards one threshold; every worker re-reads the file when another
+worker replaces it and picks up paths learned elsewhere.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from .config import settings
+from .json_codec import JSONDecodeError, codec
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: ワーカー間のロックなし（単一プロセス運用のみ）
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# (server, tool, path)（サーバー不明は ""）
+UsageKey = Tuple[str, str, Tuple[str, ...]]
+HotSet = Dict[Tuple[str, str], Set[Tuple[str, ...]]]
+
+
+def _is_path(path: Any) -> bool:
+    return isinstance(path, list) and all(isinstance(key, str) for key in path)
+
+
+class SchemaUsageTracker:
+    """
+    expandSchema frequency per (server, tool, path) and the learned hot set
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        threshold: Optional[int] = None,
+        file_path: Optional[Path] = None,
+        max_tracked: Optional[int] = None,
+        save_interval: Optional[float] = None,
+    ):
+        """
+        Initialize SchemaUsageTracker (defaults come from settings)
+
+        Args:
+            enabled: Track and inline at all
+            threshold: expandSchema count at which a path is inlined
+            file_path: Persisted hot set (None = memory only)
+            max_tracked: Maximum number of counted paths (least used are dropped)
+            save_interval: Seconds between saves of unsaved counts
+        """
+        self.enabled = settings.SCHEMA_HOT_INLINE_ENABLED if enabled is None else enabled
+        self.threshold = threshold or settings.SCHEMA_HOT_INLINE_THRESHOLD
+        self.file_path = file_path if file_path is not None else settings.SCHEMA_HOT_INLINE_FILE
+        self.max_tracked = max_tracked or settings.SCHEMA_HOT_INLINE_MAX_TRACKED
+        self.save_interval = (
+            settings.SCHEMA_HOT_INLINE_SAVE_INTERVAL if save_interval is None else save_interval
+        )
+
+        # ファイル上の回数 + このワーカーの未保存分
+        self._counts: Dict[UsageKey, int] = {}
+        # このワーカーの未保存分（保存時にファイル上の回数へ加算）
+        self._pending: Dict[UsageKey, int] = {}
+        # (server, tool) -> hot paths
+        self._hot: HotSet = {}
+        self._fingerprint = ""
+        self._loaded = False
+        self._version: Optional[Tuple[int, int]] = None
+        self._last_save = time.monotonic()
+
+    def _ensure_loaded(self) -> None:
+        # 初回、または他ワーカーが保存した（ファイルが置き換わった）ときに読み直す
+        version = self._file_version()
+        if self._loaded and version == self._version:
+            return
+        self._loaded = True
+        counts, hot = self._parse(self._read_file())
+        self._apply(counts, hot, version)
+
+    async def load(self) -> None:
+        """
+        Load the persisted hot set (startup; otherwise loaded on first use)
+        """
+        if self.enabled:
+            await asyncio.to_thread(self._ensure_loaded)
+
+    def record(self, tool_name: str, path: Any, server_name: Optional[str] = None) -> bool:
+        """
+        Count one successful expandSchema
+
+        Args:
+            tool_name: ツール名
+            path: expandSchema の path 引数（None = スキーマ全体）
+            server_name: 解決された提供元サーバー名
+
+        Returns:
+            True if the caller should save: the path just joined the hot
+            set, or save_interval has passed since the last save
+        """
+        if not self.enabled or not isinstance(tool_name, str):
+            return False
+        if path is None:
+            path = []
+        if not _is_path(path):
+            return False
+        self._ensure_loaded()
+
+        key = (server_name or "", tool_name, tuple(path))
+        count = self._counts.get(key, 0) + 1
+        self._counts[key] = count
+        self._pending[key] = self._pending.get(key, 0) + 1
+        if len(self._counts) > self.max_tracked:
+            self._counts = self._drop_least_used(self._counts)
+
+        hot = self._hot.setdefault(key[:2], set())
+        if count >= self.threshold and key[2] not in hot:
+            hot.add(key[2])
+            self._update_fingerprint()
+            logger.info(
+                "Inlining %s:%s after %d expandSchema calls", tool_name, ".".join(path) or "(full schema)", count
+            )
+            return True
+        if not hot:
+            del self._hot[key[:2]]
+        # 他ワーカーの回数と合算できるよう、一定間隔で未保存分を保存させる
+        return self.file_path is not None and time.monotonic() - self._last_save >= self.save_interval
+
+    def hot_paths(self, tool_name: str, server_name: Optional[str] = None) -> Set[Tuple[str, ...]]:
+        """
+        Paths of a tool to inline in tools/list
+        """
+        if not self.enabled:
+            return set()
+        self._ensure_loaded()
+        return self._hot.get((server_name or "", tool_name), set())
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the hot set (changes whenever a path is added)
+        """
+        if not self.enabled:
+            return ""
+        self._ensure_loaded()
+        return self._fingerprint
+
+    def _update_fingerprint(self) -> None:
+        digest = hashlib.blake2b(digest_size=8)
+        for (server, tool), paths in sorted(self._hot.items()):
+            for path in sorted(paths):
+                digest.update(codec.canonical([server, tool, list(path)]))
+        self._fingerprint = digest.hexdigest() if self._hot else ""
+
+    def _drop_least_used(self, counts: Dict[UsageKey, int]) -> Dict[UsageKey, int]:
+        # 上限の9割まで使用回数の少ないパスを捨てる（ホットセットは残す）
+        keep = int(self.max_tracked * 0.9)
+        ranked = sorted(counts.items(), key=lambda item: -item[1])
+        return dict(ranked[:keep])
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        # os.replace で保存するたびに inode が変わる（mtime の分解能が粗いFSでも検出できる）
+        if self.file_path is None:
+            return None
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # ワーカー間の read-modify-write を直列化（排他ロック）
+        if fcntl is None:
+            yield
+            return
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.file_path.parent / f".{self.file_path.name}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # close でロックも解放される
+            os.close(fd)
+
+    def _read_file(self) -> Dict[str, Any]:
+        if self.file_path is None:
+            return {}
+        try:
+            data = codec.loads(self.file_path.read_bytes())
+        except FileNotFoundError:
+            return {}
+        except (OSError, JSONDecodeError) as e:
+            logger.warning("Failed to read %s: %s", self.file_path, e)
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _parse(self, data: Dict[str, Any]) -> Tuple[Dict[UsageKey, int], HotSet]:
+        # 不正なエントリ（手編集・古い形式）は読み飛ばす
+        counts: Dict[UsageKey, int] = {}
+        hot: HotSet = {}
+        skipped = 0
+        entries = data.get("counts")
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, list) and len(entry) == 4:
+                server, tool, path, count = entry
+                if (
+                    isinstance(server, str) and isinstance(tool, str) and _is_path(path)
+                    and isinstance(count, int) and not isinstance(count, bool) and count > 0
+                ):
+                    key = (server, tool, tuple(path))
+                    counts[key] = counts.get(key, 0) + count
+                    continue
+            skipped += 1
+        entries = data.get("hot")
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, list) and len(entry) == 3:
+                server, tool, path = entry
+                if isinstance(server, str) and isinstance(tool, str) and _is_path(path):
+                    hot.setdefault((server, tool), set()).add(tuple(path))
+                    continue
+            skipped += 1
+        if skipped:
+            logger.warning("Skipped %d malformed entries in %s", skipped, self.file_path)
+        return counts, hot
+
+    def _apply(self, counts: Dict[UsageKey, int], hot: HotSet, version: Optional[Tuple[int, int]]) -> None:
+        # ファイルの内容にこのワーカーの未保存分を足して、メモリ上の状態を置き換える
+        counts = dict(counts)
+        for key, delta in dict(self._pending).items():
+            counts[key] = counts.get(key, 0) + delta
+        merged = self._merge_hot(counts, hot)
+        if len(counts) > self.max_tracked:
+            counts = self._drop_least_used(counts)
+        self._counts = counts
+        self._hot = merged
+        self._version = version
+        self._update_fingerprint()
+
+    def _merge_hot(self, counts: Dict[UsageKey, int], hot: HotSet) -> HotSet:
+        # ファイル上のホットセット ∪ 合算で閾値に達したパス ∪ このワーカーが追加したパス
+        merged: HotSet = {key: set(paths) for key, paths in hot.items()}
+        for (server, tool, path), count in counts.items():
+            if count >= self.threshold:
+                merged.setdefault((server, tool), set()).add(path)
+        for key, paths in list(self._hot.items()):
+            merged.setdefault(key, set()).update(paths)
+        return merged
+
+    def save(self) -> None:
+        """
+        Add unsaved counts to the file on disk and persist the merged hot set
+
+        Runs under an exclusive file lock, so concurrent saves of several
+        workers all add up.
+        """
+        if not self.enabled or self.file_path is None:
+            return
+        self._ensure_loaded()
+        pending, self._pending = self._pending, {}
+        self._last_save = time.monotonic()
+
+        try:
+            with self._locked():
+                counts, hot = self._parse(self._read_file())
+                for key, delta in pending.items():
+                    counts[key] = counts.get(key, 0) + delta
+                hot = self._merge_hot(counts, hot)
+                if len(counts) > self.max_tracked:
+                    counts = self._drop_least_used(counts)
+                self._write({
+                    "threshold": self.threshold,
+                    "hot": [
+                        [server, tool, list(path)]
+                        for (server, tool), paths in sorted(hot.items())
+                        for path in sorted(paths)
+                    ],
+                    "counts": [[server, tool, list(path), count] for (server, tool, path), count in counts.items()],
+                })
+                version = self._file_version()
+        except OSError as e:
+            # 未保存分を戻して次回の保存で再試行
+            for key, delta in pending.items():
+                self._pending[key] = self._pending.get(key, 0) + delta
+            logger.warning("Failed to save %s: %s", self.file_path, e)
+            return
+        self._apply(counts, hot, version)
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        tmp = None
+        try:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.file_path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(codec.dumps(data, pretty=True))
+            os.replace(tmp, self.file_path)
+        except OSError:
+            if tmp is not None:
+                Path(tmp).unlink(missing_ok=True)
+            raise
+
+    async def save_async(self) -> None:
+        await asyncio.to_thread(self.save)
+
+    def stats(self) -> Dict[str, Any]:
+        hot: List[Dict[str, Any]] = [
+            {"server": server or None, "tool": tool, "path": list(path), "count": self._counts.get((server, tool, path))}
+            for (server, tool), paths in sorted(self._hot.items())
+            for path in sorted(paths)
+        ]
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "tracked_paths": len(self._counts),
+            "unsaved_calls": sum(self._pending.values()),
+            "hot": hot,
+        }
+
+
+# Global usage tracker (shared across FastAPI requests)
+schema_usage = SchemaUsageTracker()
@@ -0,0 +1,276 @@
+"""
+Host-wide schema cache shared between uvicorn/gunicorn workers
+
+Each worker has its own SchemaPartitioner and catalog cache, so a tools/list
+handled by one worker leaves the others unable to answer expandSchema, and
+every worker re-partitions the same catalog. This cache keeps one file per
+key in a tmpfs directory (/dev/shm by default):
+
+- schemas/<hash of server + tool name>.json: latest full inputSchema of a
+  (server, tool); also published under the bare tool name for lookups
+  without serverName
+- catalogs/<catalog hash>.json: partitioned tools/list + token estimates
+
+Writers create a temp file in the same directory and move it into place
+with os.replace, so lookups are plain lock-free file reads that only ever
+see complete entries. The directory is private to the gateway's user (mode
+0o700); the cache is disabled if it is owned by someone else.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import stat
+import tempfile
+
+from .config import settings
+from .json_codec import JSONDecodeError, codec
+
+logger = logging.getLogger(__name__)
+
+
+def default_shared_dir() -> Path:
+    """
+    共有ディレクトリの既定値（tmpfs の /dev/shm、なければ一時ディレクトリ）
+    """
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+    return base / "airis-mcp-gateway-schemas"
+
+
+def ensure_private_dir(directory: Path) -> None:
+    """
+    Create a cache directory only this process's user can access
+
+    /dev/shm and /tmp are world-writable and the default paths are
+    predictable, so another user could create the directory first and
+    plant entries. An existing directory must be a real directory owned
+    by this user; group/other permissions are removed.
+
+    Raises:
+        OSError: The directory cannot be created, or is not ours
+    """
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{directory} is not a directory")
+    # Windows には所有者 UID がない
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is owned by uid {st.st_uid}, not {os.getuid()}")
+    if st.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+
+class SharedSchemaCache:
+    """
+    File-per-key cache of full schemas and partitioned catalogs
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        directory: Optional[Path] = None,
+        max_catalogs: Optional[int] = None,
+    ):
+        """
+        Initialize SharedSchemaCache (defaults come from settings)
+
+        Args:
+            enabled: Share schemas / catalogs at all
+            directory: Shared directory (default: /dev/shm/airis-mcp-gateway-schemas)
+            max_catalogs: Number of catalog files kept (oldest are deleted)
+        """
+        self.enabled = settings.SCHEMA_SHARED_CACHE_ENABLED if enabled is None else enabled
+        self.directory = directory or settings.SCHEMA_SHARED_CACHE_DIR or default_shared_dir()
+        self.max_catalogs = max_catalogs or settings.SCHEMA_CATALOG_CACHE_MAX_CATALOGS
+        # 初回アクセス時にディレクトリの所有者を確認（None = 未確認）
+        self._private: Optional[bool] = None
+
+        self.schema_hits = 0
+        self.schema_misses = 0
+        self.catalog_hits = 0
+        self.catalog_misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    @property
+    def active(self) -> bool:
+        """
+        Enabled and the directory is private to this user
+        """
+        if not self.enabled:
+            return False
+        if self._private is None:
+            try:
+                ensure_private_dir(self.directory)
+                self._private = True
+            except OSError as e:
+                # 他ユーザーのディレクトリの内容は信用しない
+                self._error("directory check", e)
+                self._private = False
+        return self._private
+
+    def _schema_path(self, tool_name: str, server_name: Optional[str] = None) -> Path:
+        digest = hashlib.blake2b(f"{server_name or ''}\0{tool_name}".encode(), digest_size=16).hexdigest()
+        return self.directory / "schemas" / f"{digest}.json"
+
+    def _catalog_path(self, catalog_key: str) -> Path:
+        return self.directory / "catalogs" / f"{catalog_key}.json"
+
+    def get_schema(
+        self,
+        tool_name: str,
+        server_name: Optional[str] = None
+    ) -> Optional[Tuple[Optional[str], Dict[str, Any]]]:
+        """
+        Full inputSchema of a tool published by any worker
+
+        Args:
+            tool_name: ツール名
+            server_name: 提供元サーバー名（None = 最後に公開されたサーバーのもの）
+
+        Returns:
+            (サーバー名, inputSchema)、または None
+        """
+        if not self.active:
+            return None
+        entry = self._read(self._schema_path(tool_name, server_name))
+        # ハッシュ衝突に備えて名前も照合
+        if (
+            not isinstance(entry, dict)
+            or entry.get("tool") != tool_name
+            or (server_name is not None and entry.get("server") != server_name)
+        ):
+            self.schema_misses += 1
+            return None
+        self.schema_hits += 1
+        return entry.get("server"), entry["inputSchema"]
+
+    def put_schema(self, tool_name: str, input_schema: Dict[str, Any], server_name: Optional[str] = None) -> None:
+        """
+        Publish the full inputSchema of a (server, tool)
+        """
+        if not self.active:
+            return
+        entry = {"tool": tool_name, "server": server_name, "inputSchema": input_schema}
+        self._write(self._schema_path(tool_name, server_name), entry)
+        if server_name:
+            # serverName なしの expandSchema 用
+            self._write(self._schema_path(tool_name), entry)
+
+    def get_catalog(self, catalog_key: str) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, int]]]]:
+        """
+        Partitioned catalog computed by any worker, or None
+
+        Returns:
+            (分割済みツール一覧, ツール毎のトークン推定)
+        """
+        if not self.active:
+            return None
+        entry = self._read(self._catalog_path(catalog_key))
+        if not isinstance(entry, dict):
+            self.catalog_misses += 1
+            return None
+        self.catalog_hits += 1
+        return entry["tools"], entry["estimates"]
+
+    def put_catalog(
+        self,
+        catalog_key: str,
+        partitioned_tools: List[Dict[str, Any]],
+        estimates: List[Dict[str, int]],
+    ) -> None:
+        """
+        Publish a partitioned catalog (keeps the newest max_catalogs files)
+        """
+        if not self.active:
+            return
+        path = self._catalog_path(catalog_key)
+        if self._write(path, {"tools": partitioned_tools, "estimates": estimates}):
+            self._prune(path.parent, self.max_catalogs)
+
+    def _read(self, path: Path) -> Any:
+        try:
+            return codec.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, JSONDecodeError) as e:
+            self._error("read", e)
+            return None
+
+    def _write(self, path: Path, entry: Dict[str, Any]) -> bool:
+        tmp = None
+        try:
+            path.parent.mkdir(mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(codec.dumps(entry))
+            os.replace(tmp, path)
+        except OSError as e:
+            if tmp is not None:
+                Path(tmp).unlink(missing_ok=True)
+            self._error("write", e)
+            return False
+        self.writes += 1
+        return True
+
+    def _prune(self, directory: Path, keep: int) -> None:
+        try:
+            files = [(path.stat().st_mtime, path) for path in directory.glob("*.json")]
+        except OSError:
+            # 他ワーカーが同時に削除した
+            return
+        for _, path in sorted(files)[:-keep]:
+            path.unlink(missing_ok=True)
+
+    def _error(self, operation: str, error: Exception) -> None:
+        self.errors += 1
+        logger.warning("%s failed: %s", operation, error)
+
+    def drop_server(self, server_name: str) -> int:
+        """
+        Delete the published full schemas of one server (all workers)
+
+        Scans the schema files, so only meant for rare admin actions such
+        as disabling a server.
+
+        Returns:
+            Number of deleted files
+        """
+        if not self.active:
+            return 0
+        dropped = 0
+        for path in (self.directory / "schemas").glob("*.json"):
+            entry = self._read(path)
+            if isinstance(entry, dict) and entry.get("server") == server_name:
+                path.unlink(missing_ok=True)
+                dropped += 1
+        return dropped
+
+    def clear(self) -> None:
+        """
+        Delete all shared entries (all workers)
+        """
+        if not self.active:
+            return
+        for path in self.directory.glob("*/*.json"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "private": self._private,
+            "directory": str(self.directory),
+            "schema_hits": self.schema_hits,
+            "schema_misses": self.schema_misses,
+            "catalog_hits": self.catalog_hits,
+            "catalog_misses": self.catalog_misses,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
+
+
+# Global shared cache (one directory per host, shared by all workers)
+shared_schema_cache = SharedSchemaCache()
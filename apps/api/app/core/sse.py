@@ -0,0 +1,155 @@
+"""
+Byte-level Server-Sent Events framing for the MCP proxy
+
+Works on raw upstream byte chunks: assembles complete events and coalesces
+them into fewer, larger writes to the client.
+"""
+
+from typing import List, Optional
+
+
+class SSEEventFramer:
+    """
+    Assemble complete SSE events from arbitrary byte chunks
+
+    Line endings are normalized to LF; every returned event ends with a
+    blank line (b"\\n\\n").
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        # 前のチャンク末尾の \r（次のチャンクの \n と CRLF になり得る）
+        self._pending_cr = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Add an upstream chunk and return the events it completed
+
+        Only the new chunk is normalized and searched (plus one byte of
+        overlap), so a large event fed in many chunks stays O(n).
+
+        Args:
+            chunk: Raw bytes from the upstream response
+
+        Returns:
+            Complete events (possibly empty)
+        """
+        if self._pending_cr:
+            chunk = b"\r" + chunk
+            self._pending_cr = False
+        if b"\r" in chunk:
+            if chunk.endswith(b"\r"):
+                # CRLF がチャンク境界で分割された可能性: \r は次のチャンクへ持ち越す
+                chunk = chunk[:-1]
+                self._pending_cr = True
+            chunk = chunk.replace(b"\r\n", b"\n")
+
+        # バッファには "\n\n" が残っていないので、境界をまたぐ分の1バイト前から探す
+        start = max(len(self._buffer) - 1, 0)
+        self._buffer += chunk
+        end = self._buffer.rfind(b"\n\n", start)
+        if end == -1:
+            return []
+
+        complete = bytes(self._buffer[:end + 2])
+        del self._buffer[:end + 2]
+
+        events = complete.split(b"\n\n")
+        # split の最後の要素は終端後の空文字列
+        return [event + b"\n\n" for event in events[:-1] if event]
+
+    def flush(self) -> bytes:
+        """
+        Return whatever incomplete event is left when the upstream closes
+        """
+        remaining = bytes(self._buffer) + (b"\r" if self._pending_cr else b"")
+        self._buffer.clear()
+        self._pending_cr = False
+        return remaining
+
+
+def event_data(event: bytes) -> Optional[bytes]:
+    """
+    Join the `data:` lines of an event (SSE spec: joined with LF)
+
+    Args:
+        event: Complete event bytes
+
+    Returns:
+        Data payload, or None if the event has no data lines
+    """
+    data_lines = []
+    for line in event.split(b"\n"):
+        if line.startswith(b"data:"):
+            value = line[5:]
+            if value.startswith(b" "):
+                value = value[1:]
+            data_lines.append(value)
+
+    if not data_lines:
+        return None
+    return b"\n".join(data_lines)
+
+
+def replace_event_data(event: bytes, data: bytes) -> bytes:
+    """
+    Rebuild an event with a new data payload, keeping its other fields
+
+    Args:
+        event: Original event bytes
+        data: New single-line data payload
+
+    Returns:
+        Event bytes with `event:`/`id:` lines preserved and one `data:` line
+    """
+    fields = [
+        line for line in event.split(b"\n")
+        if line and not line.startswith(b"data:")
+    ]
+    fields.append(b"data: " + data)
+    return b"\n".join(fields) + b"\n\n"
+
+
+class SSEChunkCoalescer:
+    """
+    Coalesce outgoing events into larger writes
+
+    Flush policy:
+    - Events completed by the same upstream read are batched into one write,
+      split once batch_max_bytes is reached (bulk tool output)
+    - The caller drains after every upstream read, so a lone control frame
+      (endpoint, initialize response, notifications) is written immediately
+      and nothing waits for more upstream data
+    - batch_max_bytes = 0 writes every event on its own
+    """
+
+    def __init__(self, batch_max_bytes: int):
+        self.batch_max_bytes = batch_max_bytes
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+
+    def push(self, event: bytes) -> Optional[bytes]:
+        """
+        Queue an event
+
+        Returns:
+            Coalesced bytes to send now, or None to keep batching
+        """
+        self._pending.append(event)
+        self._pending_size += len(event)
+
+        if self._pending_size >= self.batch_max_bytes:
+            return self.drain()
+        return None
+
+    def drain(self) -> Optional[bytes]:
+        """
+        Take everything pending as one chunk
+        """
+        if not self._pending:
+            return None
+
+        chunk = b"".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        return chunk
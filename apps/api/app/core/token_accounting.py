@@ -0,0 +1,273 @@
+"""
+In-process token accounting for MCP traffic
+
+Counts tokens of tools/list, expandSchema and tools/call payloads with a
+pluggable tokenizer (tiktoken when installed, len//4 heuristic otherwise)
+and keeps per-tool, per-server and per-session totals.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import asyncio
+import hashlib
+import logging
+import threading
+
+from .config import settings
+from .json_codec import codec
+
+logger = logging.getLogger(__name__)
+
+
+class HeuristicTokenizer:
+    """
+    Approximate tokenizer: ~4 characters per token
+    """
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        return len(text) // 4
+
+
+class TiktokenTokenizer:
+    """
+    tiktoken BPE tokenizer (same encoding as tools/measurement)
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        import tiktoken
+
+        self.name = f"tiktoken:{encoding_name}"
+        self._encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        # 特殊トークン文字列もテキストとして数える
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+def create_tokenizer(kind: str = "auto", encoding_name: str = "cl100k_base"):
+    """
+    Tokenizer factory
+
+    Args:
+        kind: "auto" | "tiktoken" | "heuristic"
+        encoding_name: tiktoken encoding name
+
+    Returns:
+        Tokenizer with `name` and `count(text) -> int`
+    """
+    if kind == "heuristic":
+        return HeuristicTokenizer()
+
+    try:
+        return TiktokenTokenizer(encoding_name)
+    except ImportError as e:
+        # tiktoken未インストール（auto では想定内）
+        if kind == "tiktoken":
+            logger.warning("tiktoken unavailable (%s), falling back to heuristic", e)
+        return HeuristicTokenizer()
+    except Exception as e:
+        # BPEファイル取得失敗（オフライン環境など）
+        logger.warning("Failed to load tiktoken encoding %s (%s), falling back to heuristic", encoding_name, e)
+        return HeuristicTokenizer()
+
+
+class LazyTokenizer:
+    """
+    Tokenizer created on first use (or in the lifespan via TokenAccountant.load_tokenizer)
+
+    tiktoken.get_encoding may download the BPE file without a timeout, so it
+    must not run at import time.
+    """
+
+    def __init__(self, kind: str = "auto", encoding_name: str = "cl100k_base"):
+        self.kind = kind
+        self.encoding_name = encoding_name
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._tokenizer.name if self._tokenizer is not None else f"{self.kind} (not loaded)"
+
+    def load(self):
+        """
+        Create the tokenizer (blocking; once)
+        """
+        with self._lock:
+            if self._tokenizer is None:
+                tokenizer = create_tokenizer(self.kind, self.encoding_name)
+                # 読み込み中に fall_back された場合はそちらを優先
+                if self._tokenizer is None:
+                    self._tokenizer = tokenizer
+        return self._tokenizer
+
+    def fall_back(self, reason: str) -> None:
+        """
+        Use the heuristic tokenizer if loading has not finished
+        """
+        if self._tokenizer is None:
+            logger.warning("Tokenizer %s not loaded (%s), falling back to heuristic", self.kind, reason)
+            self._tokenizer = HeuristicTokenizer()
+
+    def count(self, text: str) -> int:
+        tokenizer = self._tokenizer or self.load()
+        return tokenizer.count(text)
+
+
+def _new_totals() -> Dict[str, int]:
+    return {"tokens": 0, "messages": 0}
+
+
+class TokenAccountant:
+    """
+    Live token totals by phase, tool, server and session
+
+    Token counts are memoized by content hash, so repeated tools/list
+    entries and expandSchema bodies are tokenized once.
+    count_* methods are thread-safe (large payloads are counted off the
+    event loop); record() is called from the event loop.
+    """
+
+    def __init__(self, tokenizer=None, max_memo: int = 16384, max_sessions: int = 1000):
+        """
+        Initialize TokenAccountant
+
+        Args:
+            tokenizer: Tokenizer instance (default: LazyTokenizer("auto"))
+            max_memo: Memoized token counts kept (LRU)
+            max_sessions: Sessions kept in per-session totals (LRU)
+        """
+        self.tokenizer = tokenizer or LazyTokenizer("auto")
+        self.max_memo = max_memo
+        self.max_sessions = max_sessions
+
+        self._memo: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.phases: Dict[str, Dict[str, int]] = {}
+        self.tools: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self.servers: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self.sessions: "OrderedDict[str, Dict[str, Dict[str, int]]]" = OrderedDict()
+        # tools/list で学習した tool -> server 対応（tools/call の集計用）
+        self.tool_servers: Dict[str, str] = {}
+
+    async def load_tokenizer(self, timeout: float) -> None:
+        """
+        Load a LazyTokenizer off the event loop (lifespan), heuristic after timeout seconds
+        """
+        load = getattr(self.tokenizer, "load", None)
+        if load is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.to_thread(load), timeout)
+        except asyncio.TimeoutError:
+            self.tokenizer.fall_back(f"loading took longer than {timeout}s")
+
+    def count_text(self, text: str) -> int:
+        """
+        Count tokens of a text (memoized by content hash)
+        """
+        digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+        with self._lock:
+            tokens = self._memo.get(digest)
+            if tokens is not None:
+                self._memo.move_to_end(digest)
+                return tokens
+
+        tokens = self.tokenizer.count(text)
+
+        with self._lock:
+            self._memo[digest] = tokens
+            if len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+        return tokens
+
+    def count_json(self, obj: Any) -> int:
+        """
+        Count tokens of a JSON value as it is sent on the wire
+        """
+        return self.count_text(codec.dumps(obj).decode())
+
+    def record(
+        self,
+        phase: str,
+        tokens: int,
+        tool_name: Optional[str] = None,
+        server_name: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> None:
+        """
+        Add tokens to the running totals
+
+        Args:
+            phase: "tools_list" | "expand_schema" | "tools_call"
+            tokens: Token count
+            tool_name: Tool the tokens belong to
+            server_name: MCP server that provides the tool
+            session_id: Client session
+        """
+        self._add(self.phases, phase, tokens)
+
+        if tool_name and server_name:
+            self.tool_servers[tool_name] = server_name
+        elif tool_name:
+            server_name = self.tool_servers.get(tool_name)
+
+        if tool_name:
+            self._add(self.tools.setdefault(tool_name, {}), phase, tokens)
+
+        if server_name:
+            self._add(self.servers.setdefault(server_name, {}), phase, tokens)
+
+        if session_id:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = {}
+                if len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(session_id)
+            self._add(session, phase, tokens)
+
+    @staticmethod
+    def _add(bucket: Dict[str, Dict[str, int]], phase: str, tokens: int) -> None:
+        totals = bucket.get(phase)
+        if totals is None:
+            totals = bucket[phase] = _new_totals()
+        totals["tokens"] += tokens
+        totals["messages"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current totals
+
+        Returns:
+            {"tokenizer", "phases", "tools", "servers", "sessions"}
+        """
+        return {
+            "tokenizer": self.tokenizer.name,
+            "phases": self.phases,
+            "tools": self.tools,
+            "servers": self.servers,
+            "sessions": dict(self.sessions),
+        }
+
+    def reset(self) -> None:
+        """
+        Clear totals (memoized counts are kept)
+        """
+        self.phases = {}
+        self.tools = {}
+        self.servers = {}
+        self.sessions = OrderedDict()
+
+
+# Global singleton instance
+token_accountant = TokenAccountant(
+    tokenizer=LazyTokenizer(settings.TOKENIZER, settings.TOKENIZER_ENCODING),
+    max_memo=settings.TOKEN_COUNT_MEMO_SIZE,
+    max_sessions=settings.TOKEN_ACCOUNTING_MAX_SESSIONS,
+)
@@ -0,0 +1,478 @@
+"""
+Lightweight span tracing for the MCP proxy
+
+Records spans for each stage of a proxied request (body parse, upstream
+connect, upstream wait, response copy, schema partitioning) and exports them
+as OTLP/JSON, either appended to a local file (one ExportTraceServiceRequest
+per line, readable by the OpenTelemetry Collector's otlpjsonfile receiver)
+or POSTed to an OTLP/HTTP collector.
+
+The current span lives in a contextvar, so spans opened inside a request
+handler nest automatically. The W3C traceparent header is accepted from the
+client and propagated to the upstream gateway.
+
+With TRACING_ENABLED=False span() returns a shared no-op span and nothing
+is recorded. Unsampled traces get a non-recording span that still carries
+the trace context, so child spans stay unsampled and the upstream call is
+sent the original trace id with the sampled flag cleared.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import random
+import time
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = ("file", "otlp")
+
+# OTLP SpanKind / StatusCode
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# httpcore trace イベント → 子スパン名（started〜complete/failed の区間）
+HTTP_STAGES = {
+    "connection.connect_tcp": "upstream.connect",
+    "connection.start_tls": "upstream.tls",
+    "http11.send_request_body": "upstream.send",
+    "http2.send_request_body": "upstream.send",
+    "http11.receive_response_headers": "upstream.wait",
+    "http2.receive_response_headers": "upstream.wait",
+    "http11.receive_response_body": "upstream.read",
+    "http2.receive_response_body": "upstream.read",
+}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    W3C traceparent ヘッダーを解析
+
+    Returns:
+        (trace_id, parent_span_id, sampled)、不正な値なら None
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    trace_id, span_id, flags = parts[1], parts[2], parts[3]
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        if int(trace_id, 16) == 0 or int(span_id, 16) == 0:
+            return None
+        sampled = bool(int(flags, 16) & 0x01)
+    except ValueError:
+        return None
+    return trace_id.lower(), span_id.lower(), sampled
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """
+    One timed stage of a request
+    """
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64) or 1:016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = STATUS_OK
+        self.status_message = ""
+        # 進行中の httpcore ステージ（HTTP_STAGES のキー → 子スパン）
+        self._stages: Dict[str, "Span"] = {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    @property
+    def traceparent(self) -> str:
+        """
+        Header value that makes this span the parent of the upstream call
+        """
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._finish(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _attribute_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class _NoopSpan:
+    """
+    Span returned while tracing is disabled
+    """
+
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+class NonRecordingSpan(_NoopSpan):
+    """
+    Span of a trace that is not sampled
+
+    Records nothing, but is made current like a real span so children
+    inherit the trace id and the not-sampled decision.
+    """
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        # 記録しないので新しいIDは作らず、受け取った親のIDをそのまま上流へ伝播する
+        self.span_id = span_id
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-00"
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class FileSpanExporter:
+    """
+    Append OTLP/JSON export requests to a local file (one per line)
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def export(self, payload: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as f:
+            f.write(payload + b"\n")
+
+
+class OTLPHttpSpanExporter:
+    """
+    POST OTLP/JSON export requests to a collector (e.g. http://collector:4318/v1/traces)
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, payload: bytes) -> None:
+        response = httpx.post(
+            self.endpoint,
+            content=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+
+class Tracer:
+    """
+    Span factory with a buffered background exporter
+
+    start() (app lifespan) launches the exporter task; until then, and in
+    scripts/tests, flush() exports buffered spans synchronously.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        exporter: Optional[str] = None,
+        file_path: Optional[Path] = None,
+        otlp_endpoint: Optional[str] = None,
+        service_name: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        export_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+    ):
+        """
+        Initialize Tracer (defaults come from settings)
+
+        Args:
+            enabled: Record spans at all
+            exporter: "file" | "otlp"
+            file_path: OTLP/JSON lines file for exporter="file"
+            otlp_endpoint: OTLP/HTTP traces URL for exporter="otlp"
+            service_name: service.name resource attribute
+            sample_rate: Fraction of new traces recorded (incoming traceparent
+                sampled flag is honoured instead when present)
+            export_interval: Seconds between background exports
+            max_queue: Finished spans buffered before new ones are dropped
+        """
+        self.enabled = settings.TRACING_ENABLED if enabled is None else enabled
+        exporter = exporter or settings.TRACING_EXPORTER
+        if exporter not in EXPORTERS:
+            raise ValueError(f"exporter must be one of {EXPORTERS}, got {exporter!r}")
+        self.exporter_name = exporter
+        if exporter == "otlp":
+            self.exporter = OTLPHttpSpanExporter(otlp_endpoint or settings.TRACING_OTLP_ENDPOINT)
+        else:
+            self.exporter = FileSpanExporter(file_path or settings.TRACING_FILE)
+
+        self.service_name = service_name or settings.TRACING_SERVICE_NAME
+        self.sample_rate = settings.TRACING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.export_interval = export_interval or settings.TRACING_EXPORT_INTERVAL
+        self.max_queue = max_queue or settings.TRACING_MAX_QUEUE
+
+        self._finished: Deque[Span] = deque()
+        self._exporter_task: Optional[asyncio.Task] = None
+
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+
+    async def start(self) -> None:
+        """
+        Start the background exporter (called from the app lifespan)
+        """
+        if self.enabled and self._exporter_task is None:
+            self._exporter_task = asyncio.create_task(self._run_exporter())
+
+    async def close(self) -> None:
+        """
+        Stop the exporter and export the remaining spans (called on app shutdown)
+        """
+        if self._exporter_task is not None:
+            self._exporter_task.cancel()
+            try:
+                await self._exporter_task
+            except asyncio.CancelledError:
+                pass
+            self._exporter_task = None
+        if self._finished:
+            await asyncio.to_thread(self.flush)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        traceparent: Optional[str] = None,
+        **attributes: Any,
+    ) -> Iterator[Any]:
+        """
+        Open a span as a child of the current one for the duration of the block
+
+        Args:
+            name: Span name (stage)
+            kind: OTLP span kind
+            traceparent: Incoming W3C traceparent (only used for root spans)
+            **attributes: Span attributes (None values are skipped)
+
+        Yields:
+            Span (or a no-op / non-recording span when not recording)
+        """
+        with self.activate(self.start_span(name, kind, traceparent, **attributes)) as span:
+            yield span
+
+    @contextmanager
+    def activate(self, span: Any, end_on_exit: bool = True) -> Iterator[Any]:
+        """
+        Make span current for the duration of the block
+
+        Args:
+            span: Span from start_span()
+            end_on_exit: End the span when the block exits. With False the
+                caller ends it later (e.g. after a streamed response body);
+                it is still ended if the block raises.
+        """
+        if span is NOOP_SPAN:
+            yield span
+            return
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            span.end()
+            raise
+        finally:
+            _current_span.reset(token)
+            if end_on_exit:
+                span.end()
+
+    def start_span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        traceparent: Optional[str] = None,
+        **attributes: Any,
+    ) -> Any:
+        """
+        Start a span without making it current (caller must end() it)
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+
+        parent = _current_span.get()
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+            if isinstance(parent, NonRecordingSpan):
+                return NonRecordingSpan(trace_id, parent_id)
+        else:
+            incoming = parse_traceparent(traceparent)
+            if incoming is not None:
+                trace_id, parent_id, sampled = incoming
+            else:
+                trace_id, parent_id = f"{random.getrandbits(128) or 1:032x}", None
+                sampled = random.random() < self.sample_rate
+            if not sampled:
+                return NonRecordingSpan(trace_id, parent_id or f"{random.getrandbits(64) or 1:016x}")
+
+        attributes = {key: value for key, value in attributes.items() if value is not None}
+        return Span(self, name, trace_id, parent_id, kind, attributes)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def http_event(self, event_name: str) -> None:
+        """
+        Turn httpcore trace events into child spans of the current span
+
+        Called from the upstream pool's trace extension, which runs in the
+        task that issued the request (so the current span is the caller's).
+        """
+        parent = _current_span.get()
+        if parent is None or isinstance(parent, NonRecordingSpan):
+            return
+        stage, _, phase = event_name.rpartition(".")
+        name = HTTP_STAGES.get(stage)
+        if name is None:
+            return
+
+        if phase == "started":
+            parent._stages[stage] = Span(
+                self, name, parent.trace_id, parent.span_id, SPAN_KIND_CLIENT
+            )
+        elif phase in ("complete", "failed"):
+            child = parent._stages.pop(stage, None)
+            if child is not None:
+                if phase == "failed":
+                    child.set_error(f"{stage} failed")
+                child.end()
+
+    def _finish(self, span: Span) -> None:
+        if len(self._finished) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._finished.append(span)
+
+    def flush(self) -> None:
+        """
+        Export all buffered spans in one OTLP request
+        """
+        spans: List[Span] = []
+        while self._finished:
+            spans.append(self._finished.popleft())
+        if not spans:
+            return
+
+        try:
+            self.exporter.export(self._encode(spans))
+            self.exported += len(spans)
+        except Exception as e:
+            self.export_errors += 1
+            logger.warning("Export of %d spans failed: %s", len(spans), e)
+
+    def _encode(self, spans: List[Span]) -> bytes:
+        request = {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": self.service_name}},
+                    ],
+                },
+                "scopeSpans": [{
+                    "scope": {"name": "airis-mcp-gateway.proxy"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }],
+        }
+        return json.dumps(request, separators=(",", ":")).encode()
+
+    async def _run_exporter(self) -> None:
+        while True:
+            await asyncio.sleep(self.export_interval)
+            if self._finished:
+                await asyncio.to_thread(self.flush)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "exporter": self.exporter_name,
+            "buffered": len(self._finished),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "export_errors": self.export_errors,
+        }
+
+
+# Global tracer (shared across FastAPI requests)
+tracer = Tracer()
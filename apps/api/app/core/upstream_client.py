@@ -0,0 +1,228 @@
+"""
+Shared upstream HTTP client pool for the MCP proxy
+
+A single httpx.AsyncClient, owned by the FastAPI lifespan, is shared by the
+SSE proxy and the JSON-RPC proxy so calls to MCP_GATEWAY_URL reuse
+keep-alive connections instead of paying a TCP connect per request.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import importlib.util
+import logging
+import time
+
+import httpx
+
+from . import metrics
+from .config import settings
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class RouteLimiter:
+    """
+    Per-route concurrency limit with saturation counters
+
+    SSE streams hold a pooled connection for their whole lifetime, so each
+    route gets its own cap to keep long-lived streams from starving tools/call.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.waits = 0
+        self.max_wait_ms = 0.0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        """
+        Hold one slot of this route for the duration of the block
+        """
+        started = None
+        if self._semaphore.locked():
+            # 上限到達: 待ち時間を計測
+            self.waits += 1
+            self.waiting += 1
+            started = time.perf_counter()
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            waited = time.perf_counter() - started
+            self.max_wait_ms = max(self.max_wait_ms, waited * 1000)
+            metrics.upstream_route_wait_seconds.observe(waited, self.name)
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "waits": self.waits,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+        }
+
+
+class UpstreamClientPool:
+    """
+    Lifespan-managed pooled client for the Docker MCP Gateway
+
+    Usage:
+        async with upstream_pool.route("rpc"):
+            response = await upstream_pool.client.post(
+                "/", content=body, extensions=upstream_pool.extensions
+            )
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout: Optional[float] = None,
+        http2: Optional[bool] = None,
+        route_limits: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Initialize UpstreamClientPool (defaults come from settings)
+
+        Args:
+            base_url: MCP Gateway base URL
+            max_connections: Total connection limit of the pool
+            max_keepalive_connections: Idle connections kept for reuse
+            keepalive_expiry: Seconds an idle connection is kept alive
+            timeout: Default request timeout in seconds
+            http2: Enable HTTP/2 (requires the optional `h2` package)
+            route_limits: Concurrency limit per route name ("sse", "rpc")
+        """
+        self.base_url = base_url or settings.MCP_GATEWAY_URL
+        self.max_connections = max_connections or settings.MCP_UPSTREAM_MAX_CONNECTIONS
+        self.max_keepalive_connections = (
+            max_keepalive_connections or settings.MCP_UPSTREAM_MAX_KEEPALIVE_CONNECTIONS
+        )
+        self.keepalive_expiry = keepalive_expiry or settings.MCP_UPSTREAM_KEEPALIVE_EXPIRY
+        self.timeout = timeout or settings.MCP_UPSTREAM_TIMEOUT
+        self.http2 = settings.MCP_UPSTREAM_HTTP2 if http2 is None else http2
+
+        if route_limits is None:
+            route_limits = {
+                "sse": settings.MCP_UPSTREAM_SSE_MAX_STREAMS,
+                "rpc": settings.MCP_UPSTREAM_RPC_MAX_CONCURRENCY,
+            }
+        self.routes: Dict[str, RouteLimiter] = {
+            name: RouteLimiter(name, limit) for name, limit in route_limits.items()
+        }
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self.new_connections = 0
+
+    async def start(self) -> None:
+        """
+        Create the shared client (called from the app lifespan)
+        """
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def close(self) -> None:
+        """
+        Close pooled connections (called on app shutdown)
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Shared AsyncClient
+
+        Created lazily when used outside the app lifespan (scripts, tests).
+        """
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    @asynccontextmanager
+    async def route(self, name: str) -> AsyncIterator[None]:
+        """
+        Hold a concurrency slot of the given route
+        """
+        async with self.routes[name].acquire():
+            yield
+
+    @property
+    def extensions(self) -> Dict[str, Any]:
+        """
+        Request extensions that count fresh TCP connects and feed connect /
+        wait / read timings to the tracer (httpcore trace hook)
+        """
+        return {"trace": self._trace}
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+        if tracer.enabled:
+            tracer.http_event(event_name)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool saturation and connection reuse metrics
+
+        Returns:
+            {"requests", "new_connections", "reused_connections", "reuse_ratio",
+             "in_flight", "max_connections", "saturation", "routes"}
+        """
+        requests = sum(route.requests for route in self.routes.values())
+        in_flight = sum(route.in_flight for route in self.routes.values())
+        reused = max(requests - self.new_connections, 0)
+
+        return {
+            "requests": requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / requests, 4) if requests else 0.0,
+            "in_flight": in_flight,
+            "max_connections": self.max_connections,
+            "saturation": round(in_flight / self.max_connections, 4),
+            "http2": self.http2,
+            "routes": {name: route.stats() for name, route in self.routes.items()},
+        }
+
+
+# Global singleton instance (shared across FastAPI requests)
+upstream_pool = UpstreamClientPool()
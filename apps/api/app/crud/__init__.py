@@ -1,3 +1,3 @@
-from . import mcp_server, secret
+from . import mcp_server, secret, tool_schema
 
-__all__ = ["mcp_server", "secret"]
+__all__ = ["mcp_server", "secret", "tool_schema"]
@@ -0,0 +1,76 @@
+"""CRUD operations for persisted tool schemas"""
+from typing import Any, Iterable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
+from ..models.tool_schema import ToolSchema, utc_now
+
+
+async def get_latest_tool_schema(
+    db: AsyncSession,
+    tool_name: str,
+    server_name: str | None = None
+) -> ToolSchema | None:
+    """Get the most recently seen schema of a tool (of any server unless server_name is given)"""
+    query = select(ToolSchema).where(ToolSchema.tool_name == tool_name)
+    if server_name is not None:
+        query = query.where(ToolSchema.server_name == server_name)
+    result = await db.execute(query.order_by(ToolSchema.updated_at.desc()).limit(1))
+    return result.scalar_one_or_none()
+
+
+async def get_latest_tool_schemas(db: AsyncSession, limit: int = 4096) -> list[ToolSchema]:
+    """Get the most recently seen schema of each (server, tool) (most recent first)"""
+    # (server, tool) 毎の最新行だけをDB側で選び、件数上限もSQLで適用する
+    ranked = select(
+        ToolSchema.id,
+        func.row_number().over(
+            partition_by=(ToolSchema.server_name, ToolSchema.tool_name),
+            order_by=(ToolSchema.updated_at.desc(), ToolSchema.id.desc()),
+        ).label("rank"),
+    ).subquery()
+    query = (
+        select(ToolSchema)
+        .join(ranked, ToolSchema.id == ranked.c.id)
+        .where(ranked.c.rank == 1)
+        .order_by(ToolSchema.updated_at.desc(), ToolSchema.id.desc())
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return list(result.scalars())
+
+
+async def upsert_tool_schemas(
+    db: AsyncSession,
+    entries: Iterable[tuple[str, str, str | None, dict[str, Any]]]
+) -> int:
+    """
+    Create or touch tool schemas
+
+    entries: (tool_name, schema_hash, server_name, input_schema); an unknown
+    server is stored as "".
+    Returns the number of newly created rows.
+    """
+    entries = {(server or "", name, digest): schema for name, digest, server, schema in entries}
+    if not entries:
+        return 0
+
+    result = await db.execute(
+        select(ToolSchema).where(
+            tuple_(ToolSchema.server_name, ToolSchema.tool_name, ToolSchema.schema_hash).in_(list(entries))
+        )
+    )
+    now = utc_now()
+    for existing in result.scalars():
+        existing.updated_at = now
+        entries.pop((existing.server_name, existing.tool_name, existing.schema_hash))
+
+    for (server_name, tool_name, schema_hash), input_schema in entries.items():
+        db.add(ToolSchema(
+            tool_name=tool_name,
+            schema_hash=schema_hash,
+            server_name=server_name,
+            input_schema=input_schema,
+            updated_at=now,
+        ))
+    await db.commit()
+    return len(entries)
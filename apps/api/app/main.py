@@ -1,11 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .core.config import settings
+from .core.metrics import MetricsMiddleware, registry as metrics_registry
+from .core.protocol_logger import protocol_logger
+from .core.schema_store import schema_store
+from .core.schema_usage import schema_usage
+from .core.token_accounting import token_accountant
+from .core.tracing import tracer
+from .core.upstream_client import upstream_pool
 from .api.routes import api_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan: shared upstream resources, protocol log writer, trace exporter, schema store warm-up and learned schema hot set"""
+    await token_accountant.load_tokenizer(settings.TOKENIZER_LOAD_TIMEOUT)
+    await upstream_pool.start()
+    await protocol_logger.start()
+    await tracer.start()
+    await schema_store.warm()
+    await schema_usage.load()
+    yield
+    await schema_store.flush()
+    await schema_usage.save_async()
+    await tracer.close()
+    await protocol_logger.close()
+    await upstream_pool.close()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -17,6 +45,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics middleware (request count / duration per route)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
@@ -27,6 +59,17 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -1,5 +1,6 @@
 from .mcp_server import MCPServer
 from .secret import Secret
 from .mcp_server_state import MCPServerState
+from .tool_schema import ToolSchema
 
-__all__ = ["MCPServer", "Secret", "MCPServerState"]
+__all__ = ["MCPServer", "Secret", "MCPServerState", "ToolSchema"]
@@ -0,0 +1,43 @@
+"""Tool input schema model for expandSchema persistence"""
+from sqlalchemy import String, JSON, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, timezone
+from ..core.database import Base
+
+
+def utc_now() -> datetime:
+    """Current UTC time as a naive datetime (the timestamp columns have no time zone)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ToolSchema(Base):
+    """Full inputSchema of an MCP tool, keyed by server + tool name + schema hash"""
+
+    __tablename__ = "mcp_tool_schemas"
+    __table_args__ = (
+        UniqueConstraint(
+            "server_name", "tool_name", "schema_hash",
+            name="uq_mcp_tool_schemas_server_name_tool_name_schema_hash"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    tool_name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    schema_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    # "" = server unknown (tools/list without _meta.server)
+    server_name: Mapped[str] = mapped_column(
+        String(255), default="", server_default="", nullable=False, index=True
+    )
+    input_schema: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+    # Timestamps (updated_at = last time the schema was seen in tools/list)
+    created_at: Mapped[datetime] = mapped_column(default=utc_now, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        default=utc_now,
+        onupdate=utc_now,
+        nullable=False,
+        index=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<ToolSchema(tool={self.tool_name}, hash={self.schema_hash})>"
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+JSON codec benchmark (stdlib vs orjson on MCP traffic)
+
+Replays MCP messages through each codec the way the proxy uses them:
+decoding SSE frames / POST bodies, encoding rewritten tools/list frames,
+rendering expandSchema results and serializing protocol log lines.
+
+Messages come from a recorded protocol log (--log-file, plain or rotated
+.gz segment) or, without one, from synthetic tools/list, tools/call and
+expandSchema traffic built from the partitioner benchmark schemas.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_json_codec [--log-file logs/protocol_messages.jsonl] [--iterations 20]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app.core.json_codec import OrjsonCodec, StdlibCodec
+from app.core.protocol_log_storage import open_compressed
+
+from .bench_schema_partitioner import notion_like_schema, object_schema, stripe_like_schema
+
+
+def recorded_messages(log_file: Path) -> List[Dict[str, Any]]:
+    """
+    プロトコルログから記録済みメッセージを読み込む（要約・blob参照の行は除く）
+    """
+    compression = {".gz": "gzip", ".zst": "zstd"}.get(log_file.suffix, "none")
+    messages = []
+    with open_compressed(log_file, "rb", compression) as f:
+        for line in f:
+            entry = json.loads(line)
+            if "message" in entry:
+                messages.append(entry["message"])
+    return messages
+
+
+def synthetic_messages() -> List[Dict[str, Any]]:
+    """
+    tools/list（25サーバー相当）・tools/call・expandSchema の合成トラフィック
+    """
+    # 大半は小さなスキーマ、数個だけ Stripe/Notion 規模
+    tools = [
+        {"name": f"server_{i // 8}_tool_{i}", "description": "Synthetic tool", "inputSchema": object_schema(2, 4)}
+        for i in range(198)
+    ]
+    tools.append({"name": "stripe_create_payment_intent", "inputSchema": stripe_like_schema()})
+    tools.append({"name": "notion_create_page", "inputSchema": notion_like_schema()})
+    messages: List[Dict[str, Any]] = [
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 1, "result": {"tools": tools}},
+    ]
+    for i in range(200):
+        messages.append({
+            "jsonrpc": "2.0", "id": 100 + i, "method": "tools/call",
+            "params": {"name": f"server_{i % 25}_tool_{i}", "arguments": {"query": "日本語のクエリ", "limit": i}},
+        })
+        messages.append({
+            "jsonrpc": "2.0", "id": 100 + i,
+            "result": {"content": [{"type": "text", "text": "result line\n" * (50 + i)}]},
+        })
+    return messages
+
+
+def legacy_dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    旧実装（json.dumps の既定の区切り・ASCIIエスケープ）
+    """
+    return (json.dumps(obj, indent=2) if pretty else json.dumps(obj)).encode()
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def run(messages: List[Dict[str, Any]], iterations: int) -> None:
+    frames = [json.dumps(message).encode() for message in messages]
+    schemas = [
+        tool["inputSchema"]
+        for message in messages
+        if isinstance(message.get("result"), dict)
+        for tool in message["result"].get("tools", [])
+        if "inputSchema" in tool
+    ] or [stripe_like_schema()]
+    log_entries = [
+        {"timestamp": "2026-01-01T00:00:00", "direction": "server→client", "message": message,
+         "metadata": {"phase": "tools_call", "session_id": "bench"}}
+        for message in messages
+    ]
+    print(f"{len(messages)} messages, {sum(len(frame) for frame in frames) / 1_048_576:.1f} MB of frames")
+
+    codecs: Dict[str, Any] = {"stdlib": StdlibCodec()}
+    try:
+        codecs["orjson"] = OrjsonCodec()
+    except ImportError:
+        print("  (orjson not installed: only the stdlib codec is measured)")
+
+    # ケース毎の1パスあたりの処理量（MB/s の算出用）
+    sizes = {
+        "decode frames": sum(len(frame) for frame in frames),
+        "encode frames": sum(len(frame) for frame in frames),
+        "expandSchema render": sum(len(legacy_dumps(schema, pretty=True)) for schema in schemas),
+        "protocol log lines": sum(len(legacy_dumps(entry)) for entry in log_entries),
+    }
+    cases: Dict[str, Dict[str, Callable[[], Any]]] = {
+        "decode frames": {
+            "legacy json": lambda: [json.loads(frame) for frame in frames],
+            **{name: (lambda c=c: [c.loads(frame) for frame in frames]) for name, c in codecs.items()},
+        },
+        "encode frames": {
+            "legacy json": lambda: [legacy_dumps(message) for message in messages],
+            **{name: (lambda c=c: [c.dumps(message) for message in messages]) for name, c in codecs.items()},
+        },
+        "expandSchema render": {
+            "legacy json": lambda: [legacy_dumps(schema, pretty=True) for schema in schemas],
+            **{name: (lambda c=c: [c.dumps(schema, pretty=True) for schema in schemas]) for name, c in codecs.items()},
+        },
+        "protocol log lines": {
+            "legacy json": lambda: [legacy_dumps(entry) + b"\n" for entry in log_entries],
+            **{name: (lambda c=c: [c.dumps(entry) + b"\n" for entry in log_entries]) for name, c in codecs.items()},
+        },
+    }
+
+    for case, fns in cases.items():
+        mb = sizes[case] / 1_048_576
+        print(f"\n{case} ({mb:.1f} MB)")
+        baseline = None
+        for name, fn in fns.items():
+            seconds = measure(fn, iterations)
+            baseline = baseline or seconds
+            print(f"  {name:<12} {seconds * 1000:>9.2f} ms/pass  {mb / seconds:>8.1f} MB/s  {baseline / seconds:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--log-file", type=Path, help="Recorded protocol log (default: synthetic traffic)")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    messages = recorded_messages(args.log_file) if args.log_file else synthetic_messages()
+    run(messages, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
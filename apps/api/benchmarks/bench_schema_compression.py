@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+tools/list token benchmark: partitioning vs partitioning + compression
+
+The bundled mcp-config.json lists the servers but not their tool schemas,
+so each server (enabled or disabled) gets a synthetic set of tools built
+from the Stripe/Notion-sized schemas of bench_schema_partitioner, with long
+descriptions and large enums like real servers ship.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_schema_compression [--tools-per-server 6] [--description-chars 160]
+"""
+
+import argparse
+import copy
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.core.catalog_cache import PartitionedCatalogCache
+from app.core.schema_compression import SchemaCompressor
+from app.core.schema_partitioning import SchemaPartitioner
+from app.core.token_accounting import token_accountant
+
+from .bench_schema_partitioner import notion_like_schema, object_schema, stripe_like_schema
+
+MCP_CONFIG = Path(__file__).resolve().parents[3] / "mcp-config.json"
+
+LONG_DESCRIPTION = (
+    "Optional. The identifier of the resource to operate on. When omitted, the server falls back to "
+    "the default resource configured for the current workspace or account. Identifiers are case "
+    "sensitive and must be URL-safe; use the corresponding list tool to discover valid values. "
+    "See the upstream API reference for the full set of constraints and deprecation notes."
+)
+
+
+def bundled_servers() -> List[str]:
+    """
+    mcp-config.json のサーバー名（__disabled_ 付きも含む、コメントは除く）
+    """
+    servers = json.loads(MCP_CONFIG.read_text())["mcpServers"]
+    return [
+        name.removeprefix("__disabled_")
+        for name in servers
+        if not name.startswith("__comment")
+    ]
+
+
+def list_tool_schema() -> Dict[str, Any]:
+    """
+    一覧系ツール（ページング + ソート・フィルタ用の大きい enum）
+    """
+    return {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {
+            "cursor": {"type": "string", "description": LONG_DESCRIPTION},
+            "limit": {"type": "integer", "description": LONG_DESCRIPTION, "default": 50},
+            "sort": {"type": "string", "description": "Sort order", "enum": [f"field_{i}" for i in range(40)]},
+            "timezone": {
+                "type": "string",
+                "description": "IANA timezone",
+                "enum": [f"Area/City_{i}" for i in range(120)],
+            },
+            "filter": object_schema(2, 4),
+        },
+        "required": [],
+        "additionalProperties": False,
+    }
+
+
+def server_tools(server: str, count: int) -> List[Dict[str, Any]]:
+    builders = (stripe_like_schema, list_tool_schema, notion_like_schema, lambda: object_schema(3, 3))
+    tools = []
+    for i in range(count):
+        schema = builders[i % len(builders)]()
+        for value in schema["properties"].values():
+            value.setdefault("description", LONG_DESCRIPTION)
+        tools.append({
+            "name": f"{server}_tool_{i}",
+            "description": f"{server} tool {i}",
+            "inputSchema": schema,
+            "_meta": {"server": server},
+        })
+    return tools
+
+
+def run(tools_per_server: int, description_chars: int) -> None:
+    servers = bundled_servers()
+    catalog = [tool for server in servers for tool in server_tools(server, tools_per_server)]
+    compressor = SchemaCompressor(enabled=True, description_max_chars=description_chars)
+
+    full = token_accountant.count_json(catalog)
+    partitioned = PartitionedCatalogCache(SchemaPartitioner()).partition_tools(copy.deepcopy(catalog))
+    compressed = PartitionedCatalogCache(SchemaPartitioner(), compressor=compressor).partition_tools(
+        copy.deepcopy(catalog)
+    )
+    partitioned_tokens = token_accountant.count_json(partitioned)
+    compressed_tokens = token_accountant.count_json(compressed)
+
+    print(f"\n{len(servers)} bundled servers x {tools_per_server} tools ({token_accountant.tokenizer.name})")
+    print(f"  {'full':<32} {full:>10,} tokens")
+    print(f"  {'partitioned':<32} {partitioned_tokens:>10,} tokens  ({1 - partitioned_tokens / full:.1%} vs full)")
+    print(
+        f"  {'partitioned + compressed':<32} {compressed_tokens:>10,} tokens  "
+        f"({1 - compressed_tokens / full:.1%} vs full, {1 - compressed_tokens / partitioned_tokens:.1%} vs partitioned)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tools-per-server", type=int, default=6)
+    parser.add_argument("--description-chars", type=int, default=160)
+    args = parser.parse_args()
+    run(args.tools_per_server, args.description_chars)
+
+
+if __name__ == "__main__":
+    main()
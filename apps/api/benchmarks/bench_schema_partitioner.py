@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+SchemaPartitioner micro-benchmark (time + allocations)
+
+Compares the copy-on-write SchemaPartitioner with the previous
+deepcopy-based behaviour on Stripe/Notion-sized synthetic schemas.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_schema_partitioner [--iterations 200]
+"""
+
+import argparse
+import copy
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from app.core.schema_partitioning import KEPT_PROPERTY_KEYS, SchemaPartitioner
+
+
+DESCRIPTION = (
+    "An arbitrary string attached to the object. Often useful for displaying to users "
+    "and for storing additional structured information about the object."
+)
+
+
+def object_schema(depth: int, width: int) -> Dict[str, Any]:
+    """
+    ネストしたobjectスキーマを生成
+    """
+    if depth == 0:
+        return {"type": "string", "description": DESCRIPTION, "maxLength": 5000}
+
+    return {
+        "type": "object",
+        "description": DESCRIPTION,
+        "properties": {
+            f"field_{depth}_{i}": object_schema(depth - 1, width) for i in range(width)
+        },
+        "required": [f"field_{depth}_0"],
+    }
+
+
+def stripe_like_schema() -> Dict[str, Any]:
+    """
+    Stripe payment_intents.create 規模（トップレベル約60, ネスト3階層）
+    """
+    properties = {}
+    for i in range(60):
+        if i % 3 == 0:
+            properties[f"param_{i}"] = object_schema(3, 4)
+        elif i % 3 == 1:
+            properties[f"param_{i}"] = {
+                "type": "string",
+                "description": DESCRIPTION,
+                "enum": [f"value_{n}" for n in range(25)],
+            }
+        else:
+            properties[f"param_{i}"] = {"type": "integer", "description": DESCRIPTION}
+    return {"type": "object", "properties": properties, "required": ["param_0", "param_1"]}
+
+
+def notion_like_schema() -> Dict[str, Any]:
+    """
+    Notion pages.create 規模（rich_text ブロックの anyOf を多用）
+    """
+    rich_text = {
+        "type": "array",
+        "items": {
+            "anyOf": [object_schema(2, 5) for _ in range(4)],
+        },
+    }
+    properties = {f"block_{i}": copy.deepcopy(rich_text) for i in range(20)}
+    properties["parent"] = object_schema(2, 4)
+    return {"type": "object", "properties": properties}
+
+
+# 旧実装（deepcopyベース）の再現
+def legacy_partition(schema: Dict[str, Any], depth: int = 1) -> Dict[str, Any]:
+    partitioned = copy.deepcopy(schema)
+    if "properties" in partitioned and depth > 0:
+        partitioned["properties"] = {
+            key: {kept: value[kept] for kept in KEPT_PROPERTY_KEYS if kept in value}
+            if isinstance(value, dict) else value
+            for key, value in partitioned["properties"].items()
+        }
+    if "items" in partitioned and isinstance(partitioned["items"], dict):
+        partitioned["items"] = legacy_partition(partitioned["items"], depth - 1)
+    return partitioned
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    result = fn()  # noqa: F841 - 結果を保持したまま確保ブロック数を数える
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+
+    return {"us": elapsed / iterations * 1e6, "peak_kb": peak / 1024, "blocks": blocks}
+
+
+def run(iterations: int) -> None:
+    for name, schema in (("stripe-like", stripe_like_schema()), ("notion-like", notion_like_schema())):
+        partitioner = SchemaPartitioner()
+        partitioner.store_full_schema("tool", schema)
+        path = [next(iter(schema["properties"]))]
+
+        cases = {
+            "partition (legacy deepcopy)": lambda: legacy_partition(schema),
+            "partition (copy-on-write)": lambda: partitioner.partition_schema(schema),
+            "store (legacy deepcopy)": lambda: copy.deepcopy(schema),
+            "store (copy-on-write)": lambda: partitioner.store_full_schema("tool", schema),
+            "expand (legacy deepcopy)": lambda: copy.deepcopy(schema["properties"][path[0]]),
+            "expand (copy-on-write)": lambda: partitioner.expand_schema("tool", path),
+        }
+
+        print(f"\n{name}: {len(str(schema)) / 1024:.0f}KB schema")
+        for case, fn in cases.items():
+            result = measure(fn, iterations)
+            print(
+                f"  {case:<30} {result['us']:>10,.1f} µs/op  "
+                f"peak {result['peak_kb']:>8,.1f} KB  {result['blocks']:>7,} retained blocks"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    run(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
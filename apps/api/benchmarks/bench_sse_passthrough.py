@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+SSE passthrough benchmark (frames/sec)
+
+Streams a synthetic upstream SSE body full of large tools/call results
+through proxy_sse_stream and compares it with the legacy per-frame
+json.loads/json.dumps loop.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_sse_passthrough [--frames 2000] [--payload-kb 64]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.api.endpoints import mcp_proxy
+from app.core.upstream_client import UpstreamClientPool
+
+
+def build_sse_body(frames: int, payload_kb: int) -> bytes:
+    """
+    tools/call 結果フレームを並べたSSEボディを生成
+    """
+    text = ("x" * 1023 + "\n") * payload_kb
+    events = []
+    for i in range(frames):
+        message = {
+            "jsonrpc": "2.0",
+            "id": i,
+            "result": {"content": [{"type": "text", "text": text}]},
+        }
+        events.append(f"event: message\ndata: {json.dumps(message)}\n\n")
+    return "".join(events).encode()
+
+
+async def legacy_stream(client: httpx.AsyncClient):
+    """
+    旧実装: 全dataフレームを json.loads → json.dumps
+    """
+    async with client.stream("GET", "/sse") as response:
+        async for line in response.aiter_lines():
+            if not line:
+                yield "\n"
+                continue
+            if line.startswith("data: "):
+                data = json.loads(line[6:])
+                yield f"data: {json.dumps(data)}\n\n"
+            else:
+                yield f"{line}\n"
+
+
+class _Request:
+    headers = {}
+
+
+class _UpstreamStream(httpx.AsyncByteStream):
+    """
+    上流のソケット読み込みを模した64KB単位のチャンク
+    """
+
+    def __init__(self, body: bytes, chunk_size: int = 65536):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+async def run(frames: int, payload_kb: int) -> None:
+    body = build_sse_body(frames, payload_kb)
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200,
+            stream=_UpstreamStream(body),
+            headers={"Content-Type": "text/event-stream"},
+        )
+    )
+
+    pool = UpstreamClientPool(base_url="http://gateway.bench")
+    pool._client = httpx.AsyncClient(base_url="http://gateway.bench", transport=transport)
+    mcp_proxy.upstream_pool = pool
+
+    results = {}
+    sends = {}
+
+    name = "legacy (aiter_lines + json)"
+    sends[name] = 0
+    started = time.perf_counter()
+    async for _ in legacy_stream(pool.client):
+        sends[name] += 1
+    results[name] = time.perf_counter() - started
+
+    name = "proxy_sse_stream"
+    sends[name] = 0
+    started = time.perf_counter()
+    async for _ in mcp_proxy.proxy_sse_stream(_Request()):
+        sends[name] += 1
+    results[name] = time.perf_counter() - started
+
+    await pool.close()
+
+    print(f"frames={frames} payload={payload_kb}KB total={len(body) / 1_048_576:.1f}MB")
+    for name, elapsed in results.items():
+        print(
+            f"  {name:<28} {frames / elapsed:>10,.0f} frames/s  "
+            f"{sends[name]:>7,} sends  ({elapsed:.3f}s)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--payload-kb", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(run(args.frames, args.payload_kb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,694 @@
+"""
+Tests for the MCP proxy (SSE stream and JSON-RPC POST endpoint)
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from apps.api.app.api.endpoints import mcp_proxy
+from apps.api.app.core.upstream_client import UpstreamClientPool
+
+
+class FakeRequest:
+    headers = {}
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Upstream body delivered in fixed-size raw chunks"""
+
+    def __init__(self, body: bytes, chunk_size: int = 16):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+def use_upstream_body(monkeypatch, body: bytes) -> UpstreamClientPool:
+    """Route the shared upstream pool to a canned SSE body"""
+    pool = UpstreamClientPool(base_url="http://gateway.test")
+    pool._client = httpx.AsyncClient(
+        base_url="http://gateway.test",
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200,
+                stream=ChunkedStream(body),
+                headers={"Content-Type": "text/event-stream"},
+            )
+        ),
+    )
+    monkeypatch.setattr(mcp_proxy, "upstream_pool", pool)
+    return pool
+
+
+async def collect(request) -> str:
+    chunks = []
+    async for chunk in mcp_proxy.proxy_sse_stream(request):
+        chunks.append(chunk if isinstance(chunk, str) else chunk.decode())
+    return "".join(chunks)
+
+
+def test_frame_needs_decode():
+    """Only initialize / tools/list frames (or a pending initialize result) are decoded"""
+    assert mcp_proxy.frame_needs_decode(b'{"method": "initialize", "id": 1}', False)
+    assert mcp_proxy.frame_needs_decode(b'{"method":"tools/list","id":2}', False)
+    assert not mcp_proxy.frame_needs_decode(b'{"id": 3, "result": {"content": []}}', False)
+    assert mcp_proxy.frame_needs_decode(b'{"id": 3, "result": {}}', True)
+    # エスケープされた文字列中のマーカーには反応しない
+    assert not mcp_proxy.frame_needs_decode(b'{"id": 4, "result": {"text": "\\"initialize\\""}}', False)
+
+
+@pytest.mark.asyncio
+async def test_untouched_frames_pass_through_verbatim(monkeypatch):
+    """tools/call results are forwarded without re-serialization"""
+    raw = '{"jsonrpc":"2.0",   "id":7,"result":{"content":[{"type":"text","text":"big"}]}}'
+    use_upstream_body(monkeypatch, f"event: message\ndata: {raw}\n\n".encode())
+
+    output = await collect(FakeRequest())
+
+    assert f"event: message\ndata: {raw}\n\n" in output
+
+
+@pytest.mark.asyncio
+async def test_initialize_response_triggers_initialized_notification(monkeypatch):
+    """initialize handling still works behind the fast path"""
+    body = (
+        'data: {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}\n\n'
+        'data: {"jsonrpc": "2.0", "id": 1, "result": {"capabilities": {}}}\n\n'
+    ).encode()
+    use_upstream_body(monkeypatch, body)
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(mcp_proxy.protocol_logger, "log_message", noop)
+
+    output = await collect(FakeRequest())
+    frames = [
+        json.loads(line[6:])
+        for line in output.splitlines()
+        if line.startswith("data: ")
+    ]
+
+    assert frames[-1] == {"jsonrpc": "2.0", "method": "notifications/initialized"}
+
+
+@pytest.mark.asyncio
+async def test_expand_schema_response_from_rendered_cache(monkeypatch):
+    """expandSchema responses are assembled from pre-serialized text"""
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(mcp_proxy.protocol_logger, "log_message", noop)
+    schema = {
+        "type": "object",
+        "properties": {"options": {"type": "object", "properties": {"limit": {"type": "integer"}}}},
+    }
+    mcp_proxy.schema_partitioner.store_full_schema("search_docs", schema)
+
+    request = {
+        "jsonrpc": "2.0",
+        "id": "req-1",
+        "method": "tools/call",
+        "params": {"name": "expandSchema", "arguments": {"toolName": "search_docs", "path": ["options"]}},
+    }
+    response = await mcp_proxy.handle_expand_schema(request)
+    body = json.loads(response.body)
+
+    assert body["id"] == "req-1"
+    assert json.loads(body["result"]["content"][0]["text"]) == schema["properties"]["options"]
+
+    missing = await mcp_proxy.handle_expand_schema({**request, "params": {"arguments": {"toolName": "nope"}}})
+    assert json.loads(missing.body)["error"]["code"] == -32602
+
+
+def test_endpoint_session_id():
+    """The upstream session id is taken from the SSE endpoint event"""
+    event = b"event: endpoint\ndata: /messages?sessionId=abc-123\n\n"
+
+    assert mcp_proxy.endpoint_session_id(event, mcp_proxy.event_data(event)) == "abc-123"
+    assert mcp_proxy.endpoint_session_id(b"data: {}\n\n", b"{}") is None
+
+
+@pytest.mark.asyncio
+async def test_tools_list_tokens_are_recorded_per_tool(monkeypatch):
+    """tools/list partitioning records the tokens sent for every tool"""
+    accountant = mcp_proxy.token_accountant.__class__(tokenizer=mcp_proxy.token_accountant.tokenizer)
+    monkeypatch.setattr(mcp_proxy, "token_accountant", accountant)
+
+    tool = {
+        "name": "accounted_tool",
+        "_meta": {"server": "docs"},
+        "inputSchema": {"type": "object", "properties": {"q": {"type": "string"}}},
+    }
+    await mcp_proxy.apply_schema_partitioning({"result": {"tools": [tool]}}, "session-1")
+
+    snapshot = accountant.snapshot()
+    assert snapshot["tools"]["accounted_tool"]["tools_list"]["tokens"] > 0
+    assert snapshot["tools"]["expandSchema"]["tools_list"]["messages"] == 1
+    assert snapshot["servers"]["docs"]["tools_list"]["messages"] == 1
+    assert snapshot["sessions"]["session-1"]["tools_list"]["messages"] == 2
+
+
+@pytest.mark.asyncio
+async def test_tools_call_propagates_traceparent_upstream(monkeypatch, tmp_path):
+    """The upstream call carries a traceparent whose parent is the upstream.call span"""
+    from apps.api.app.core.tracing import Tracer
+
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("traceparent"))
+        return httpx.Response(200, stream=ChunkedStream(b'{"jsonrpc": "2.0", "id": 1, "result": {}}'))
+
+    pool = UpstreamClientPool(base_url="http://gateway.test")
+    pool._client = httpx.AsyncClient(base_url="http://gateway.test", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(mcp_proxy, "upstream_pool", pool)
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl")
+    monkeypatch.setattr(mcp_proxy, "tracer", tracer)
+
+    class TracedRequest:
+        query_params = {}
+        headers = {"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+
+        async def body(self):
+            return json.dumps({
+                "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                "params": {"name": "time", "arguments": {}},
+            }).encode()
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(TracedRequest())
+    async for _ in response.body_iterator:
+        pass
+    tracer.flush()
+
+    request = json.loads((tmp_path / "traces.jsonl").read_text())["resourceSpans"][0]
+    spans = {span["name"]: span for span in request["scopeSpans"][0]["spans"]}
+    assert set(spans) == {"mcp.jsonrpc", "proxy.parse_body", "upstream.call", "proxy.response"}
+    assert spans["mcp.jsonrpc"]["parentSpanId"] == "00f067aa0ba902b7"
+    assert seen == [f"00-{trace_id}-{spans['upstream.call']['spanId']}-01"]
+
+    await pool.close()
+
+
+class ToolsCallRequest:
+    query_params = {}
+    headers = {}
+
+    async def body(self):
+        return json.dumps({
+            "jsonrpc": "2.0", "id": 7, "method": "tools/call",
+            "params": {"name": "read_file", "arguments": {"path": "/big"}},
+        }).encode()
+
+
+@pytest.mark.asyncio
+async def test_tools_call_body_is_streamed_through(monkeypatch):
+    """The upstream body is relayed chunk by chunk with hop-by-hop headers removed"""
+    body = json.dumps({"jsonrpc": "2.0", "id": 7, "result": {"content": [{"type": "text", "text": "x" * 5000}]}}).encode()
+    recorded = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            stream=ChunkedStream(body, chunk_size=1024),
+            headers=[
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(body))),
+                ("Connection", "keep-alive, X-Hop"),
+                ("X-Hop", "1"),
+                ("Set-Cookie", "a=1"),
+                ("Set-Cookie", "b=2"),
+            ],
+        )
+
+    pool = UpstreamClientPool(base_url="http://gateway.test")
+    pool._client = httpx.AsyncClient(base_url="http://gateway.test", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(mcp_proxy, "upstream_pool", pool)
+    monkeypatch.setattr(
+        mcp_proxy.token_accountant, "record",
+        lambda phase, tokens, **kwargs: recorded.append((phase, tokens, kwargs["tool_name"])),
+    )
+    monkeypatch.setattr(mcp_proxy.settings, "TOKEN_ACCOUNTING_CAPTURE_BYTES", 2048)
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(ToolsCallRequest())
+    assert pool.stats()["routes"]["rpc"]["in_flight"] == 1
+
+    chunks = [chunk async for chunk in response.body_iterator]
+    await response.background()
+
+    assert b"".join(chunks) == body
+    assert len(chunks) == 5
+    assert pool.stats()["routes"]["rpc"]["in_flight"] == 0
+    assert response.raw_headers == [
+        (b"content-type", b"application/json"),
+        (b"set-cookie", b"a=1"),
+        (b"set-cookie", b"b=2"),
+    ]
+
+    # 保持上限（2048B）以降は外挿: 全体を数えた場合と同程度になる
+    full = mcp_proxy.token_accountant.count_text(
+        (await ToolsCallRequest().body() + b"\n" + body).decode()
+    )
+    ((phase, tokens, tool_name),) = recorded
+    assert (phase, tool_name) == ("tools_call", "read_file")
+    assert abs(tokens - full) <= full * 0.1
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_upstream_is_released_when_the_client_is_gone_before_the_body(monkeypatch, tmp_path):
+    from apps.api.app.core.tracing import Tracer
+
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl")
+    monkeypatch.setattr(mcp_proxy, "tracer", tracer)
+    monkeypatch.setattr(mcp_proxy.settings, "TOKEN_ACCOUNTING_ENABLED", False)
+    pool = UpstreamClientPool(base_url="http://gateway.test")
+    pool._client = httpx.AsyncClient(
+        base_url="http://gateway.test",
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"jsonrpc": "2.0", "id": 7, "result": {}})),
+    )
+    monkeypatch.setattr(mcp_proxy, "upstream_pool", pool)
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(ToolsCallRequest())
+    assert pool.stats()["routes"]["rpc"]["in_flight"] == 1
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client disconnected")
+
+    with pytest.raises(OSError):
+        await response({"type": "http", "asgi": {"spec_version": "2.3"}}, receive, send)
+
+    assert pool.stats()["routes"]["rpc"]["in_flight"] == 0
+    tracer.flush()
+    exported = {
+        span["name"]
+        for line in (tmp_path / "traces.jsonl").read_text().splitlines()
+        for span in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    }
+    assert {"mcp.jsonrpc", "proxy.response"} <= exported
+
+    await pool.close()
+
+
+def test_filter_response_headers_drops_decoded_encoding():
+    raw = [(b"Content-Encoding", b"gzip"), (b"Transfer-Encoding", b"chunked"), (b"X-Request-Id", b"1")]
+
+    assert mcp_proxy.filter_response_headers(raw) == [(b"content-encoding", b"gzip"), (b"x-request-id", b"1")]
+    assert mcp_proxy.filter_response_headers(raw, drop_encoding=True) == [(b"x-request-id", b"1")]
+
+
+class BatchRequest:
+    query_params = {}
+    headers = {}
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def body(self):
+        return json.dumps(self.messages).encode()
+
+
+class SingleRequest:
+    query_params = {}
+    headers = {}
+
+    def __init__(self, message):
+        self.message = message
+
+    async def body(self):
+        return json.dumps(self.message).encode()
+
+
+def use_jsonrpc_upstream(monkeypatch, handler) -> UpstreamClientPool:
+    """Route the shared upstream pool to a JSON-RPC handler"""
+    pool = UpstreamClientPool(base_url="http://gateway.test")
+    pool._client = httpx.AsyncClient(base_url="http://gateway.test", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(mcp_proxy, "upstream_pool", pool)
+    return pool
+
+
+def tools_call(request_id, name):
+    message = {"jsonrpc": "2.0", "method": "tools/call", "params": {"name": name, "arguments": {}}}
+    if request_id is not None:
+        message["id"] = request_id
+    return message
+
+
+@pytest.mark.asyncio
+async def test_batch_is_split_and_reassembled_in_order(monkeypatch):
+    """expandSchema is served locally, the rest is forwarded and answers keep batch order"""
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(mcp_proxy.protocol_logger, "log_message", noop)
+    mcp_proxy.schema_partitioner.store_full_schema("batch_docs", {"type": "object", "properties": {"q": {"type": "string"}}})
+    forwarded = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        message = json.loads(request.content)
+        forwarded.append(message)
+        if "id" not in message:
+            return httpx.Response(202)
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": message["id"], "result": {"tool": message["params"]["name"]}})
+
+    pool = use_jsonrpc_upstream(monkeypatch, handler)
+    expand = {
+        "jsonrpc": "2.0", "id": "e", "method": "tools/call",
+        "params": {"name": "expandSchema", "arguments": {"toolName": "batch_docs"}},
+    }
+    batch = [tools_call(1, "time"), expand, {"jsonrpc": "2.0", "method": "notifications/cancelled"}, 42, tools_call("x", "fetch")]
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest(batch))
+    results = json.loads(response.body)
+
+    assert [result["id"] for result in results] == [1, "e", None, "x"]
+    assert results[0]["result"] == {"tool": "time"}
+    assert json.loads(results[1]["result"]["content"][0]["text"])["properties"] == {"q": {"type": "string"}}
+    assert results[2]["error"]["code"] == -32600
+    assert results[3]["result"] == {"tool": "fetch"}
+    assert len(forwarded) == 3
+    assert pool.stats()["routes"]["rpc"]["requests"] == 3
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_of_notifications_has_no_body(monkeypatch):
+    pool = use_jsonrpc_upstream(monkeypatch, lambda request: httpx.Response(202))
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest([{"jsonrpc": "2.0", "method": "notifications/initialized"}]))
+
+    assert response.status_code == 202
+    assert response.body == b""
+
+    empty = await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest([]))
+    assert json.loads(empty.body)["error"]["code"] == -32600
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_mode_forwards_one_upstream_batch(monkeypatch):
+    """With MCP_BATCH_UPSTREAM_MODE=batch the gateway answers (in any order) once"""
+    monkeypatch.setattr(mcp_proxy.settings, "MCP_BATCH_UPSTREAM_MODE", "batch")
+    received = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        messages = json.loads(request.content)
+        received.append(messages)
+        return httpx.Response(200, json=[
+            {"jsonrpc": "2.0", "id": message["id"], "result": {"tool": message["params"]["name"]}}
+            for message in reversed(messages) if "id" in message
+        ])
+
+    pool = use_jsonrpc_upstream(monkeypatch, handler)
+    batch = [tools_call(1, "time"), tools_call(None, "log"), tools_call(2, "fetch")]
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest(batch))
+
+    assert len(received) == 1 and len(received[0]) == 3
+    assert json.loads(response.body) == [
+        {"jsonrpc": "2.0", "id": 1, "result": {"tool": "time"}},
+        {"jsonrpc": "2.0", "id": 2, "result": {"tool": "fetch"}},
+    ]
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_mode_falls_back_when_upstream_rejects_batches(monkeypatch):
+    monkeypatch.setattr(mcp_proxy.settings, "MCP_BATCH_UPSTREAM_MODE", "batch")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        message = json.loads(request.content)
+        if isinstance(message, list):
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}})
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": message["id"], "result": {}})
+
+    pool = use_jsonrpc_upstream(monkeypatch, handler)
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest([tools_call(1, "time"), tools_call(2, "fetch")]))
+
+    assert [result["id"] for result in json.loads(response.body)] == [1, 2]
+    assert pool.stats()["routes"]["rpc"]["requests"] == 3
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_mode_does_not_resend_after_an_upstream_failure(monkeypatch):
+    """A 5xx may come after the gateway ran some entries, so nothing is re-sent"""
+    monkeypatch.setattr(mcp_proxy.settings, "MCP_BATCH_UPSTREAM_MODE", "batch")
+    received = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(json.loads(request.content))
+        return httpx.Response(502, text="Bad Gateway")
+
+    pool = use_jsonrpc_upstream(monkeypatch, handler)
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest([tools_call(1, "send_email"), tools_call(2, "fetch")]))
+    results = json.loads(response.body)
+
+    assert len(received) == 1
+    assert [result["id"] for result in results] == [1, 2]
+    assert {result["error"]["code"] for result in results} == {-32603}
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_mode_resolves_cached_tools_individually(monkeypatch):
+    from apps.api.app.core.result_cache import ResultCache
+
+    monkeypatch.setattr(mcp_proxy.settings, "MCP_BATCH_UPSTREAM_MODE", "batch")
+    monkeypatch.setattr(mcp_proxy, "result_cache", ResultCache(enabled=True, ttls={"time": 60}))
+    received = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        messages = json.loads(request.content)
+        received.append(messages)
+        if isinstance(messages, dict):
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": messages["id"], "result": {"tool": "time"}})
+        return httpx.Response(200, json=[
+            {"jsonrpc": "2.0", "id": message["id"], "result": {"tool": message["params"]["name"]}}
+            for message in messages
+        ])
+
+    pool = use_jsonrpc_upstream(monkeypatch, handler)
+    batch = [tools_call(1, "time"), tools_call(2, "fetch")]
+
+    await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest(batch))
+    response = await mcp_proxy.mcp_jsonrpc_proxy(BatchRequest(batch))
+
+    # time は2回目にキャッシュから応答、fetch のみバッチで転送
+    assert received == [[tools_call(2, "fetch")], tools_call(1, "time"), [tools_call(2, "fetch")]]
+    assert [result["result"]["tool"] for result in json.loads(response.body)] == ["time", "fetch"]
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_malformed_json_is_a_parse_error():
+    class RawRequest(SingleRequest):
+        async def body(self):
+            return b'{"jsonrpc": "2.0", "id": 1'
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(RawRequest(None))
+
+    assert json.loads(response.body) == {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+
+
+@pytest.mark.asyncio
+async def test_identical_idempotent_calls_share_one_upstream_call(monkeypatch):
+    """Concurrent duplicates get one upstream call and each keeps its own JSON-RPC id"""
+    from apps.api.app.core.request_coalescing import RequestCoalescer
+
+    monkeypatch.setattr(mcp_proxy, "request_coalescer", RequestCoalescer(enabled=True, tools=["get-library-docs"]))
+    received = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        message = json.loads(request.content)
+        received.append(message["id"])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": message["id"], "result": {"docs": "..."}})
+
+    pool = use_jsonrpc_upstream(monkeypatch, handler)
+
+    def docs_call(request_id, arguments):
+        return SingleRequest({
+            "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": "get-library-docs", "arguments": arguments},
+        })
+
+    responses = await asyncio.gather(
+        mcp_proxy.mcp_jsonrpc_proxy(docs_call(1, {"id": "react", "topic": "hooks"})),
+        mcp_proxy.mcp_jsonrpc_proxy(docs_call("b", {"topic": "hooks", "id": "react"})),
+        mcp_proxy.mcp_jsonrpc_proxy(docs_call(3, {"id": "vue"})),
+    )
+    bodies = [json.loads(response.body) for response in responses]
+
+    assert sorted(map(str, received)) == ["1", "3"]
+    assert [body["id"] for body in bodies] == [1, "b", 3]
+    assert bodies[1]["result"] == {"docs": "..."}
+    assert mcp_proxy.request_coalescer.stats()["coalesced"] == 1
+
+    await pool.close()
+
+
+
+@pytest.mark.asyncio
+async def test_cached_tool_results_are_served_with_cache_header(monkeypatch):
+    """Allowlisted tools are answered from the result cache with the caller's id"""
+    from apps.api.app.core.result_cache import ResultCache
+
+    monkeypatch.setattr(mcp_proxy, "result_cache", ResultCache(enabled=True, ttls={"get-library-docs": 60}))
+    received = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        message = json.loads(request.content)
+        received.append(message["id"])
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": message["id"], "result": {"content": []}})
+
+    pool = use_jsonrpc_upstream(monkeypatch, handler)
+
+    def docs_call(request_id):
+        return SingleRequest({
+            "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": "get-library-docs", "arguments": {"id": "react"}},
+        })
+
+    first = await mcp_proxy.mcp_jsonrpc_proxy(docs_call(1))
+    second = await mcp_proxy.mcp_jsonrpc_proxy(docs_call(2))
+
+    assert received == [1]
+    assert first.headers["x-mcp-cache"] == "MISS"
+    assert second.headers["x-mcp-cache"] == "HIT"
+    assert json.loads(second.body) == {"jsonrpc": "2.0", "id": 2, "result": {"content": []}}
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_expand_schema_falls_back_to_schema_store(monkeypatch):
+    """A worker that never saw tools/list answers expandSchema from the store"""
+    from apps.api.app.core.schema_partitioning import SchemaPartitioner
+    from apps.api.app.core.schema_store import SchemaStore
+
+    async def noop(*args, **kwargs):
+        return None
+
+    schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+
+    class Backend:
+        async def load(self, tool_name, server_name=None):
+            return (None, schema) if tool_name == "persisted_tool" else None
+
+    partitioner = SchemaPartitioner()
+    monkeypatch.setattr(mcp_proxy.protocol_logger, "log_message", noop)
+    monkeypatch.setattr(mcp_proxy, "schema_partitioner", partitioner)
+    monkeypatch.setattr(mcp_proxy, "schema_store", SchemaStore(partitioner, enabled=True, backend=Backend()))
+
+    request = {
+        "jsonrpc": "2.0",
+        "id": 7,
+        "method": "tools/call",
+        "params": {"name": "expandSchema", "arguments": {"toolName": "persisted_tool", "path": ["q"]}},
+    }
+    response = await mcp_proxy.handle_expand_schema(request)
+
+    assert json.loads(json.loads(response.body)["result"]["content"][0]["text"]) == {"type": "string"}
+    assert partitioner.has_schema("persisted_tool")
+
+
+@pytest.mark.asyncio
+async def test_expand_schema_uses_schemas_published_by_other_workers(monkeypatch, tmp_path):
+    """expandSchema on a worker that never saw tools/list reads the host-wide cache"""
+    from apps.api.app.core.schema_partitioning import SchemaPartitioner
+    from apps.api.app.core.shared_schema_cache import SharedSchemaCache
+
+    async def noop(*args, **kwargs):
+        return None
+
+    schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+    SharedSchemaCache(enabled=True, directory=tmp_path).put_schema("other_worker_tool", schema)
+
+    monkeypatch.setattr(mcp_proxy.protocol_logger, "log_message", noop)
+    monkeypatch.setattr(mcp_proxy, "schema_partitioner", SchemaPartitioner())
+    monkeypatch.setattr(mcp_proxy, "shared_schema_cache", SharedSchemaCache(enabled=True, directory=tmp_path))
+
+    request = {
+        "jsonrpc": "2.0",
+        "id": 8,
+        "method": "tools/call",
+        "params": {"name": "expandSchema", "arguments": {"toolName": "other_worker_tool"}},
+    }
+    response = await mcp_proxy.handle_expand_schema(request)
+
+    assert json.loads(json.loads(response.body)["result"]["content"][0]["text"]) == schema
+
+
+@pytest.mark.asyncio
+async def test_expand_schema_disambiguates_by_server_name(monkeypatch):
+    """A tool name exposed by two servers needs serverName to expand"""
+    from apps.api.app.core.schema_partitioning import SchemaPartitioner
+
+    async def noop(*args, **kwargs):
+        return None
+
+    partitioner = SchemaPartitioner()
+    partitioner.store_full_schema("search", {"type": "object", "title": "github"}, "github")
+    partitioner.store_full_schema("search", {"type": "object", "title": "notion"}, "notion")
+    monkeypatch.setattr(mcp_proxy.protocol_logger, "log_message", noop)
+    monkeypatch.setattr(mcp_proxy, "schema_partitioner", partitioner)
+
+    def expand(**arguments):
+        return mcp_proxy.handle_expand_schema({
+            "jsonrpc": "2.0", "id": 9, "method": "tools/call",
+            "params": {"name": "expandSchema", "arguments": {"toolName": "search", **arguments}},
+        })
+
+    ambiguous = json.loads((await expand()).body)
+    assert ambiguous["error"]["code"] == -32602
+    assert "github, notion" in ambiguous["error"]["message"]
+
+    body = json.loads((await expand(serverName="notion")).body)
+    assert json.loads(body["result"]["content"][0]["text"])["title"] == "notion"
+
+
+@pytest.mark.asyncio
+async def test_expand_schema_usage_is_recorded_and_persisted(monkeypatch, tmp_path):
+    """Paths expanded often enough join the persisted hot set under the resolved server"""
+    from apps.api.app.core.schema_partitioning import SchemaPartitioner
+    from apps.api.app.core.schema_usage import SchemaUsageTracker
+
+    async def noop(*args, **kwargs):
+        return None
+
+    partitioner = SchemaPartitioner()
+    partitioner.store_full_schema(
+        "search", {"type": "object", "properties": {"options": {"type": "object"}}}, "github"
+    )
+    usage = SchemaUsageTracker(enabled=True, threshold=2, file_path=tmp_path / "hot.json")
+    monkeypatch.setattr(mcp_proxy.protocol_logger, "log_message", noop)
+    monkeypatch.setattr(mcp_proxy, "schema_partitioner", partitioner)
+    monkeypatch.setattr(mcp_proxy, "schema_usage", usage)
+
+    for request_id in (1, 2):
+        await mcp_proxy.handle_expand_schema({
+            "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": "expandSchema", "arguments": {"toolName": "search", "path": ["options"]}},
+        })
+
+    assert usage.hot_paths("search", "github") == {("options",)}
+    restarted = SchemaUsageTracker(enabled=True, threshold=2, file_path=tmp_path / "hot.json")
+    assert restarted.hot_paths("search", "github") == {("options",)}
@@ -0,0 +1,45 @@
+"""
+Tests for MCP server state endpoints
+"""
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from apps.api.app.api.endpoints import mcp_server_states
+from apps.api.app.core.catalog_cache import PartitionedCatalogCache
+from apps.api.app.core.schema_partitioning import SchemaPartitioner
+from apps.api.app.core.shared_schema_cache import SharedSchemaCache
+from apps.api.app.schemas.mcp_server_state import MCPServerStateUpdate
+
+STRIPE_TOOL = {
+    "name": "create_customer",
+    "inputSchema": {
+        "type": "object",
+        "properties": {"address": {"type": "object", "properties": {"city": {"type": "string"}}}},
+    },
+    # Gateway は mcp-config.json のサーバー名を _meta.server に付ける
+    "_meta": {"server": "stripe"},
+}
+
+
+@pytest.mark.asyncio
+async def test_disabling_a_server_drops_its_schemas_on_every_layer(monkeypatch, tmp_path):
+    cache = PartitionedCatalogCache(SchemaPartitioner(), shared=SharedSchemaCache(enabled=True, directory=tmp_path))
+    cache.partition_tools([copy.deepcopy(STRIPE_TOOL)])
+    monkeypatch.setattr(mcp_server_states, "catalog_cache", cache)
+
+    async def upsert_server_state(db, server_id, enabled):
+        return SimpleNamespace(server_id=server_id, enabled=enabled)
+
+    monkeypatch.setattr(mcp_server_states.crud, "upsert_server_state", upsert_server_state)
+
+    await mcp_server_states.upsert_server_state("stripe", MCPServerStateUpdate(enabled=False), db=None)
+
+    assert not cache.partitioner.has_schema("create_customer", "stripe")
+    assert cache.shared.get_schema("create_customer", "stripe") is None
+
+    # 再有効化後の tools/list（同一カタログ = プロセス内キャッシュのヒット）で両方に再保存
+    cache.partition_tools([copy.deepcopy(STRIPE_TOOL)])
+    assert cache.partitioner.has_schema("create_customer", "stripe")
+    assert cache.shared.get_schema("create_customer", "stripe") == ("stripe", STRIPE_TOOL["inputSchema"])
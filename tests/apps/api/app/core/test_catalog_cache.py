@@ -0,0 +1,240 @@
+"""
+Tests for the partitioned tools/list catalog cache
+"""
+import copy
+
+from apps.api.app.core.catalog_cache import PartitionedCatalogCache, tool_hash
+from apps.api.app.core.schema_compression import SchemaCompressor
+from apps.api.app.core.schema_partitioning import SchemaPartitioner
+from apps.api.app.core.schema_usage import SchemaUsageTracker
+
+
+def make_tool(name: str, nested_description: str = "nested") -> dict:
+    return {
+        "name": name,
+        "description": f"{name} tool",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+                "options": {
+                    "type": "object",
+                    "properties": {
+                        "limit": {"type": "integer", "description": nested_description},
+                    },
+                },
+            },
+        },
+    }
+
+
+def test_tool_hash_ignores_key_order():
+    tool = make_tool("search")
+    reordered = dict(reversed(list(tool.items())))
+
+    assert tool_hash(tool) == tool_hash(reordered)
+    assert tool_hash(tool) != tool_hash(make_tool("search", "changed"))
+
+
+def test_identical_catalog_is_served_from_cache():
+    partitioner = SchemaPartitioner()
+    cache = PartitionedCatalogCache(partitioner)
+    tools = [make_tool("search"), make_tool("read_file")]
+
+    first = cache.partition_tools(copy.deepcopy(tools))
+    second = cache.partition_tools(copy.deepcopy(tools))
+
+    assert first == second
+    assert "properties" not in second[0]["inputSchema"]["properties"]["options"]
+    assert cache.stats()["catalog_hits"] == 1
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 2
+
+
+def test_only_changed_tools_are_repartitioned():
+    partitioner = SchemaPartitioner()
+    cache = PartitionedCatalogCache(partitioner)
+
+    cache.partition_tools([make_tool("search"), make_tool("read_file")])
+    cache.partition_tools([make_tool("search"), make_tool("read_file", "changed")])
+
+    stats = cache.stats()
+    assert stats["catalog_misses"] == 2
+    assert stats["misses"] == 3
+    assert stats["hits"] == 1
+    # 変更後のスキーマが expandSchema 用に保存されている
+    expanded = partitioner.expand_schema("read_file", ["options", "limit"])
+    assert expanded["description"] == "changed"
+
+
+def test_catalog_is_partitioned_once_per_host(tmp_path):
+    from apps.api.app.core.shared_schema_cache import SharedSchemaCache
+
+    worker_a = PartitionedCatalogCache(SchemaPartitioner(), shared=SharedSchemaCache(enabled=True, directory=tmp_path))
+    worker_b = PartitionedCatalogCache(SchemaPartitioner(), shared=SharedSchemaCache(enabled=True, directory=tmp_path))
+    tools = [make_tool("search"), make_tool("read_file")]
+
+    first = worker_a.partition_tools(copy.deepcopy(tools))
+    second = worker_b.partition_tools(copy.deepcopy(tools))
+
+    assert first == second
+    assert worker_a.stats()["misses"] == 2
+    # worker B は再分割しない
+    assert worker_b.stats()["misses"] == 0
+    assert worker_b.stats()["catalog_hits"] == 1
+    assert worker_b.partitioner.expand_schema("search", ["options", "limit"])["description"] == "nested"
+    # 分割結果を取り込んだので、次回はプロセス内キャッシュから返る
+    worker_b.partition_tools(copy.deepcopy(tools))
+    assert worker_b.shared.stats()["catalog_hits"] == 1
+    # フルスキーマも公開済み（tools/list を処理していないワーカーの expandSchema 用）
+    assert worker_b.shared.get_schema("read_file") == (None, tools[1]["inputSchema"])
+
+
+def test_shared_catalogs_are_not_reused_across_budgets(tmp_path):
+    from apps.api.app.core.shared_schema_cache import SharedSchemaCache
+
+    depth_one = PartitionedCatalogCache(SchemaPartitioner(), shared=SharedSchemaCache(enabled=True, directory=tmp_path))
+    budgeted = PartitionedCatalogCache(
+        SchemaPartitioner(), shared=SharedSchemaCache(enabled=True, directory=tmp_path), tool_budget=100000
+    )
+    tools = [make_tool("search")]
+
+    depth_one.partition_tools(copy.deepcopy(tools))
+    (tool,) = budgeted.partition_tools(copy.deepcopy(tools))
+
+    # 予算内のスキーマはそのまま（固定深さ1で分割したワーカーのカタログを使わない）
+    assert budgeted.stats()["catalog_hits"] == 0
+    assert tool["inputSchema"]["properties"]["options"]["properties"]["limit"]["description"] == "nested"
+
+
+def test_colliding_tool_names_are_stored_per_server():
+    partitioner = SchemaPartitioner()
+    cache = PartitionedCatalogCache(partitioner)
+    github = {**make_tool("search", "github"), "_meta": {"server": "github"}}
+    notion = {**make_tool("search", "notion"), "_meta": {"server": "notion"}}
+
+    cache.partition_tools([github, notion])
+
+    assert partitioner.expand_schema("search", ["options", "limit"], server_name="github")["description"] == "github"
+    assert partitioner.expand_schema("search", ["options", "limit"], server_name="notion")["description"] == "notion"
+
+    # 1サーバー分だけ破棄し、次の tools/list でそのサーバーのみ再保存
+    assert cache.drop_server("github") == 1
+    assert not partitioner.has_schema("search", "github")
+    cache.partition_tools([github, notion])
+    assert partitioner.has_schema("search", "github")
+
+
+def big_tool(name: str, fields: int) -> dict:
+    return {
+        "name": name,
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+                "filter": {
+                    "type": "object",
+                    "properties": {f"field_{i}": {"type": "string", "description": "x" * 40} for i in range(fields)},
+                },
+            },
+        },
+    }
+
+
+def test_tool_budget_keeps_small_schemas_whole():
+    partitioner = SchemaPartitioner()
+    cache = PartitionedCatalogCache(partitioner, tool_budget=200)
+
+    small, large = cache.partition_tools([make_tool("search"), big_tool("query_db", 40)])
+
+    # 予算内のスキーマは分割しない
+    assert small["inputSchema"]["properties"]["options"]["properties"]["limit"]["type"] == "integer"
+    assert "properties" not in large["inputSchema"]["properties"]["filter"]
+    allocation = cache.last_allocation
+    assert [tool["name"] for tool in allocation["tools"]] == ["query_db"]
+    assert allocation["tools"][0]["collapsed"] == ["filter"]
+
+
+def test_catalog_budget_collapses_largest_subtrees_across_tools():
+    partitioner = SchemaPartitioner()
+    unlimited = PartitionedCatalogCache(SchemaPartitioner(), catalog_budget=1_000_000)
+    tools = [big_tool("a", 10), big_tool("b", 30), make_tool("c")]
+    unlimited.partition_tools(copy.deepcopy(tools))
+    total = unlimited.last_allocation["tokens"]
+
+    cache = PartitionedCatalogCache(partitioner, catalog_budget=total - 100)
+    partitioned = cache.partition_tools(copy.deepcopy(tools))
+
+    # 最大の部分木（b.filter）だけで予算に収まる
+    assert "properties" in partitioned[0]["inputSchema"]["properties"]["filter"]
+    assert "properties" not in partitioned[1]["inputSchema"]["properties"]["filter"]
+    allocation = cache.last_allocation
+    assert allocation["tokens"] <= total - 100
+    assert not allocation["over_budget"]
+    assert allocation["collapsed_subtrees"] == 1
+
+    # 予算内に収まらない場合も畳み込める部分木は全て畳み込み、超過を報告
+    tight = PartitionedCatalogCache(SchemaPartitioner(), catalog_budget=1)
+    tight.partition_tools(copy.deepcopy(tools))
+    assert tight.last_allocation["over_budget"]
+    assert tight.last_allocation["collapsed_subtrees"] == 3
+
+
+def test_hot_expand_paths_are_inlined(tmp_path):
+    usage = SchemaUsageTracker(enabled=True, threshold=2, file_path=tmp_path / "hot.json")
+    cache = PartitionedCatalogCache(SchemaPartitioner(), usage=usage)
+    tools = [make_tool("search"), make_tool("read_file")]
+
+    before = cache.partition_tools(copy.deepcopy(tools))
+    assert "properties" not in before[0]["inputSchema"]["properties"]["options"]
+
+    usage.record("search", ["options"])
+    assert not usage.record("read_file", ["options"])
+    assert usage.record("search", ["options"])
+    after = cache.partition_tools(copy.deepcopy(tools))
+
+    # ホットになったパスのみ展開、ホットセットの変化でカタログは作り直す
+    assert after[0]["inputSchema"]["properties"]["options"]["properties"]["limit"]["type"] == "integer"
+    assert "properties" not in after[1]["inputSchema"]["properties"]["options"]
+    assert cache.stats()["catalog_misses"] == 2
+
+
+def test_compression_runs_after_partitioning():
+    compressor = SchemaCompressor(enabled=True, description_max_chars=10)
+    plain = PartitionedCatalogCache(SchemaPartitioner())
+    cache = PartitionedCatalogCache(SchemaPartitioner(), compressor=compressor)
+    tool = make_tool("search")
+    tool["inputSchema"]["properties"]["query"]["description"] = "A very long description of the query"
+
+    (uncompressed,), (uncompressed_estimate,) = plain.partition_tools_with_estimates([copy.deepcopy(tool)])
+    (compressed,), (estimate,) = cache.partition_tools_with_estimates([copy.deepcopy(tool)])
+
+    assert compressed["inputSchema"]["properties"]["query"]["description"] == "A very lon…"
+    assert estimate["tool"] < uncompressed_estimate["tool"]
+    # expandSchema は元の説明文を返す
+    assert cache.partitioner.expand_schema("search", ["query"])["description"].endswith("of the query")
+
+
+def test_shared_catalog_collapses_do_not_leak_into_other_catalogs(tmp_path):
+    from apps.api.app.core.shared_schema_cache import SharedSchemaCache
+
+    tools = [big_tool("a", 10), big_tool("b", 30), make_tool("c")]
+    unlimited = PartitionedCatalogCache(SchemaPartitioner(), catalog_budget=1_000_000)
+    unlimited.partition_tools(copy.deepcopy(tools))
+    budget = unlimited.last_allocation["tokens"] - 100
+
+    worker_a = PartitionedCatalogCache(
+        SchemaPartitioner(), shared=SharedSchemaCache(enabled=True, directory=tmp_path), catalog_budget=budget
+    )
+    worker_b = PartitionedCatalogCache(
+        SchemaPartitioner(), shared=SharedSchemaCache(enabled=True, directory=tmp_path), catalog_budget=budget
+    )
+    assert "properties" not in worker_a.partition_tools(copy.deepcopy(tools))[1]["inputSchema"]["properties"]["filter"]
+    worker_b.partition_tools(copy.deepcopy(tools))
+    assert worker_b.stats()["catalog_hits"] == 1
+
+    # a がなくなれば予算内: b.filter は畳み込まない（共有カタログの畳み込みを持ち越さない）
+    fresh = PartitionedCatalogCache(SchemaPartitioner(), catalog_budget=budget)
+    expected = fresh.partition_tools(copy.deepcopy(tools[1:]))
+    assert "properties" in expected[0]["inputSchema"]["properties"]["filter"]
+    assert worker_b.partition_tools(copy.deepcopy(tools[1:])) == expected
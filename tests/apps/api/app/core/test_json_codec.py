@@ -0,0 +1,75 @@
+"""
+Tests for the stdlib / orjson JSON codec
+"""
+import json
+
+import pytest
+
+from apps.api.app.core.json_codec import JSONDecodeError, OrjsonCodec, StdlibCodec, create_codec
+
+CODECS = [StdlibCodec()]
+try:
+    CODECS.append(OrjsonCodec())
+except ImportError:
+    pass
+
+MESSAGE = {"jsonrpc": "2.0", "id": 1, "result": {"tools": [{"name": "search", "inputSchema": {"type": "object"}}]}}
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_round_trip_is_compact(codec):
+    encoded = codec.dumps(MESSAGE)
+
+    assert isinstance(encoded, bytes)
+    assert b", " not in encoded and b": " not in encoded
+    assert codec.loads(encoded) == MESSAGE
+    assert codec.loads(encoded.decode()) == MESSAGE
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_pretty_output_matches_stdlib_indent(codec):
+    assert codec.dumps(MESSAGE, pretty=True).decode() == json.dumps(MESSAGE, indent=2)
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_canonical_ignores_key_order(codec):
+    assert codec.canonical({"b": 1, "a": [2, {"d": 3, "c": 4}]}) == codec.canonical({"a": [2, {"c": 4, "d": 3}], "b": 1})
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_decode_errors_are_json_decode_errors(codec):
+    with pytest.raises(JSONDecodeError):
+        codec.loads(b"{not json")
+
+
+def test_orjson_falls_back_for_unsupported_values():
+    codec = create_codec("orjson")
+    if codec.name != "orjson":
+        pytest.skip("orjson not installed")
+
+    assert codec.loads(codec.dumps({"id": 2 ** 70})) == {"id": 2 ** 70}
+
+
+def test_orjson_loads_falls_back_for_values_it_rejects(monkeypatch):
+    codec = create_codec("orjson")
+    if codec.name != "orjson":
+        pytest.skip("orjson not installed")
+    wide = 2 ** 64 + 1
+
+    assert codec.loads(b'{"id": 1, "result": NaN}')["id"] == 1
+
+    # orjson のバージョンによっては64bitを超える整数を JSONDecodeError で拒否する
+    def reject_wide_integers(data):
+        raise codec._orjson.JSONDecodeError("number out of range", data.decode(), 0)
+
+    monkeypatch.setattr(codec, "_orjson", type("orjson", (), {
+        "loads": staticmethod(reject_wide_integers),
+        "JSONDecodeError": codec._orjson.JSONDecodeError,
+    }))
+    assert codec.loads(f'{{"jsonrpc": "2.0", "id": {wide}}}'.encode()) == {"jsonrpc": "2.0", "id": wide}
+    with pytest.raises(JSONDecodeError):
+        codec.loads(b"{not json")
+
+
+def test_stdlib_codec_can_be_forced():
+    assert create_codec("stdlib").name == "stdlib"
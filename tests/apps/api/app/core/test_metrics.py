@@ -0,0 +1,102 @@
+"""
+Tests for the Prometheus-style metrics registry and middleware
+"""
+import pytest
+
+from apps.api.app.core.metrics import Counter, Gauge, Histogram, MetricsMiddleware, MetricsRegistry
+from apps.api.app.core import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = Histogram(registry, "latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency", "# TYPE latency_seconds histogram"]
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 4.05" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+def test_counter_labels_are_escaped():
+    registry = MetricsRegistry()
+    counter = Counter(registry, "requests_total", "Requests", labelnames=("route",))
+
+    counter.inc('/a"b')
+    counter.inc('/a"b', amount=2)
+
+    assert 'requests_total{route="/a\\"b"} 3.0' in registry.render()
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    counter = Counter(registry, "requests_total", "Requests")
+    gauge = Gauge(registry, "open", "Open")
+    histogram = Histogram(registry, "latency_seconds", "Latency")
+
+    counter.inc()
+    gauge.inc()
+    histogram.observe(1.0)
+
+    lines = registry.render().splitlines()
+    assert not any(line.startswith("requests_total") for line in lines)
+    assert "open 0.0" in lines
+    assert not any(line.startswith("latency_seconds_count") for line in lines)
+
+
+def test_gauge_callback_is_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"value": 3}
+    Gauge(registry, "queue_depth", "Depth", callback=lambda: depth["value"])
+
+    assert "queue_depth 3" in registry.render()
+    depth["value"] = 7
+    assert "queue_depth 7" in registry.render()
+
+
+def test_labelled_gauge_callback_renders_one_series_per_label():
+    registry = MetricsRegistry()
+    Gauge(
+        registry, "route_in_flight", "In flight", labelnames=("route",),
+        callback=lambda: {("sse",): 2, ("rpc",): 5},
+    )
+
+    lines = registry.render().splitlines()
+    assert 'route_in_flight{route="sse"} 2' in lines
+    assert 'route_in_flight{route="rpc"} 5' in lines
+
+
+def test_upstream_route_limiters_are_exported():
+    rendered = metrics.registry.render()
+
+    assert 'mcp_upstream_route_in_flight{route="rpc"} 0' in rendered
+    assert 'mcp_upstream_route_waiting{route="sse"} 0' in rendered
+    assert "# TYPE mcp_upstream_route_wait_seconds histogram" in rendered
+    assert "# TYPE mcp_rpc_bytes_relayed_total counter" in rendered
+    assert "# TYPE mcp_protocol_log_queue_depth gauge" in rendered
+
+
+@pytest.mark.asyncio
+async def test_middleware_labels_by_route_template():
+    class Route:
+        path = "/items/{item_id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    before = metrics.http_requests_total._values.get(("POST", "/items/{item_id}", "201"), 0)
+    middleware = MetricsMiddleware(app, registry=metrics.registry)
+    await middleware({"type": "http", "method": "POST", "path": "/items/42"}, None, send)
+
+    assert metrics.http_requests_total._values[("POST", "/items/{item_id}", "201")] == before + 1
+    assert 'route="/items/{item_id}"' in metrics.registry.render()
@@ -0,0 +1,117 @@
+"""
+Tests for protocol log rotation, compression, retention and blob storage
+"""
+import gzip
+import json
+import time
+
+import pytest
+
+from apps.api.app.core.protocol_log_storage import BlobStore, LogSegmentWriter, open_compressed
+from apps.api.app.core.protocol_logger import ProtocolLogger
+
+
+def test_segments_rotate_by_size_and_are_compressed(tmp_path):
+    writer = LogSegmentWriter(tmp_path / "protocol_messages.jsonl", rotate_bytes=5, compression="gzip")
+
+    for i in range(3):
+        writer.maybe_rotate()
+        writer.write_lines([json.dumps({"n": i}).encode() + b"\n"])
+        time.sleep(0.001)
+    writer.close()
+
+    segments = writer.segments()
+    assert writer.rotations == 2
+    assert [path.suffix for path in segments] == [".gz", ".gz"]
+    with gzip.open(segments[0], "rt") as f:
+        assert json.loads(f.read()) == {"n": 0}
+    assert json.loads((tmp_path / "protocol_messages.jsonl").read_text()) == {"n": 2}
+
+
+def test_segments_rotate_by_age(tmp_path):
+    writer = LogSegmentWriter(tmp_path / "protocol_messages.jsonl", rotate_seconds=60)
+    writer.maybe_rotate()
+    writer.write_lines([b"{}\n"])
+
+    writer.maybe_rotate()
+    assert writer.rotations == 0
+
+    writer._opened_at -= 61
+    writer.maybe_rotate()
+    assert writer.rotations == 1
+    assert not (tmp_path / "protocol_messages.jsonl").exists()
+
+
+
+def test_workers_sharing_a_segment_do_not_lose_entries(tmp_path):
+    """A worker reopens the active segment after another worker rotated it"""
+    log_file = tmp_path / "protocol_messages.jsonl"
+    worker_a = LogSegmentWriter(log_file, rotate_bytes=20, compression="gzip")
+    worker_b = LogSegmentWriter(log_file, rotate_bytes=20, compression="gzip")
+
+    for i in range(6):
+        for worker in (worker_a, worker_b):
+            worker.maybe_rotate()
+            worker.write_lines([json.dumps({"n": i}).encode() + b"\n"])
+            time.sleep(0.001)
+    worker_a.close()
+    worker_b.close()
+
+    entries = []
+    for path in worker_a.segments() + [log_file]:
+        with open_compressed(path, "rb") as f:
+            entries += [json.loads(line)["n"] for line in f]
+    # 全エントリが残り、サイズは共有ファイルで判定される
+    assert sorted(entries) == sorted(list(range(6)) * 2)
+    assert worker_a.rotations + worker_b.rotations == len(worker_a.segments())
+
+def test_retention_keeps_newest_segments(tmp_path):
+    writer = LogSegmentWriter(tmp_path / "protocol_messages.jsonl", rotate_bytes=1, max_segments=2)
+
+    for i in range(5):
+        writer.maybe_rotate()
+        writer.write_lines([json.dumps({"n": i}).encode() + b"\n"])
+        time.sleep(0.001)
+    writer.rotate()
+
+    segments = writer.segments()
+    assert writer.deleted_segments == 3
+    assert [json.loads(path.read_text())["n"] for path in segments] == [3, 4]
+
+
+def test_blob_store_deduplicates_and_sweeps(tmp_path):
+    store = BlobStore(tmp_path / "blobs", compression="gzip")
+
+    first = store.put(b'{"tools": []}')
+    assert store.put(b'{"tools": []}') == first
+    other = store.put(b'{"tools": [1]}')
+
+    assert store.stored == 2
+    assert store.deduplicated == 1
+    with open_compressed(store.path(first), "rb") as f:
+        assert f.read() == b'{"tools": []}'
+
+    assert store.sweep({first}) == 1
+    assert store.path(first).exists()
+    assert not store.path(other).exists()
+
+
+@pytest.mark.asyncio
+async def test_large_messages_are_referenced_by_hash(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, blob_threshold_bytes=100, compression="none")
+    tools_list = {"jsonrpc": "2.0", "id": 1, "result": {"tools": [{"name": "t" * 200}]}}
+
+    await logger.log_message("server→client", tools_list, {"phase": "tools_list"})
+    await logger.log_message("server→client", tools_list, {"phase": "tools_list"})
+    await logger.log_message("client→server", {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+
+    entries = [json.loads(line) for line in logger.log_file.read_text().splitlines()]
+    refs = [entry["message_ref"]["blob"] for entry in entries[:2]]
+    assert refs[0] == refs[1]
+    assert "message" not in entries[0]
+    assert entries[2]["message"]["method"] == "tools/list"
+    assert logger.stats()["blobs_stored"] == 1
+    assert json.loads(logger._blobs.path(refs[0]).read_bytes()) == tools_list
+
+    logger.clear_logs()
+    assert not (tmp_path / "blobs").exists()
@@ -0,0 +1,149 @@
+"""
+Tests for the batched background ProtocolLogger writer
+"""
+import asyncio
+import json
+
+import pytest
+
+from apps.api.app.core.json_codec import codec
+from apps.api.app.core.protocol_logger import ProtocolLogger
+
+
+def read_entries(logger: ProtocolLogger) -> list:
+    return [json.loads(line) for line in logger.log_file.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_entries_are_written_inline_without_writer(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path)
+
+    await logger.log_message("client→server", {"jsonrpc": "2.0", "id": 1, "method": "tools/list"})
+    logger.clear_logs()
+    await logger.log_message("server→client", {"jsonrpc": "2.0", "id": 1, "result": {}})
+    await logger.close()
+
+    entries = read_entries(logger)
+    assert len(entries) == 1
+    assert entries[0]["has_result"] is True
+
+
+@pytest.mark.asyncio
+async def test_background_writer_batches_entries(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, batch_max_entries=10, flush_interval=0.05, fsync="batch")
+    await logger.start()
+
+    for i in range(25):
+        await logger.log_message("server→client", {"jsonrpc": "2.0", "id": i, "result": {}}, {"phase": "tools_call"})
+
+    await logger.close()
+
+    entries = read_entries(logger)
+    assert [entry["id"] for entry in entries] == list(range(25))
+    assert logger.stats()["written"] == 25
+    assert logger.stats()["batches"] == 3
+    assert logger.stats()["running"] is False
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_interval(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, flush_interval=0.01)
+    await logger.start()
+
+    await logger.log_message("client→server", {"jsonrpc": "2.0", "id": 1, "method": "initialize"})
+    for _ in range(50):
+        if logger.written:
+            break
+        await asyncio.sleep(0.01)
+
+    assert len(read_entries(logger)) == 1
+    await logger.close()
+
+
+@pytest.mark.asyncio
+async def test_drop_policy_counts_dropped_entries(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, queue_size=2, backpressure="drop")
+    await logger.start()
+
+    # Writerに処理させずにキューを溢れさせる
+    for i in range(5):
+        await logger.log_message("server→client", {"jsonrpc": "2.0", "id": i, "result": {}})
+
+    assert logger.stats()["dropped"] == 3
+    await logger.close()
+    assert len(read_entries(logger)) == 2
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_room(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, queue_size=2, backpressure="block", flush_interval=0)
+    await logger.start()
+
+    for i in range(10):
+        await logger.log_message("server→client", {"jsonrpc": "2.0", "id": i, "result": {}})
+    await logger.close()
+
+    assert logger.dropped == 0
+    assert len(read_entries(logger)) == 10
+
+
+def test_invalid_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ProtocolLogger(log_dir=tmp_path, backpressure="spill")
+
+
+@pytest.mark.asyncio
+async def test_session_sampling_keeps_or_drops_whole_sessions(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, session_sample_rate=0.5)
+
+    for session in range(40):
+        for message_id in range(3):
+            await logger.log_message(
+                "client→server",
+                {"jsonrpc": "2.0", "id": message_id, "method": "tools/call"},
+                {"phase": "tools_call", "session_id": f"s{session}"},
+            )
+
+    per_session = {}
+    for entry in read_entries(logger):
+        session_id = entry["metadata"]["session_id"]
+        per_session[session_id] = per_session.get(session_id, 0) + 1
+
+    assert 0 < len(per_session) < 40
+    assert set(per_session.values()) == {3}
+    assert logger.sampled_out == (40 - len(per_session)) * 3
+
+
+@pytest.mark.asyncio
+async def test_phase_sampling_keeps_request_response_pairs(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, sample_rates={"tools_call": 0.3, "initialize": 0.0})
+
+    await logger.log_message("client→server", {"jsonrpc": "2.0", "id": 0, "method": "initialize"}, {"phase": "initialize"})
+    for message_id in range(50):
+        metadata = {"phase": "tools_call", "session_id": "s1"}
+        await logger.log_message("client→server", {"jsonrpc": "2.0", "id": message_id, "method": "tools/call"}, metadata)
+        await logger.log_message("server→client", {"jsonrpc": "2.0", "id": message_id, "result": {}}, metadata)
+
+    entries = read_entries(logger)
+    ids = [entry["id"] for entry in entries]
+    assert all(entry["metadata"]["phase"] == "tools_call" for entry in entries)
+    assert 0 < len(ids) < 100
+    assert all(ids.count(message_id) == 2 for message_id in ids)
+    assert entries[0]["sample_rate"] == 0.3
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_truncated_to_size_and_tokens(tmp_path):
+    logger = ProtocolLogger(log_dir=tmp_path, truncate_bytes=100)
+    tools_list = {"jsonrpc": "2.0", "id": 1, "result": {"tools": [{"name": "t" * 200}]}}
+
+    await logger.log_message("server→client", tools_list, {"phase": "tools_list"})
+    await logger.log_message("client→server", {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}, {"phase": "tools_list"})
+
+    truncated, small = read_entries(logger)
+    assert "message" not in truncated
+    assert truncated["message_summary"]["bytes"] == len(codec.dumps(tools_list))
+    assert truncated["message_summary"]["tokens"] > 0
+    assert truncated["has_result"] is True
+    assert small["message"]["method"] == "tools/list"
+    assert logger.stats()["truncated"] == 1
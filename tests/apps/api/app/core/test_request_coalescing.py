@@ -0,0 +1,107 @@
+"""
+Tests for single-flight coalescing of idempotent tool calls
+"""
+import asyncio
+
+import pytest
+
+from apps.api.app.core.request_coalescing import RequestCoalescer, tool_call_key
+
+
+def test_tool_call_key_ignores_argument_order():
+    assert tool_call_key("read_file", {"path": "/a", "encoding": "utf-8"}) == tool_call_key(
+        "read_file", {"encoding": "utf-8", "path": "/a"}
+    )
+    assert tool_call_key("read_file", {"path": "/a"}) != tool_call_key("read_file", {"path": "/b"})
+    assert tool_call_key("read_file", None) == tool_call_key("read_file", {})
+
+
+def test_only_marked_tools_are_coalesced():
+    coalescer = RequestCoalescer(enabled=True, tools=["time"], use_annotations=True)
+    coalescer.learn_tools([
+        {"name": "resolve-library-id", "annotations": {"readOnlyHint": True}},
+        {"name": "write_file", "annotations": {"readOnlyHint": False}},
+        {"name": "search"},
+    ])
+
+    assert coalescer.applies_to("time")
+    assert coalescer.applies_to("resolve-library-id")
+    assert not coalescer.applies_to("write_file")
+    assert not coalescer.applies_to("search")
+    assert not RequestCoalescer(enabled=False, tools=["time"]).applies_to("time")
+
+
+def test_annotations_are_merged_across_listings():
+    coalescer = RequestCoalescer(enabled=True, tools=[], use_annotations=True)
+    coalescer.learn_tools([{"name": "search", "annotations": {"readOnlyHint": True}}])
+    # 別ページ（search を含まない）では search の判定は変わらない
+    coalescer.learn_tools([{"name": "fetch", "annotations": {"idempotentHint": True}}])
+
+    assert coalescer.applies_to("search")
+    assert coalescer.applies_to("fetch")
+
+    coalescer.learn_tools([{"name": "search", "annotations": {}}])
+    assert not coalescer.applies_to("search")
+    assert coalescer.applies_to("fetch")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    coalescer = RequestCoalescer(enabled=True, tools=[])
+    calls = 0
+    release = asyncio.Event()
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return b"result"
+
+    waiters = [asyncio.create_task(coalescer.do("k", call)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert coalescer.stats()["coalesced"] == 4
+    assert coalescer.stats()["in_flight"] == 0
+
+    # 完了後の呼び出しは新しい上流呼び出しになる（キャッシュしない）
+    await coalescer.do("k", call)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    coalescer = RequestCoalescer(enabled=True, tools=[])
+    release = asyncio.Event()
+
+    async def call():
+        await release.wait()
+        return b"result"
+
+    leader = asyncio.create_task(coalescer.do("k", call))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(coalescer.do("k", call))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    release.set()
+
+    assert await follower == (b"result", True)
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    coalescer = RequestCoalescer(enabled=True, tools=[])
+
+    async def call():
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        coalescer.do("k", call), coalescer.do("k", call), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
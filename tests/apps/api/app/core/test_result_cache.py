@@ -0,0 +1,96 @@
+"""
+Tests for the tools/call TTL result cache
+"""
+import json
+import os
+
+import pytest
+
+from apps.api.app.core.result_cache import ResultCache, is_cacheable_result
+
+
+def result_body(request_id, text="ok", **result):
+    return json.dumps({"jsonrpc": "2.0", "id": request_id, "result": {"content": [{"type": "text", "text": text}], **result}}).encode()
+
+
+def test_only_successful_results_are_cacheable():
+    assert is_cacheable_result(result_body(1))
+    assert not is_cacheable_result(result_body(1, isError=True))
+    assert not is_cacheable_result(b'{"jsonrpc":"2.0","id":1,"error":{"code":-32603,"message":"x"}}')
+    assert not is_cacheable_result(b"event: message\n")
+
+
+@pytest.mark.asyncio
+async def test_hits_ignore_argument_order_and_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("apps.api.app.core.result_cache.time.time", lambda: now[0])
+    cache = ResultCache(enabled=True, ttls={"time": 0, "get-library-docs": 60})
+
+    assert not cache.applies_to("time")
+    assert cache.applies_to("get-library-docs")
+
+    assert await cache.get("get-library-docs", {"id": "react", "topic": "hooks"}) is None
+    assert await cache.put("get-library-docs", {"id": "react", "topic": "hooks"}, result_body(1))
+    assert await cache.get("get-library-docs", {"topic": "hooks", "id": "react"}) == result_body(1)
+
+    now[0] += 61
+    assert await cache.get("get-library-docs", {"id": "react", "topic": "hooks"}) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+    assert cache.bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_is_bounded_by_bytes():
+    body = result_body(1, "x" * 100)
+    cache = ResultCache(enabled=True, ttls={"fetch": 60}, max_bytes=len(body) * 2)
+
+    for url in ("a", "b", "c"):
+        await cache.put("fetch", {"url": url}, body)
+    assert await cache.get("fetch", {"url": "a"}) is None
+    assert await cache.get("fetch", {"url": "c"}) == body
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.bytes == len(body) * 2
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_a_new_instance(tmp_path):
+    cache = ResultCache(enabled=True, ttls={"fetch": 60}, disk_dir=tmp_path)
+    await cache.put("fetch", {"url": "https://example.com"}, result_body(1))
+
+    restarted = ResultCache(enabled=True, ttls={"fetch": 60}, disk_dir=tmp_path)
+    assert await restarted.get("fetch", {"url": "https://example.com"}) == result_body(1)
+    assert restarted.stats()["disk_hits"] == 1
+    # 昇格後はメモリ層から返る
+    assert await restarted.get("fetch", {"url": "https://example.com"}) == result_body(1)
+    assert restarted.stats()["hits"] == 1
+    assert not list(tmp_path.glob("*/.tmp-*"))
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_sweeps_oldest_entries(tmp_path):
+    body = result_body(1, "x" * 100)
+    cache = ResultCache(enabled=True, ttls={"fetch": 60}, disk_dir=tmp_path, disk_max_bytes=len(body) * 3)
+
+    for url in range(5):
+        await cache.put("fetch", {"url": url}, body)
+
+    files = list(tmp_path.glob("*/*"))
+    assert 0 < len(files) < 5
+    assert sum(path.stat().st_size for path in files) <= len(body) * 3
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_private_to_this_user(tmp_path, monkeypatch):
+    cache = ResultCache(enabled=True, ttls={"fetch": 60}, disk_dir=tmp_path / "results")
+    await cache.put("fetch", {"url": "https://example.com"}, result_body(1))
+    assert (tmp_path / "results").stat().st_mode & 0o777 == 0o700
+
+    # 他ユーザー所有のディレクトリは読み書きしない
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(tmp_path / "results").st_uid + 1)
+    other = ResultCache(enabled=True, ttls={"fetch": 60}, disk_dir=tmp_path / "results")
+    assert await other.get("fetch", {"url": "https://example.com"}) is None
+    await other.put("fetch", {"url": "https://example.org"}, result_body(2))
+    assert len(list((tmp_path / "results").glob("*/*"))) == 1
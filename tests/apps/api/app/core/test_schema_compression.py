@@ -0,0 +1,67 @@
+"""
+Tests for the partitioned schema compression pass
+"""
+import copy
+
+from apps.api.app.core.schema_compression import SchemaCompressor
+
+
+def compressor() -> SchemaCompressor:
+    return SchemaCompressor(enabled=True, description_max_chars=40, enum_max_values=4, enum_preview_values=2)
+
+
+def test_long_descriptions_are_truncated_at_word_boundaries():
+    text = "Identifier of the customer this payment belongs to, if any."
+
+    truncated = compressor().truncate(text)
+
+    assert truncated == "Identifier of the customer this payment…"
+    assert compressor().truncate("short") == "short"
+
+
+def test_large_enums_become_a_count_and_preview():
+    schema = {
+        "type": "object",
+        "properties": {
+            "currency": {"type": "string", "description": "Currency", "enum": ["usd", "eur", "gbp", "jpy", "chf"]},
+            "mode": {"type": "string", "enum": ["a", "b"]},
+            "size": {"type": "integer", "enum": [1, 2, 3, 4, 5]},
+        },
+    }
+
+    properties = compressor().compress(schema)["properties"]
+
+    # 一部の値だけの enum は正しい値を拒否するため enum 自体を外す
+    assert "enum" not in properties["currency"]
+    assert properties["currency"]["description"].startswith("Currency One of 5 values: usd, eur, …")
+    assert properties["size"]["description"].startswith("One of 5 values: 1, 2, …")
+    assert properties["mode"] is schema["properties"]["mode"]
+
+
+def test_redundant_keys_are_dropped_and_input_is_shared():
+    schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {
+            "query": {"type": "string"},
+            "filter": {"type": "object", "required": [], "anyOf": [{"description": "x" * 80}]},
+        },
+        "required": [],
+    }
+    original = copy.deepcopy(schema)
+
+    compressed = compressor().compress(schema)
+
+    # MCP は inputSchema の type: object を必須としているので残す
+    assert compressed["type"] == "object"
+    assert "$schema" not in compressed and "required" not in compressed
+    assert "required" not in compressed["properties"]["filter"]
+    assert compressed["properties"]["filter"]["anyOf"][0]["description"].endswith("…")
+    assert compressed["properties"]["query"] is schema["properties"]["query"]
+    assert schema == original
+
+
+def test_schema_without_changes_is_returned_as_is():
+    schema = {"type": "object", "properties": {"query": {"type": "string", "description": "Search query"}}}
+
+    assert compressor().compress(schema) is schema
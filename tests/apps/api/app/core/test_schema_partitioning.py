@@ -0,0 +1,253 @@
+"""
+Tests for SchemaPartitioner
+"""
+import copy
+import json
+
+from apps.api.app.core.json_codec import codec
+from apps.api.app.core.schema_partitioning import SchemaPartitioner
+
+
+def payment_schema() -> dict:
+    return {
+        "type": "object",
+        "properties": {
+            "amount": {"type": "number", "description": "Amount in cents"},
+            "currency": {"type": "string", "enum": ["usd", "eur"]},
+            "metadata": {
+                "type": "object",
+                "description": "Extra data",
+                "properties": {
+                    "shipping": {
+                        "type": "object",
+                        "properties": {"address": {"type": "string"}},
+                    }
+                },
+            },
+        },
+        "required": ["amount"],
+    }
+
+
+def test_partition_keeps_top_level_only():
+    partitioner = SchemaPartitioner()
+
+    partitioned = partitioner.partition_schema(payment_schema())
+
+    assert partitioned == {
+        "type": "object",
+        "properties": {
+            "amount": {"type": "number", "description": "Amount in cents"},
+            "currency": {"type": "string", "enum": ["usd", "eur"]},
+            "metadata": {"type": "object", "description": "Extra data"},
+        },
+        "required": ["amount"],
+    }
+
+
+def test_partition_does_not_mutate_input():
+    partitioner = SchemaPartitioner()
+    schema = payment_schema()
+    original = copy.deepcopy(schema)
+
+    partitioner.partition_schema(schema)
+    partitioner.partition_schema({"type": "array", "items": schema})
+
+    assert schema == original
+
+
+def test_partition_array_items():
+    partitioner = SchemaPartitioner()
+
+    # items は1階層深いので depth=2 で要素のトップレベルまで残る
+    partitioned = partitioner.partition_schema({"type": "array", "items": payment_schema()}, depth=2)
+
+    assert partitioned["items"]["properties"]["metadata"] == {
+        "type": "object",
+        "description": "Extra data",
+    }
+
+
+def test_expand_schema_returns_stored_nodes_without_copying():
+    partitioner = SchemaPartitioner()
+    schema = payment_schema()
+    partitioner.store_full_schema("create_payment", schema)
+
+    assert partitioner.expand_schema("create_payment") is schema
+    assert (
+        partitioner.expand_schema("create_payment", ["metadata", "shipping"])
+        is schema["properties"]["metadata"]["properties"]["shipping"]
+    )
+    assert partitioner.expand_schema("create_payment", ["missing"]) is None
+    assert partitioner.expand_schema("unknown") is None
+
+
+def test_path_index_matches_walk_semantics():
+    """Indexed lookups agree with walking the schema, including explicit keys"""
+    partitioner = SchemaPartitioner()
+    schema = payment_schema()
+    partitioner.store_full_schema("create_payment", schema)
+    shipping = schema["properties"]["metadata"]["properties"]["shipping"]
+
+    slot = partitioner._slots[("", "create_payment")]
+    assert ("metadata", "shipping") in partitioner._path_index[slot]
+    assert partitioner.expand_schema("create_payment", ["metadata", "properties", "shipping"]) is shipping
+    assert partitioner.expand_schema("create_payment", ["required"]) == ["amount"]
+
+
+def test_render_expanded_schema_is_cached_and_invalidated():
+    partitioner = SchemaPartitioner()
+    partitioner.store_full_schema("create_payment", payment_schema())
+
+    first = partitioner.render_expanded_schema("create_payment", ["metadata"])
+    second = partitioner.render_expanded_schema("create_payment", ["metadata"])
+    compact_text, _ = partitioner.render_expanded_schema("create_payment", ["metadata"], pretty=False)
+
+    assert first is second
+    text, literal = first
+    assert json.loads(text)["description"] == "Extra data"
+    assert json.loads(literal) == text
+    assert "\n" not in compact_text and len(compact_text) < len(text)
+
+    # スキーマ更新でキャッシュは破棄される
+    updated = payment_schema()
+    updated["properties"]["metadata"]["description"] = "Updated"
+    partitioner.store_full_schema("create_payment", updated)
+
+    text, _ = partitioner.render_expanded_schema("create_payment", ["metadata"])
+    assert json.loads(text)["description"] == "Updated"
+    assert partitioner.render_expanded_schema("create_payment", ["missing"]) is None
+
+
+def test_full_schemas_are_bounded_lru():
+    partitioner = SchemaPartitioner(max_schemas=2)
+    partitioner.store_full_schema("a", payment_schema())
+    partitioner.store_full_schema("b", payment_schema())
+    partitioner.render_expanded_schema("a", ["metadata"])
+
+    # a は参照済みなので b が追い出される
+    partitioner.store_full_schema("c", payment_schema())
+
+    assert len(partitioner) == 2
+    assert partitioner.has_schema("a") and partitioner.has_schema("c")
+    assert partitioner.expand_schema("b") is None
+    # 解放した slot は再利用される
+    partitioner.store_full_schema("d", payment_schema())
+    assert len(partitioner._schemas) == 3
+
+
+def test_same_tool_name_on_two_servers_is_kept_apart():
+    partitioner = SchemaPartitioner()
+    github = {"type": "object", "properties": {"repo": {"type": "string"}}}
+    notion = {"type": "object", "properties": {"page": {"type": "string"}}}
+    partitioner.store_full_schema("search", github, "github")
+    partitioner.store_full_schema("search", notion, "notion")
+
+    assert partitioner.expand_schema("search", server_name="github") is github
+    assert partitioner.expand_schema("search", server_name="notion") is notion
+    # serverName なしでは曖昧
+    assert partitioner.servers_for("search") == ["github", "notion"]
+    assert partitioner.expand_schema("search") is None
+    assert partitioner.render_expanded_schema("search") is None
+
+    text, _ = partitioner.render_expanded_schema("search", ["page"], server_name="notion")
+    assert json.loads(text) == {"type": "string"}
+
+
+def test_drop_server_only_touches_its_tools():
+    partitioner = SchemaPartitioner()
+    partitioner.store_full_schema("search", payment_schema(), "github")
+    partitioner.store_full_schema("create_issue", payment_schema(), "github")
+    partitioner.store_full_schema("search", payment_schema(), "notion")
+    partitioner.render_expanded_schema("search", ["metadata"], server_name="github")
+
+    assert partitioner.drop_server("github") == 2
+
+    assert len(partitioner) == 1
+    assert partitioner.servers_for("search") == ["notion"]
+    # 残ったサーバーのツールは serverName なしで一意に解決できる
+    assert partitioner.expand_schema("search", ["amount"])["type"] == "number"
+    assert not partitioner._rendered
+
+
+def big_object(fields: int) -> dict:
+    return {
+        "type": "object",
+        "description": "Nested object",
+        "properties": {f"field_{i}": {"type": "string", "description": "x" * 40} for i in range(fields)},
+    }
+
+
+def test_plan_measures_collapsible_subtrees():
+    partitioner = SchemaPartitioner()
+    schema = payment_schema()
+    candidates = []
+
+    # 積み上げたサイズはコンパクトJSONと一致
+    assert partitioner._measure(schema, (), candidates) == len(codec.dumps(schema))
+    plan = partitioner.plan_partition(schema)
+    paths = [path for _, path in plan.candidates]
+    assert paths[0] == ("metadata",)
+    assert ("metadata", "shipping") in paths
+    # 畳み込んでも変わらない葉は候補にならない
+    assert ("amount",) not in paths
+
+
+def test_partition_to_budget_keeps_small_schemas_intact():
+    partitioner = SchemaPartitioner()
+    schema = payment_schema()
+
+    partitioned, collapsed = partitioner.partition_to_budget(schema, budget=10_000)
+
+    assert partitioned is schema
+    assert collapsed == set()
+
+
+def test_partition_to_budget_collapses_largest_subtrees_first():
+    partitioner = SchemaPartitioner()
+    schema = {
+        "type": "object",
+        "properties": {
+            "small": {"type": "object", "properties": {"flag": {"type": "boolean"}}},
+            "large": big_object(40),
+        },
+    }
+    full = partitioner.plan_partition(schema).full_tokens
+
+    partitioned, collapsed = partitioner.partition_to_budget(schema, budget=full // 2)
+
+    assert collapsed == {("large",)}
+    assert partitioned["properties"]["large"] == {"type": "object", "description": "Nested object"}
+    # 小さい部分木はそのまま（expandSchema 不要）、元のスキーマは変更しない
+    assert partitioned["properties"]["small"] is schema["properties"]["small"]
+    assert "properties" in schema["properties"]["large"]
+
+
+def test_collapse_paths_follows_expand_schema_paths():
+    partitioner = SchemaPartitioner()
+    schema = payment_schema()
+    schema["properties"]["lines"] = {"type": "array", "items": big_object(3)}
+
+    collapsed = partitioner.collapse_paths(schema, [("metadata", "shipping"), ("lines", "items")])
+
+    assert collapsed["properties"]["metadata"]["properties"]["shipping"] == {"type": "object"}
+    assert collapsed["properties"]["lines"]["items"] == {"type": "object", "description": "Nested object"}
+    assert collapsed["properties"]["amount"] is schema["properties"]["amount"]
+    assert partitioner.collapse_paths(schema, []) is schema
+
+
+def test_inline_paths_restores_hot_subtrees():
+    partitioner = SchemaPartitioner()
+    schema = payment_schema()
+    partitioned = partitioner.partition_schema(schema)
+
+    inlined = partitioner.inline_paths(partitioned, schema, [("metadata", "shipping")])
+
+    # 畳み込まれた祖先は slim に子を加えて復元、対象は元の部分木そのもの
+    metadata = inlined["properties"]["metadata"]
+    assert metadata["description"] == "Extra data"
+    assert metadata["properties"]["shipping"] is schema["properties"]["metadata"]["properties"]["shipping"]
+    assert inlined["properties"]["amount"] is partitioned["properties"]["amount"]
+    assert "properties" not in partitioned["properties"]["metadata"]
+    assert partitioner.inline_paths(partitioned, schema, [()]) is schema
+    assert partitioner.inline_paths(partitioned, schema, []) is partitioned
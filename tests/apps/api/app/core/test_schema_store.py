@@ -0,0 +1,153 @@
+"""
+Tests for the persistent schema store behind SchemaPartitioner
+"""
+import pytest
+
+from apps.api.app.core.schema_partitioning import SchemaPartitioner
+from apps.api.app.core.schema_store import SchemaStore, schema_hash
+
+
+class MemoryBackend:
+    """Stands in for the mcp_tool_schemas table (shared like the database)"""
+
+    def __init__(self):
+        # (server, tool, hash) -> (sequence, schema); sequence = last seen order
+        self.rows = {}
+        self.sequence = 0
+        self.saves = 0
+
+    async def load_latest(self, limit):
+        latest = {}
+        for (server, tool_name, _), (sequence, schema) in sorted(self.rows.items(), key=lambda row: -row[1][0]):
+            latest.setdefault((server, tool_name), schema)
+        return [(tool_name, server or None, schema) for (server, tool_name), schema in latest.items()][:limit]
+
+    async def load(self, tool_name, server_name=None):
+        rows = [
+            (sequence, server, schema)
+            for (server, name, _), (sequence, schema) in self.rows.items()
+            if name == tool_name and server_name in (None, server)
+        ]
+        if not rows:
+            return None
+        _, server, schema = max(rows, key=lambda row: row[0])
+        return server or None, schema
+
+    async def save(self, entries):
+        self.saves += 1
+        created = 0
+        for tool_name, digest, server, schema in entries:
+            self.sequence += 1
+            key = (server or "", tool_name, digest)
+            created += key not in self.rows
+            self.rows[key] = (self.sequence, schema)
+        return created
+
+
+class FailingBackend:
+    async def load_latest(self, limit):
+        raise ConnectionError("database unavailable")
+
+    load = save = load_latest
+
+
+def tool(name, description="query", server=None):
+    entry = {
+        "name": name,
+        "inputSchema": {"type": "object", "properties": {"q": {"type": "string", "description": description}}},
+    }
+    if server:
+        entry["_meta"] = {"server": server}
+    return entry
+
+
+def test_schema_hash_ignores_key_order():
+    schema = tool("search")["inputSchema"]
+
+    assert schema_hash(schema) == schema_hash(dict(reversed(list(schema.items()))))
+    assert schema_hash(schema) != schema_hash(tool("search", "changed")["inputSchema"])
+
+
+@pytest.mark.asyncio
+async def test_restarted_worker_is_warmed_from_the_store():
+    backend = MemoryBackend()
+    store = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+    await store.persist_tools([tool("search", "old"), tool("read_file")])
+    await store.persist_tools([tool("search", "new")])
+    await store.flush()
+
+    restarted = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+    assert await restarted.warm() == 2
+    assert restarted.partitioner.expand_schema("search", ["q"])["description"] == "new"
+    assert restarted.partitioner.expand_schema("read_file") == tool("read_file")["inputSchema"]
+
+
+@pytest.mark.asyncio
+async def test_unchanged_catalog_is_written_once():
+    backend = MemoryBackend()
+    store = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+
+    assert store.persist_tools([tool("search")]) is not None
+    assert store.persist_tools([tool("search")]) is None
+    await store.flush()
+
+    assert backend.saves == 1
+    assert store.stats()["saved"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_miss_is_loaded_from_the_store():
+    backend = MemoryBackend()
+    writer = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+    await writer.persist_tools([tool("search")])
+    await writer.flush()
+
+    # 別ワーカー: tools/list を処理していない
+    reader = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+    assert reader.partitioner.expand_schema("search") is None
+    assert await reader.load("search")
+    assert reader.partitioner.expand_schema("search", ["q"]) == {"type": "string", "description": "query"}
+    assert not await reader.load("unknown")
+    assert reader.stats()["load_misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_schemas_are_persisted_per_server():
+    backend = MemoryBackend()
+    store = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+    await store.persist_tools([tool("search", "github", server="github"), tool("search", "notion", server="notion")])
+    await store.flush()
+
+    restarted = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+    assert await restarted.warm() == 2
+    assert restarted.partitioner.expand_schema("search", ["q"], server_name="notion")["description"] == "notion"
+
+    reader = SchemaStore(SchemaPartitioner(), enabled=True, backend=backend)
+    assert await reader.load("search", "github")
+    assert reader.partitioner.expand_schema("search", ["q"], server_name="github")["description"] == "github"
+
+
+@pytest.mark.asyncio
+async def test_store_errors_do_not_fail_requests():
+    store = SchemaStore(SchemaPartitioner(), enabled=True, backend=FailingBackend())
+
+    assert await store.warm() == 0
+    assert not await store.load("search")
+    store.persist_tools([tool("search")])
+    await store.flush()
+
+    assert store.stats()["errors"] == 3
+    # 失敗した書き込みは次の tools/list で再試行する
+    assert store.persist_tools([tool("search")]) is not None
+    await store.flush()
+
+
+@pytest.mark.asyncio
+async def test_disabled_store_does_nothing():
+    backend = MemoryBackend()
+    store = SchemaStore(SchemaPartitioner(), enabled=False, backend=backend)
+
+    assert store.persist_tools([tool("search")]) is None
+    assert await store.warm() == 0
+    assert not await store.load("search")
+    assert backend.saves == 0
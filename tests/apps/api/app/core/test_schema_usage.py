@@ -0,0 +1,116 @@
+"""
+Tests for the expandSchema usage tracker (learned hot set)
+"""
+import json
+
+from apps.api.app.core.schema_usage import SchemaUsageTracker
+
+
+def test_paths_become_hot_at_threshold():
+    usage = SchemaUsageTracker(enabled=True, threshold=3, file_path=None)
+
+    assert not usage.record("search", ["options"], "github")
+    assert not usage.record("search", ["options"], "github")
+    assert usage.fingerprint() == ""
+    assert usage.record("search", ["options"], "github")
+    # 既にホットなパスは再通知しない
+    assert not usage.record("search", ["options"], "github")
+
+    assert usage.hot_paths("search", "github") == {("options",)}
+    assert usage.hot_paths("search") == set()
+    assert usage.fingerprint() != ""
+    # 不正な path は数えない
+    assert not usage.record("search", [1], "github")
+    assert usage.stats()["tracked_paths"] == 1
+
+
+def test_disabled_tracker_records_nothing():
+    usage = SchemaUsageTracker(enabled=False, threshold=1, file_path=None)
+
+    assert not usage.record("search", None)
+    assert usage.hot_paths("search") == set()
+    assert usage.fingerprint() == ""
+
+
+def test_hot_set_persists_and_merges_between_workers(tmp_path):
+    path = tmp_path / "hot.json"
+    worker_a = SchemaUsageTracker(enabled=True, threshold=1, file_path=path)
+    worker_b = SchemaUsageTracker(enabled=True, threshold=1, file_path=path)
+
+    worker_a.record("search", ["options"])
+    worker_a.save()
+    worker_b.record("read_file", None)
+    worker_b.save()
+
+    # 後から保存したワーカーも他方のホットセットを上書きしない
+    restarted = SchemaUsageTracker(enabled=True, threshold=1, file_path=path)
+    assert restarted.hot_paths("search") == {("options",)}
+    assert restarted.hot_paths("read_file") == {()}
+    assert len(json.loads(path.read_text())["hot"]) == 2
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+def test_counts_of_workers_add_up_to_the_threshold(tmp_path):
+    path = tmp_path / "hot.json"
+    workers = [SchemaUsageTracker(enabled=True, threshold=4, file_path=path) for _ in range(2)]
+
+    for worker in workers:
+        worker.record("search", ["options"])
+        worker.record("search", ["options"])
+        worker.save()
+
+    # 2ワーカー x 2回 = 閾値4（最大値での統合なら2のまま）
+    assert json.loads(path.read_text())["counts"] == [["", "search", ["options"], 4]]
+    assert workers[1].hot_paths("search") == {("options",)}
+    # 保存済みの回数は二重に加算されない
+    workers[1].save()
+    assert json.loads(path.read_text())["counts"] == [["", "search", ["options"], 4]]
+
+
+def test_paths_learned_by_another_worker_are_reloaded(tmp_path):
+    path = tmp_path / "hot.json"
+    worker_a = SchemaUsageTracker(enabled=True, threshold=1, file_path=path)
+    worker_b = SchemaUsageTracker(enabled=True, threshold=1, file_path=path)
+    assert worker_b.fingerprint() == ""
+
+    worker_a.record("search", ["options"])
+    worker_a.save()
+
+    assert worker_b.hot_paths("search") == {("options",)}
+    assert worker_b.fingerprint() == worker_a.fingerprint()
+
+
+def test_unsaved_counts_are_flushed_after_the_save_interval(tmp_path):
+    usage = SchemaUsageTracker(enabled=True, threshold=100, file_path=tmp_path / "hot.json", save_interval=0)
+
+    assert usage.record("search", ["options"])
+    assert usage.stats()["unsaved_calls"] == 1
+    usage.save()
+    assert usage.stats()["unsaved_calls"] == 0
+
+
+def test_malformed_entries_are_skipped(tmp_path):
+    path = tmp_path / "hot.json"
+    path.write_text(json.dumps({
+        "counts": [["s", "t"], ["", "search", ["options"], "3"], ["", "search", ["limit"], 2]],
+        "hot": [["s"], ["", "read_file", []]],
+    }))
+
+    usage = SchemaUsageTracker(enabled=True, threshold=5, file_path=path)
+
+    assert usage.hot_paths("read_file") == {()}
+    assert usage.stats()["tracked_paths"] == 1
+    usage.record("search", ["limit"])
+    usage.save()
+    assert json.loads(path.read_text())["counts"] == [["", "search", ["limit"], 3]]
+
+
+def test_least_used_paths_are_dropped():
+    usage = SchemaUsageTracker(enabled=True, threshold=100, file_path=None, max_tracked=10)
+    for _ in range(5):
+        usage.record("search", ["frequent"])
+    for i in range(20):
+        usage.record("search", [f"rare_{i}"])
+
+    assert usage.stats()["tracked_paths"] <= 10
+    assert usage._counts[("", "search", ("frequent",))] == 5
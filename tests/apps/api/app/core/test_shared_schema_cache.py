@@ -0,0 +1,109 @@
+"""
+Tests for the host-wide (cross-worker) schema cache
+"""
+import os
+
+from apps.api.app.core.shared_schema_cache import SharedSchemaCache
+
+
+def test_schemas_are_shared_between_instances(tmp_path):
+    worker_a = SharedSchemaCache(enabled=True, directory=tmp_path)
+    worker_b = SharedSchemaCache(enabled=True, directory=tmp_path)
+    schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+
+    assert worker_b.get_schema("search") is None
+    worker_a.put_schema("search", schema)
+
+    assert worker_b.get_schema("search") == (None, schema)
+    assert worker_b.stats()["schema_hits"] == 1
+    assert worker_b.stats()["schema_misses"] == 1
+    # 一時ファイルは残らない
+    assert not list(tmp_path.glob("*/.tmp-*"))
+
+
+def test_schemas_are_qualified_by_server(tmp_path):
+    cache = SharedSchemaCache(enabled=True, directory=tmp_path)
+    cache.put_schema("search", {"title": "github"}, "github")
+    cache.put_schema("search", {"title": "notion"}, "notion")
+
+    assert cache.get_schema("search", "github") == ("github", {"title": "github"})
+    assert cache.get_schema("search", "notion") == ("notion", {"title": "notion"})
+    # serverName なしの参照は最後に公開されたもの（サーバー名付き）
+    assert cache.get_schema("search") == ("notion", {"title": "notion"})
+    assert cache.get_schema("search", "slack") is None
+
+
+def test_catalogs_keep_only_the_newest_files(tmp_path):
+    cache = SharedSchemaCache(enabled=True, directory=tmp_path, max_catalogs=2)
+
+    for key in ("c1", "c2", "c3"):
+        cache.put_catalog(key, [{"name": key}], [{"full": 1, "partitioned": 1, "reduction": 0, "tool": 1}])
+
+    assert len(list((tmp_path / "catalogs").glob("*.json"))) == 2
+    assert cache.get_catalog("c3") == ([{"name": "c3"}], [{"full": 1, "partitioned": 1, "reduction": 0, "tool": 1}])
+
+
+def test_drop_server_deletes_only_that_servers_schemas(tmp_path):
+    cache = SharedSchemaCache(enabled=True, directory=tmp_path)
+    cache.put_schema("search", {"title": "notion"}, "notion")
+    cache.put_schema("search", {"title": "github"}, "github")
+    cache.put_schema("create_issue", {"title": "github"}, "github")
+
+    # サーバー名付き2件 + serverName なし用の2件（最後に公開したのが github）
+    assert cache.drop_server("github") == 4
+    assert cache.get_schema("search", "github") is None
+    assert cache.get_schema("create_issue") is None
+    assert cache.get_schema("search", "notion") == ("notion", {"title": "notion"})
+
+
+def test_corrupt_entries_are_misses(tmp_path):
+    cache = SharedSchemaCache(enabled=True, directory=tmp_path)
+    cache.put_schema("search", {"type": "object"})
+    cache._schema_path("search").write_bytes(b"{not json")
+
+    assert cache.get_schema("search") is None
+    assert cache.stats()["errors"] == 1
+
+
+def test_disabled_cache_does_not_touch_the_directory(tmp_path):
+    cache = SharedSchemaCache(enabled=False, directory=tmp_path / "shared")
+    cache.put_schema("search", {"type": "object"})
+
+    assert cache.get_schema("search") is None
+    assert not (tmp_path / "shared").exists()
+
+
+def test_directory_is_created_private(tmp_path):
+    shared = tmp_path / "shared"
+    cache = SharedSchemaCache(enabled=True, directory=shared)
+    cache.put_schema("search", {"type": "object"})
+
+    assert shared.stat().st_mode & 0o777 == 0o700
+    assert cache.stats()["private"] is True
+
+    # 既存ディレクトリのグループ・他ユーザー権限は外す
+    shared.chmod(0o777)
+    SharedSchemaCache(enabled=True, directory=shared).put_schema("search", {"type": "object"})
+    assert shared.stat().st_mode & 0o777 == 0o700
+
+
+def test_directory_owned_by_another_user_is_not_trusted(tmp_path, monkeypatch):
+    writer = SharedSchemaCache(enabled=True, directory=tmp_path)
+    writer.put_schema("search", {"type": "object"})
+
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(tmp_path).st_uid + 1)
+    cache = SharedSchemaCache(enabled=True, directory=tmp_path)
+
+    assert cache.get_schema("search") is None
+    assert not cache.active
+    assert cache.stats()["errors"] == 1
+
+
+def test_symlinked_directory_is_not_trusted(tmp_path):
+    (tmp_path / "elsewhere").mkdir()
+    (tmp_path / "shared").symlink_to(tmp_path / "elsewhere")
+    cache = SharedSchemaCache(enabled=True, directory=tmp_path / "shared")
+    cache.put_schema("search", {"type": "object"})
+
+    assert not cache.active
+    assert not list((tmp_path / "elsewhere").iterdir())
@@ -0,0 +1,88 @@
+"""
+Tests for byte-level SSE framing
+"""
+from apps.api.app.core.sse import (
+    SSEChunkCoalescer,
+    SSEEventFramer,
+    event_data,
+    replace_event_data,
+)
+
+
+def test_framer_assembles_events_across_chunks():
+    """Events split over several reads are emitted once complete"""
+    framer = SSEEventFramer()
+
+    assert framer.feed(b"event: message\ndata: {\"id\"") == []
+    assert framer.feed(b": 1}\n") == []
+    events = framer.feed(b"\ndata: {\"id\": 2}\n\ndata: partial")
+
+    assert events == [
+        b"event: message\ndata: {\"id\": 1}\n\n",
+        b"data: {\"id\": 2}\n\n",
+    ]
+    assert framer.flush() == b"data: partial"
+
+
+def test_framer_normalizes_crlf_split_across_chunks():
+    """CRLF line endings are normalized even when \\r and \\n arrive separately"""
+    framer = SSEEventFramer()
+
+    assert framer.feed(b"data: 1\r\n\r") == []
+    assert framer.feed(b"\ndata: 2\r\n\r\n") == [b"data: 1\n\n", b"data: 2\n\n"]
+
+
+
+def test_framer_completes_event_when_crlf_pair_is_split():
+    """An event is emitted as soon as the \n of a split CRLF pair arrives"""
+    framer = SSEEventFramer()
+
+    assert framer.feed(b"data: x\r\n\r") == []
+    assert framer.feed(b"\n") == [b"data: x\n\n"]
+    assert framer.flush() == b""
+
+
+def test_framer_handles_large_event_in_many_chunks():
+    """A large event fed in small chunks is assembled in linear time"""
+    framer = SSEEventFramer()
+    payload = b"x" * (8 * 1024 * 1024)
+    body = b"data: " + payload + b"\r\n\r\n"
+    chunk_size = 4096
+
+    events = []
+    for offset in range(0, len(body), chunk_size):
+        events += framer.feed(body[offset:offset + chunk_size])
+
+    assert events == [b"data: " + payload + b"\n\n"]
+    assert framer.flush() == b""
+
+def test_event_data_joins_data_lines():
+    """Multi-line data fields are joined with LF, optional space stripped"""
+    event = b"event: message\ndata: {\"a\":\ndata:1}\n\n"
+
+    assert event_data(event) == b"{\"a\":\n1}"
+    assert event_data(b": keep-alive\n\n") is None
+
+
+def test_replace_event_data_keeps_other_fields():
+    event = b"event: message\nid: 9\ndata: {}\n\n"
+
+    assert replace_event_data(event, b"[1]") == b"event: message\nid: 9\ndata: [1]\n\n"
+
+
+def test_coalescer_batches_until_limit():
+    """Events are batched up to the byte limit, then drained by the caller"""
+    coalescer = SSEChunkCoalescer(batch_max_bytes=10)
+
+    assert coalescer.push(b"abcd") is None
+    assert coalescer.push(b"efghijk") == b"abcdefghijk"
+    assert coalescer.push(b"xy") is None
+    assert coalescer.drain() == b"xy"
+    assert coalescer.drain() is None
+
+
+def test_coalescer_zero_limit_writes_each_event():
+    coalescer = SSEChunkCoalescer(batch_max_bytes=0)
+
+    assert coalescer.push(b"a") == b"a"
+    assert coalescer.push(b"b") == b"b"
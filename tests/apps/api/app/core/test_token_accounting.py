@@ -0,0 +1,118 @@
+"""
+Tests for live token accounting
+"""
+import asyncio
+import threading
+
+import pytest
+
+from apps.api.app.core import token_accounting
+from apps.api.app.core.token_accounting import (
+    HeuristicTokenizer,
+    LazyTokenizer,
+    TokenAccountant,
+    create_tokenizer,
+)
+
+
+class CountingTokenizer(HeuristicTokenizer):
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def count(self, text: str) -> int:
+        self.calls += 1
+        return super().count(text)
+
+
+def test_heuristic_tokenizer_is_selectable():
+    tokenizer = create_tokenizer("heuristic")
+
+    assert tokenizer.name == "heuristic"
+    assert tokenizer.count("a" * 40) == 10
+
+
+def test_tiktoken_falls_back_to_heuristic_when_unavailable():
+    tokenizer = create_tokenizer("tiktoken", "no-such-encoding")
+
+    assert tokenizer.name == "heuristic"
+
+
+
+def test_lazy_tokenizer_loads_on_first_use(monkeypatch):
+    created = []
+
+    def create(*args):
+        created.append(args)
+        return HeuristicTokenizer()
+
+    monkeypatch.setattr(token_accounting, "create_tokenizer", create)
+    tokenizer = LazyTokenizer("auto", "cl100k_base")
+
+    # import 時・生成時には読み込まない
+    assert created == []
+    assert tokenizer.name == "auto (not loaded)"
+    assert tokenizer.count("a" * 40) == 10
+    tokenizer.count("b" * 40)
+    assert created == [("auto", "cl100k_base")]
+    assert tokenizer.name == "heuristic"
+
+
+@pytest.mark.asyncio
+async def test_slow_tokenizer_load_falls_back_to_heuristic(monkeypatch):
+    release = threading.Event()
+
+    def slow_create(*args):
+        # BPEファイルのダウンロードが終わらない状況
+        release.wait(5)
+        return create_tokenizer("heuristic")
+
+    monkeypatch.setattr(token_accounting, "create_tokenizer", slow_create)
+    accountant = TokenAccountant(tokenizer=LazyTokenizer("tiktoken"))
+
+    await accountant.load_tokenizer(timeout=0.05)
+    assert accountant.tokenizer.name == "heuristic"
+    assert accountant.count_text("a" * 40) == 10
+    release.set()
+    await asyncio.sleep(0)
+
+def test_token_counts_are_memoized_by_content():
+    tokenizer = CountingTokenizer()
+    accountant = TokenAccountant(tokenizer=tokenizer, max_memo=2)
+
+    assert accountant.count_text("hello world!") == 3
+    assert accountant.count_text("hello world!") == 3
+    assert tokenizer.calls == 1
+
+    accountant.count_text("a")
+    accountant.count_text("b")
+    # LRU上限を超えたので最初のエントリは再計測
+    accountant.count_text("hello world!")
+    assert tokenizer.calls == 4
+
+
+def test_record_aggregates_by_tool_server_and_session():
+    accountant = TokenAccountant(tokenizer=HeuristicTokenizer())
+
+    accountant.record("tools_list", 100, tool_name="search", server_name="brave", session_id="s1")
+    # tools/call ではサーバー名を tools/list から引き継ぐ
+    accountant.record("tools_call", 40, tool_name="search", session_id="s1")
+    accountant.record("expand_schema", 10, tool_name="search", session_id="s2")
+
+    snapshot = accountant.snapshot()
+    assert snapshot["phases"]["tools_call"] == {"tokens": 40, "messages": 1}
+    assert snapshot["tools"]["search"]["tools_list"]["tokens"] == 100
+    assert snapshot["servers"]["brave"]["tools_call"]["tokens"] == 40
+    assert snapshot["sessions"]["s1"]["tools_call"]["tokens"] == 40
+    assert snapshot["sessions"]["s2"]["expand_schema"]["messages"] == 1
+
+
+def test_session_totals_are_bounded():
+    accountant = TokenAccountant(tokenizer=HeuristicTokenizer(), max_sessions=2)
+
+    for session_id in ("s1", "s2", "s3"):
+        accountant.record("tools_call", 1, session_id=session_id)
+
+    assert list(accountant.snapshot()["sessions"]) == ["s2", "s3"]
+    assert accountant.phases["tools_call"]["messages"] == 3
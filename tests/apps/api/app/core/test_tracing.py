@@ -0,0 +1,130 @@
+"""
+Tests for span tracing and OTLP/JSON export
+"""
+import json
+
+from apps.api.app.core.tracing import NOOP_SPAN, NonRecordingSpan, Tracer, parse_traceparent
+
+
+def exported_spans(path) -> list:
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return spans
+
+
+def test_parse_traceparent():
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert parse_traceparent(f"00-{trace_id}-00f067aa0ba902b7-01") == (trace_id, "00f067aa0ba902b7", True)
+    assert parse_traceparent(f"00-{trace_id}-00f067aa0ba902b7-00")[2] is False
+    assert parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+def test_nested_spans_are_exported_as_otlp_json(tmp_path):
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl")
+
+    with tracer.span("mcp.jsonrpc", **{"mcp.tool": "search", "mcp.server": None}) as root:
+        with tracer.span("proxy.parse_body") as child:
+            assert tracer.current_span() is child
+        assert tracer.current_span() is root
+    tracer.flush()
+
+    child_span, root_span = exported_spans(tmp_path / "traces.jsonl")
+    assert child_span["traceId"] == root_span["traceId"]
+    assert child_span["parentSpanId"] == root_span["spanId"]
+    assert "parentSpanId" not in root_span
+    assert root_span["attributes"] == [{"key": "mcp.tool", "value": {"stringValue": "search"}}]
+    assert int(root_span["endTimeUnixNano"]) >= int(root_span["startTimeUnixNano"])
+    assert tracer.stats()["exported"] == 2
+
+
+def test_incoming_traceparent_is_continued(tmp_path):
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl")
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+    with tracer.span("mcp.jsonrpc", traceparent=f"00-{trace_id}-00f067aa0ba902b7-01") as span:
+        assert span.traceparent == f"00-{trace_id}-{span.span_id}-01"
+    with tracer.span("mcp.jsonrpc", traceparent=f"00-{trace_id}-00f067aa0ba902b7-00") as unsampled:
+        assert isinstance(unsampled, NonRecordingSpan)
+    tracer.flush()
+
+    (exported,) = exported_spans(tmp_path / "traces.jsonl")
+    assert exported["traceId"] == trace_id
+    assert exported["parentSpanId"] == "00f067aa0ba902b7"
+
+
+def test_unsampled_trace_is_inherited_by_child_spans(tmp_path):
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl")
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+    with tracer.span("mcp.jsonrpc", traceparent=f"00-{trace_id}-00f067aa0ba902b7-00") as root:
+        assert tracer.current_span() is root
+        with tracer.span("upstream.call") as child:
+            assert isinstance(child, NonRecordingSpan)
+            assert child.traceparent == f"00-{trace_id}-00f067aa0ba902b7-00"
+            tracer.http_event("http11.receive_response_headers.started")
+    assert tracer.current_span() is None
+    tracer.flush()
+
+    assert not (tmp_path / "traces.jsonl").exists()
+
+
+def test_new_trace_losing_the_sample_roll_stays_unsampled(tmp_path):
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl", sample_rate=0.0)
+
+    with tracer.span("mcp.jsonrpc") as root:
+        with tracer.span("upstream.call") as child:
+            assert child.trace_id == root.trace_id
+            assert child.traceparent.endswith("-00")
+    tracer.flush()
+
+    assert not (tmp_path / "traces.jsonl").exists()
+
+
+def test_http_events_become_child_spans(tmp_path):
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl")
+
+    with tracer.span("upstream.call"):
+        for event in (
+            "connection.connect_tcp.started",
+            "connection.connect_tcp.complete",
+            "http11.receive_response_headers.started",
+            "http11.receive_response_headers.failed",
+            "http11.send_request_headers.started",
+        ):
+            tracer.http_event(event)
+    tracer.flush()
+
+    connect, wait, call = exported_spans(tmp_path / "traces.jsonl")
+    assert (connect["name"], wait["name"], call["name"]) == ("upstream.connect", "upstream.wait", "upstream.call")
+    assert connect["parentSpanId"] == call["spanId"]
+    assert wait["status"]["code"] == 2
+
+
+def test_errors_are_recorded_on_the_span(tmp_path):
+    tracer = Tracer(enabled=True, file_path=tmp_path / "traces.jsonl")
+
+    try:
+        with tracer.span("proxy.parse_body"):
+            raise ValueError("bad json")
+    except ValueError:
+        pass
+    tracer.flush()
+
+    (span,) = exported_spans(tmp_path / "traces.jsonl")
+    assert span["status"] == {"code": 2, "message": "ValueError: bad json"}
+
+
+def test_disabled_tracer_records_nothing(tmp_path):
+    tracer = Tracer(enabled=False, file_path=tmp_path / "traces.jsonl")
+
+    with tracer.span("mcp.jsonrpc") as span:
+        assert span is NOOP_SPAN
+        assert tracer.current_span() is None
+    tracer.flush()
+
+    assert not (tmp_path / "traces.jsonl").exists()
@@ -0,0 +1,120 @@
+"""
+Tests for the shared upstream client pool
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from apps.api.app.core import metrics
+from apps.api.app.core.upstream_client import RouteLimiter, UpstreamClientPool
+
+
+@pytest.mark.asyncio
+async def test_route_limiter_counts_saturation_waits():
+    """Requests beyond the route limit wait and are counted"""
+    limiter = RouteLimiter("rpc", limit=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.acquire():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    assert limiter.in_flight == 1
+    assert limiter.waits == 1
+    assert limiter.waiting == 1
+
+    observed = sum(metrics.upstream_route_wait_seconds._series.get(("rpc",), ([], []))[0])
+    release.set()
+    await asyncio.gather(holder, waiter)
+
+    stats = limiter.stats()
+    assert stats["requests"] == 2
+    assert stats["in_flight"] == 0
+    assert stats["waiting"] == 0
+    assert sum(metrics.upstream_route_wait_seconds._series[("rpc",)][0]) == observed + 1
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_single_client():
+    """The same AsyncClient is shared until the pool is closed"""
+    pool = UpstreamClientPool(base_url="http://gateway.test")
+    await pool.start()
+    client = pool.client
+
+    assert pool.client is client
+
+    await pool.close()
+    assert pool._client is None
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_reuse_ratio():
+    """Connection reuse is derived from requests minus fresh TCP connects"""
+    pool = UpstreamClientPool(
+        base_url="http://gateway.test",
+        route_limits={"rpc": 4},
+    )
+    pool._client = httpx.AsyncClient(
+        base_url="http://gateway.test",
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})),
+    )
+
+    for _ in range(4):
+        async with pool.route("rpc"):
+            await pool.client.post("/", content=b"{}", extensions=pool.extensions)
+    await pool._trace("connection.connect_tcp.complete", {})
+
+    stats = pool.stats()
+    assert stats["requests"] == 4
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 3
+    assert stats["reuse_ratio"] == 0.75
+    assert stats["saturation"] == 0.0
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_jsonrpc_proxy_uses_shared_pool(monkeypatch):
+    """tools/call is forwarded through the shared pool"""
+    from apps.api.app.api.endpoints import mcp_proxy
+
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(json.loads(request.content))
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": {}})
+
+    pool = UpstreamClientPool(base_url="http://gateway.test")
+    pool._client = httpx.AsyncClient(
+        base_url="http://gateway.test",
+        transport=httpx.MockTransport(handler),
+    )
+    monkeypatch.setattr(mcp_proxy, "upstream_pool", pool)
+
+    class FakeRequest:
+        query_params = {}
+        headers = {}
+
+        async def body(self):
+            return json.dumps({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "tools/call",
+                "params": {"name": "time", "arguments": {}},
+            }).encode()
+
+    response = await mcp_proxy.mcp_jsonrpc_proxy(FakeRequest())
+
+    assert response.status_code == 200
+    assert seen[0]["params"]["name"] == "time"
+    assert pool.stats()["routes"]["rpc"]["requests"] == 1
+
+    await pool.close()
@@ -0,0 +1,160 @@
+"""
+Tests for the streaming, resumable token measurement analyzer
+"""
+import gzip
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+tiktoken = pytest.importorskip("tiktoken")
+try:
+    tiktoken.get_encoding("cl100k_base")
+except Exception:  # BPE file cannot be downloaded (offline)
+    pytest.skip("cl100k_base encoding unavailable", allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "tools" / "measurement"))
+
+import measure_token_reduction as measurement  # noqa: E402
+
+
+def entry(phase, direction, message, **metadata):
+    return {
+        "direction": direction,
+        "method": message.get("method"),
+        "id": message.get("id"),
+        "message": message,
+        "metadata": {"phase": phase, **metadata},
+    }
+
+
+def write_lines(path: Path, entries, opener=open):
+    with opener(path, "at") as f:
+        for e in entries:
+            f.write(json.dumps(e) + "\n")
+
+
+TOOLS_LIST_REQUEST = {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}
+TOOLS_LIST_RESPONSE = {"jsonrpc": "2.0", "id": 1, "result": {"tools": [{"name": "a"}, {"name": "b"}]}}
+EXPAND_REQUEST = {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "expandSchema"}}
+
+
+def test_single_pass_matches_phase_methods(tmp_path):
+    log_file = tmp_path / "protocol_messages.jsonl"
+    write_lines(log_file, [
+        entry("initialize", "client→server", {"jsonrpc": "2.0", "id": 0, "method": "initialize"}),
+        entry("tools_list", "client→server", TOOLS_LIST_REQUEST),
+        entry("tools_list", "server→client", TOOLS_LIST_RESPONSE),
+        entry("expand_schema", "client→server", EXPAND_REQUEST, tool_name="stripe"),
+        entry("expand_schema", "server→client", {"jsonrpc": "2.0", "id": 2, "result": {}}, tool_name="stripe"),
+    ])
+
+    measurer = measurement.TokenMeasurement(log_file)
+    result = measurer.measure_all()
+    entries = measurer.parse_log_file()
+
+    assert result["entry_count"] == 5
+    assert result["phases"]["tools_list"] == measurer.measure_tools_list_phase(entries)
+    assert result["phases"]["tools_list"]["tool_count"] == 2
+    assert result["phases"]["expand_schema"]["calls"] == [
+        {"tool_name": "stripe", "tokens": result["phases"]["expand_schema"]["total_tokens"], "call_count": 1}
+    ]
+    assert result["total_tokens"] == sum([
+        result["phases"]["initialize"]["tokens"],
+        result["phases"]["tools_list"]["total_tokens"],
+        result["phases"]["expand_schema"]["total_tokens"],
+    ])
+
+
+def test_checkpoint_resumes_across_rotation(tmp_path):
+    log_file = tmp_path / "protocol_messages.jsonl"
+    checkpoint = tmp_path / "checkpoint.json"
+    first = [entry("tools_list", "client→server", TOOLS_LIST_REQUEST)] * 2
+    write_lines(log_file, first)
+
+    baseline = measurement.TokenMeasurement(log_file).measure_all(checkpoint)
+    assert baseline["new_entries"] == 2
+
+    # 追記後にローテーション + 圧縮され、新しい active segment に続きが書かれる
+    write_lines(log_file, [entry("tools_list", "server→client", TOOLS_LIST_RESPONSE)])
+    rotated = tmp_path / "protocol_messages.20260101T000000.000000.jsonl.gz"
+    with gzip.open(rotated, "wb") as f:
+        f.write(log_file.read_bytes())
+    log_file.unlink()
+    write_lines(log_file, [entry("tools_list", "client→server", TOOLS_LIST_REQUEST)])
+
+    resumed = measurement.TokenMeasurement(log_file).measure_all(checkpoint)
+    full = measurement.TokenMeasurement(log_file).measure_all()
+
+    assert resumed["resumed"] is True
+    assert resumed["new_entries"] == 2
+    assert resumed["entry_count"] == full["entry_count"] == 4
+    assert resumed["phases"] == full["phases"]
+
+    again = measurement.TokenMeasurement(log_file).measure_all(checkpoint)
+    assert again["new_entries"] == 0
+    assert again["phases"] == full["phases"]
+
+
+def test_checkpoint_resumes_across_zstd_rotation(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    log_file = tmp_path / "protocol_messages.jsonl"
+    checkpoint = tmp_path / "checkpoint.json"
+    write_lines(log_file, [entry("tools_list", "client→server", TOOLS_LIST_REQUEST)] * 2)
+    measurement.TokenMeasurement(log_file).measure_all(checkpoint)
+
+    # zstd の stream reader は seek できない（checkpoint位置まで読み飛ばす）
+    write_lines(log_file, [entry("tools_list", "server→client", TOOLS_LIST_RESPONSE)])
+    rotated = tmp_path / "protocol_messages.20260101T000000.000000.jsonl.zst"
+    rotated.write_bytes(zstandard.ZstdCompressor().compress(log_file.read_bytes()))
+    log_file.unlink()
+    write_lines(log_file, [entry("tools_list", "client→server", TOOLS_LIST_REQUEST)])
+
+    resumed = measurement.TokenMeasurement(log_file).measure_all(checkpoint)
+    full = measurement.TokenMeasurement(log_file).measure_all()
+
+    assert resumed["new_entries"] == 2
+    assert resumed["phases"] == full["phases"]
+
+    measurer = measurement.TokenMeasurement(log_file)
+    measurer.min_shard_bytes = 256
+    assert measurer.measure_all(checkpoint, workers=2)["new_entries"] == 0
+
+
+def test_token_counts_are_memoized(tmp_path):
+    measurer = measurement.TokenMeasurement(tmp_path / "protocol_messages.jsonl")
+    calls = []
+    encode = measurer.encoding.encode
+    measurer.encoding = type("Encoding", (), {"encode": lambda self, text: calls.append(text) or encode(text)})()
+
+    assert measurer.count_message_tokens(TOOLS_LIST_RESPONSE) == measurer.count_message_tokens(TOOLS_LIST_RESPONSE)
+    assert len(calls) == 1
+
+
+def test_parallel_shards_merge_to_sequential_totals(tmp_path):
+    log_file = tmp_path / "protocol_messages.jsonl"
+    entries = []
+    for i in range(60):
+        entries.append(entry("tools_list", "client→server", {**TOOLS_LIST_REQUEST, "id": i}))
+        entries.append(entry("tools_list", "server→client", {**TOOLS_LIST_RESPONSE, "id": i}))
+        entries.append(entry("expand_schema", "client→server", {**EXPAND_REQUEST, "id": i}, tool_name=f"tool{i % 7}"))
+    write_lines(log_file, entries)
+    rotated = tmp_path / "protocol_messages.20260101T000000.000000.jsonl.gz"
+    write_lines(rotated, entries[:30], opener=gzip.open)
+
+    sequential = measurement.TokenMeasurement(log_file).measure_all()
+    measurer = measurement.TokenMeasurement(log_file)
+    measurer.min_shard_bytes = 256
+    parallel = measurer.measure_all(workers=3)
+
+    assert parallel["entry_count"] == sequential["entry_count"] == 210
+    assert parallel["phases"] == sequential["phases"]
+
+
+def test_split_byte_ranges_covers_the_range():
+    ranges = measurement.split_byte_ranges(10, 110, shards=4, min_shard_bytes=1)
+
+    assert ranges[0][0] == 10 and ranges[-1][1] == 110
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert measurement.split_byte_ranges(0, 100, shards=8, min_shard_bytes=60) == [[0, 100]]
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark: measure_token_reduction.py --workers N
+
+Generates a synthetic protocol log and times the analyzer with 1..N worker
+processes, checking that every run produces the same per-phase totals.
+
+Usage:
+    python tools/measurement/benchmark_workers.py --entries 20000 --workers 1 2 4 8 16
+
+--synthetic-encoding replaces cl100k_base with a byte-level BPE for
+machines that cannot download the tiktoken encoding file (timings are then
+only comparable with each other, not with real cl100k runs).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import tiktoken  # noqa: E402
+
+import measure_token_reduction as measurement  # noqa: E402
+
+
+def register_synthetic_encoding() -> None:
+    """
+    Register a byte-level encoding under the name cl100k_base (inherited by
+    forked worker processes)
+    """
+    cl100k_pattern = (
+        r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+    )
+    encoding = tiktoken.Encoding(
+        name="cl100k_base",
+        pat_str=cl100k_pattern,
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+    tiktoken.registry.ENCODINGS["cl100k_base"] = encoding
+
+
+def generate_log(log_file: Path, entries: int, seed: int = 0) -> None:
+    """
+    Write a synthetic protocol log (tools/list, expandSchema, initialize)
+    """
+    rng = random.Random(seed)
+    words = ["customer", "invoice", "metadata", "shipping", "address", "amount", "currency", "status"]
+
+    def schema(depth: int) -> dict:
+        properties = {}
+        for _ in range(rng.randint(3, 8)):
+            name = rng.choice(words) + str(rng.randint(0, 999))
+            if depth > 0 and rng.random() < 0.3:
+                properties[name] = schema(depth - 1)
+            else:
+                properties[name] = {
+                    "type": rng.choice(["string", "integer", "boolean"]),
+                    "description": " ".join(rng.choice(words) for _ in range(rng.randint(5, 20))),
+                }
+        return {"type": "object", "properties": properties}
+
+    with log_file.open("w") as f:
+        for i in range(entries):
+            kind = rng.random()
+            if kind < 0.05:
+                phase, direction = "initialize", "client→server"
+                message = {"jsonrpc": "2.0", "id": i, "method": "initialize", "params": {}}
+            elif kind < 0.35:
+                phase, direction = "tools_list", "server→client"
+                tools = [
+                    {"name": f"tool_{rng.randint(0, 200)}", "inputSchema": schema(2)}
+                    for _ in range(rng.randint(5, 15))
+                ]
+                message = {"jsonrpc": "2.0", "id": i, "result": {"tools": tools}}
+            else:
+                phase, direction = "expand_schema", "server→client"
+                text = json.dumps(schema(2), indent=2)
+                message = {"jsonrpc": "2.0", "id": i, "result": {"content": [{"type": "text", "text": text}]}}
+
+            f.write(json.dumps({
+                "timestamp": f"2026-01-01T00:00:{i:06d}",
+                "direction": direction,
+                "method": message.get("method"),
+                "id": i,
+                "message": message,
+                "metadata": {"phase": phase, "tool_name": f"tool_{i % 50}"},
+            }) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--synthetic-encoding", action="store_true")
+    args = parser.parse_args()
+
+    if args.synthetic_encoding:
+        register_synthetic_encoding()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = Path(tmp) / "protocol_messages.jsonl"
+        generate_log(log_file, args.entries)
+        size_mb = log_file.stat().st_size / 1024 / 1024
+        print(f"Log: {args.entries} entries, {size_mb:.1f} MiB, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'MiB/s':>8}")
+
+        baseline_seconds = None
+        baseline_phases = None
+        for workers in args.workers:
+            measurer = measurement.TokenMeasurement(log_file)
+            # シャード数を worker 数に見合うだけ確保
+            measurer.min_shard_bytes = 64 * 1024
+            started = time.perf_counter()
+            result = measurer.measure_all(workers=workers)
+            seconds = time.perf_counter() - started
+
+            if baseline_seconds is None:
+                baseline_seconds, baseline_phases = seconds, result["phases"]
+            elif result["phases"] != baseline_phases:
+                sys.exit(f"❌ workers={workers} produced different totals")
+
+            print(f"{workers:>8} {seconds:>9.2f} {baseline_seconds / seconds:>7.2f}x {size_mb / seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,35 +4,467 @@ Token Reduction Measurement Script
 
 Measures actual token reduction achieved by OpenMCP Pattern.
 Compares baseline (full schema) vs OpenMCP (lazy loading).
+
+Reads the active log plus rotated segments (protocol_messages.<ts>.jsonl[.gz|.zst])
+and resolves payloads stored in the blob store (logs/blobs). Truncated entries
+contribute the token count recorded by the gateway; sampled-out messages are
+simply absent (entries carry "sample_rate" when phase sampling applied).
+
+The log is analyzed in one streaming pass; --checkpoint saves the byte
+position and running totals so the next (e.g. daily) run only reads new entries.
+--workers N shards the log by byte range and tokenizes in N processes with
+tiktoken's encode_batch; shard results are merged in log order.
 """
 
+import argparse
+import gzip
+import hashlib
+import io
 import json
+import os
 import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import IO, Dict, Iterable, Iterator, List, Any, Optional
 import tiktoken
 
 
+def log_segments(log_file: Path) -> List[Path]:
+    """
+    Rotated segments (oldest first) followed by the active log file
+
+    Args:
+        log_file: Path to protocol_messages.jsonl
+
+    Returns:
+        Existing segment paths in chronological order
+    """
+    rotated = sorted(
+        path for path in log_file.parent.glob(f"{log_file.stem}.*{log_file.suffix}*")
+        if path != log_file and not path.name.endswith(".tmp")
+    )
+    if log_file.exists():
+        rotated.append(log_file)
+    return rotated
+
+
+def open_log_segment(path: Path) -> IO[bytes]:
+    """
+    Open a plain, gzip or zstd segment for binary line reading
+
+    Args:
+        path: Segment or blob path
+
+    Returns:
+        Binary file object
+    """
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+
+    if path.suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            sys.exit(f"❌ Error: {path} is zstd-compressed; install 'zstandard' to read it")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(path.open("rb")))
+
+    return path.open("rb")
+
+
+def skip_to(f: IO[bytes], path: Path, offset: int) -> None:
+    """
+    Move a segment opened by open_log_segment to a byte offset
+
+    Compressed segments are read forward and the bytes discarded: the zstd
+    stream reader cannot seek, and offsets are in decompressed bytes anyway.
+
+    Args:
+        f: File object from open_log_segment
+        path: Segment path
+        offset: Byte offset (decompressed for compressed segments)
+    """
+    if path.suffix not in (".gz", ".zst"):
+        f.seek(offset)
+        return
+    remaining = offset
+    while remaining:
+        chunk = f.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+
+
+def resolve_message(entry: Dict[str, Any], blob_dir: Path) -> Dict[str, Any]:
+    """
+    Load a payload stored in the blob store back into entry["message"]
+
+    Args:
+        entry: Log entry (may carry "message_ref" instead of "message")
+        blob_dir: Blob store directory (logs/blobs)
+
+    Returns:
+        Entry with "message"
+    """
+    ref = entry.get("message_ref")
+    if ref is None or "message" in entry:
+        return entry
+
+    digest = ref["blob"]
+    for suffix in (".json", ".json.gz", ".json.zst"):
+        path = blob_dir / digest[:2] / (digest + suffix)
+        if path.exists():
+            with open_log_segment(path) as f:
+                entry["message"] = json.loads(f.read())
+            return entry
+
+    raise FileNotFoundError(f"Blob {digest} referenced by the log is missing from {blob_dir}")
+
+
+class InitializeAccumulator:
+    """
+    Running totals of the initialize phase
+    """
+
+    phase = "initialize"
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        self.state = state or {"tokens": 0, "count": 0, "messages": []}
+
+    def add(self, entry: Dict[str, Any], tokens: int) -> None:
+        self.state["tokens"] += tokens
+        self.state["count"] += 1
+        self.state["messages"].append(entry.get("method"))
+
+    def merge(self, state: Dict[str, Any]) -> None:
+        """Fold in the totals of a later shard"""
+        self.state["tokens"] += state["tokens"]
+        self.state["count"] += state["count"]
+        self.state["messages"].extend(state["messages"])
+
+    def result(self) -> Dict[str, Any]:
+        if not self.state["count"]:
+            return {"phase": "initialize", "tokens": 0, "count": 0}
+        return {"phase": "initialize", **self.state}
+
+
+class ToolsListAccumulator:
+    """
+    Running totals of the tools/list phase (requests and responses separately)
+    """
+
+    phase = "tools_list"
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        # tool_count: None until a response with a tool list is seen
+        self.state = state or {"request_tokens": 0, "response_tokens": 0, "count": 0, "tool_count": None}
+
+    def add(self, entry: Dict[str, Any], tokens: int) -> None:
+        self.state["count"] += 1
+        if entry["direction"] == "client→server":
+            self.state["request_tokens"] += tokens
+        elif entry["direction"] == "server→client":
+            self.state["response_tokens"] += tokens
+            # Tool count of the latest response that still carries its payload
+            result = entry.get("message", {}).get("result")
+            if isinstance(result, dict) and "tools" in result:
+                self.state["tool_count"] = len(result["tools"])
+
+    def merge(self, state: Dict[str, Any]) -> None:
+        """Fold in the totals of a later shard"""
+        self.state["request_tokens"] += state["request_tokens"]
+        self.state["response_tokens"] += state["response_tokens"]
+        self.state["count"] += state["count"]
+        if state["tool_count"] is not None:
+            self.state["tool_count"] = state["tool_count"]
+
+    def result(self) -> Dict[str, Any]:
+        if not self.state["count"]:
+            return {"phase": "tools_list", "tokens": 0, "count": 0}
+        return {
+            "phase": "tools_list",
+            "request_tokens": self.state["request_tokens"],
+            "response_tokens": self.state["response_tokens"],
+            "total_tokens": self.state["request_tokens"] + self.state["response_tokens"],
+            "count": self.state["count"],
+            "tool_count": self.state["tool_count"] or 0
+        }
+
+
+class ExpandSchemaAccumulator:
+    """
+    Running totals of expandSchema calls, grouped by tool
+    """
+
+    phase = "expand_schema"
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        self.state = state or {"count": 0, "tools": {}}
+
+    def add(self, entry: Dict[str, Any], tokens: int) -> None:
+        self.state["count"] += 1
+        tool_name = entry.get("metadata", {}).get("tool_name", "unknown")
+        totals = self.state["tools"].setdefault(tool_name, {"tokens": 0, "entries": 0})
+        totals["tokens"] += tokens
+        totals["entries"] += 1
+
+    def merge(self, state: Dict[str, Any]) -> None:
+        """Fold in the totals of a later shard (tools keep first-seen order)"""
+        self.state["count"] += state["count"]
+        for tool_name, other in state["tools"].items():
+            totals = self.state["tools"].setdefault(tool_name, {"tokens": 0, "entries": 0})
+            totals["tokens"] += other["tokens"]
+            totals["entries"] += other["entries"]
+
+    def result(self) -> Dict[str, Any]:
+        if not self.state["count"]:
+            return {"phase": "expand_schema", "tokens": 0, "count": 0, "calls": []}
+
+        calls = [
+            {
+                "tool_name": tool_name,
+                "tokens": totals["tokens"],
+                "call_count": totals["entries"] // 2  # request + response
+            }
+            for tool_name, totals in self.state["tools"].items()
+        ]
+        return {
+            "phase": "expand_schema",
+            "total_tokens": sum(call["tokens"] for call in calls),
+            "count": self.state["count"],
+            "calls": calls
+        }
+
+
+PHASE_ACCUMULATORS = {
+    accumulator.phase: accumulator
+    for accumulator in (InitializeAccumulator, ToolsListAccumulator, ExpandSchemaAccumulator)
+}
+
+CHECKPOINT_VERSION = 1
+
+
+def segment_fingerprint(path: Path) -> str:
+    """
+    Identify a segment by its first line (survives rotation and compression)
+
+    Args:
+        path: Segment path
+
+    Returns:
+        Hex digest of the first line
+    """
+    with open_log_segment(path) as f:
+        first_line = f.readline()
+    return hashlib.blake2b(first_line, digest_size=16).hexdigest()
+
+
+def load_checkpoint(checkpoint_file: Path) -> Optional[Dict[str, Any]]:
+    """
+    Load a checkpoint written by a previous run
+
+    Args:
+        checkpoint_file: Checkpoint path
+
+    Returns:
+        Checkpoint data, or None if missing or written by another version
+    """
+    if not checkpoint_file.exists():
+        return None
+
+    with checkpoint_file.open("r") as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        print(f"⚠️  Ignoring checkpoint with unsupported version: {checkpoint_file}")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_file: Path, checkpoint: Dict[str, Any]) -> None:
+    """
+    Atomically write a checkpoint
+
+    Args:
+        checkpoint_file: Checkpoint path
+        checkpoint: Position and accumulator state
+    """
+    checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+    partial = checkpoint_file.with_name(checkpoint_file.name + ".tmp")
+    with partial.open("w") as f:
+        json.dump(checkpoint, f)
+    os.replace(partial, checkpoint_file)
+
+
+def complete_size(path: Path) -> int:
+    """
+    Size of an uncompressed file up to its last complete line
+
+    Args:
+        path: Plain JSONL file that may be appended to concurrently
+
+    Returns:
+        Byte offset just after the last newline
+    """
+    size = path.stat().st_size
+    with path.open("rb") as f:
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def split_byte_ranges(start: int, end: int, shards: int, min_shard_bytes: int) -> List[List[int]]:
+    """
+    Split [start, end) into up to `shards` ranges of at least min_shard_bytes
+
+    Workers re-align each range to line boundaries: a line belongs to the
+    range it starts in.
+    """
+    length = end - start
+    if length <= 0:
+        return []
+
+    shards = max(1, min(shards, length // max(min_shard_bytes, 1)))
+    bounds = [start + length * i // shards for i in range(shards)] + [end]
+    return [[bounds[i], bounds[i + 1]] for i in range(shards)]
+
+
+# Worker process state (one tiktoken encoding per process)
+_worker_encoding = None
+
+# Entries tokenized together with encode_batch in a worker
+SHARD_BATCH_ENTRIES = 2048
+
+
+def _init_worker(encoding_name: str) -> None:
+    global _worker_encoding
+    _worker_encoding = tiktoken.get_encoding(encoding_name)
+
+
+def _iter_shard_lines(path: Path, start: int, end: Optional[int]) -> Iterator[bytes]:
+    with open_log_segment(path) as f:
+        if end is None:
+            # 圧縮セグメントは先頭（またはcheckpoint位置）から末尾まで1シャード
+            if start:
+                skip_to(f, path, start)
+            yield from f
+            return
+
+        if start:
+            # 直前の改行まで戻って行頭に揃える（start が行頭ならその行から）
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+
+def measure_shard(path: str, start: int, end: Optional[int], blob_dir: str) -> Dict[str, Any]:
+    """
+    Measure one byte range of a segment (runs in a worker process)
+
+    Args:
+        path: Segment path
+        start: First byte (decompressed offset for compressed segments)
+        end: End byte, or None to read to the end
+        blob_dir: Blob store directory
+
+    Returns:
+        {"entry_count", "phases": {phase: accumulator state}}
+    """
+    accumulators = {phase: accumulator() for phase, accumulator in PHASE_ACCUMULATORS.items()}
+    memo: Dict[bytes, int] = {}
+    entry_count = 0
+    batch: List[Any] = []
+
+    def flush() -> None:
+        # 未計測のメッセージをまとめて encode_batch
+        pending = {}
+        for _, _, text in batch:
+            if text is not None:
+                digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+                if digest not in memo:
+                    pending[digest] = text
+        if pending:
+            encoded = _worker_encoding.encode_batch(list(pending.values()), num_threads=1)
+            for digest, tokens in zip(pending, encoded):
+                memo[digest] = len(tokens)
+
+        for accumulator, entry, text in batch:
+            if text is None:
+                tokens = entry["message_summary"]["tokens"]
+            else:
+                tokens = memo[hashlib.blake2b(text.encode(), digest_size=16).digest()]
+            accumulator.add(entry, tokens)
+        batch.clear()
+        if len(memo) > 200_000:
+            memo.clear()
+
+    for line in _iter_shard_lines(Path(path), start, end):
+        if not line.strip():
+            continue
+        entry_count += 1
+        entry = json.loads(line)
+        accumulator = accumulators.get(entry.get("metadata", {}).get("phase"))
+        if accumulator is None:
+            continue
+
+        entry = resolve_message(entry, Path(blob_dir))
+        text = None if "message_summary" in entry else json.dumps(entry["message"])
+        batch.append((accumulator, entry, text))
+        if len(batch) >= SHARD_BATCH_ENTRIES:
+            flush()
+    flush()
+
+    return {
+        "entry_count": entry_count,
+        "phases": {phase: accumulator.state for phase, accumulator in accumulators.items()},
+    }
+
+
+def _measure_shard_task(task: List[Any]) -> Dict[str, Any]:
+    return measure_shard(*task)
+
+
 class TokenMeasurement:
     """
     Token measurement for MCP protocol messages
+
+    The log is analyzed in a single streaming pass: each entry is dispatched
+    to its phase accumulator and token counts are memoized by message hash.
+    With a checkpoint file, the next run resumes after the last byte read.
     """
 
-    def __init__(self, log_file: Path):
+    def __init__(self, log_file: Path, memo_size: int = 200_000):
         """
         Initialize measurement from protocol log
 
         Args:
             log_file: Path to protocol_messages.jsonl
+            memo_size: Token counts memoized by message hash (LRU)
         """
         self.log_file = log_file
         self.encoding = tiktoken.get_encoding("cl100k_base")
         self.measurements: List[Dict[str, Any]] = []
+        self.memo_size = memo_size
+        # --workers: smallest byte range worth a separate task
+        self.min_shard_bytes = 1024 * 1024
+        self._token_memo: "OrderedDict[bytes, int]" = OrderedDict()
 
     def count_tokens(self, text: str) -> int:
         """
-        Count tokens using tiktoken
+        Count tokens using tiktoken (memoized by content hash)
 
         Args:
             text: Text to count
@@ -40,7 +472,17 @@ class TokenMeasurement:
         Returns:
             Token count
         """
-        return len(self.encoding.encode(text))
+        digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        tokens = self._token_memo.get(digest)
+        if tokens is not None:
+            self._token_memo.move_to_end(digest)
+            return tokens
+
+        tokens = len(self.encoding.encode(text))
+        self._token_memo[digest] = tokens
+        if len(self._token_memo) > self.memo_size:
+            self._token_memo.popitem(last=False)
+        return tokens
 
     def count_message_tokens(self, message: Dict[str, Any]) -> int:
         """
@@ -55,19 +497,165 @@ class TokenMeasurement:
         message_str = json.dumps(message)
         return self.count_tokens(message_str)
 
+    def count_entry_tokens(self, entry: Dict[str, Any]) -> int:
+        """
+        Count tokens of a log entry's message
+
+        Truncated entries (PROTOCOL_LOG_TRUNCATE_BYTES) carry no payload; the
+        token count recorded by the gateway is used instead.
+
+        Args:
+            entry: Log entry
+
+        Returns:
+            Token count
+        """
+        summary = entry.get("message_summary")
+        if summary is not None:
+            return summary["tokens"]
+        return self.count_message_tokens(entry["message"])
+
+    def _resume_plan(self, checkpoint: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Segments still to be read and the byte offset to start each at
+
+        Args:
+            checkpoint: Resume position from a previous run (None = from the start)
+
+        Returns:
+            [{"path", "fingerprint", "offset", "active"}] in chronological order
+        """
+        completed = set(checkpoint["completed_segments"]) if checkpoint else set()
+        partial = checkpoint.get("partial") if checkpoint else None
+        self._completed = completed
+
+        plan = []
+        for segment in log_segments(self.log_file):
+            if segment.name in completed:
+                continue
+
+            fingerprint = segment_fingerprint(segment)
+            offset = 0
+            if partial and partial["fingerprint"] == fingerprint:
+                # 前回途中まで読んだセグメント（その後ローテーション・圧縮されていてもよい）
+                offset = partial["offset"]
+                partial = None
+
+            plan.append({
+                "path": segment,
+                "fingerprint": fingerprint,
+                "offset": offset,
+                "active": segment == self.log_file,
+            })
+        return plan
+
+    def _finish_position(self, plan: List[Dict[str, Any]]) -> None:
+        # plan の各要素には読み終えた位置 "end" が入っている
+        completed = set(self._completed)
+        partial = None
+        for item in plan:
+            if item["active"]:
+                partial = {"fingerprint": item["fingerprint"], "offset": item["end"]}
+            else:
+                completed.add(item["path"].name)
+
+        # 削除済み（retention）のセグメント名は保持しない
+        existing = {segment.name for segment in log_segments(self.log_file)}
+        self.position = {"completed_segments": sorted(completed & existing), "partial": partial}
+
+    def iter_entries(self, checkpoint: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream log entries line by line (rotated/compressed segments included)
+
+        Args:
+            checkpoint: Resume position from a previous run (None = from the start)
+
+        Yields:
+            Log entries; the resume position is kept in self.position
+        """
+        blob_dir = self.log_file.parent / "blobs"
+        plan = self._resume_plan(checkpoint)
+
+        for item in plan:
+            offset = item["offset"]
+            with open_log_segment(item["path"]) as f:
+                if offset:
+                    skip_to(f, item["path"], offset)
+                for line in f:
+                    if item["active"] and not line.endswith(b"\n"):
+                        # 書き込み途中の行は次回に読む
+                        break
+                    offset += len(line)
+                    if line.strip():
+                        yield resolve_message(json.loads(line), blob_dir)
+            item["end"] = offset
+
+        self._finish_position(plan)
+
+    def measure_parallel(
+        self,
+        checkpoint: Optional[Dict[str, Any]],
+        workers: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Measure the remaining log in worker processes
+
+        Plain segments are split into byte ranges (about 4 per worker for load
+        balancing); compressed segments are one shard each. Shard results come
+        back in log order, so merging them gives the same totals as a
+        sequential run.
+
+        Args:
+            checkpoint: Resume position from a previous run (None = from the start)
+            workers: Worker processes
+
+        Returns:
+            Shard results in log order
+        """
+        blob_dir = str(self.log_file.parent / "blobs")
+        plan = self._resume_plan(checkpoint)
+
+        tasks = []
+        for item in plan:
+            path = item["path"]
+            if path.suffix in (".gz", ".zst"):
+                tasks.append([str(path), item["offset"], None, blob_dir])
+                item["end"] = None
+                continue
+
+            # active segment は書き込み途中の行を含めない
+            end = complete_size(path) if item["active"] else path.stat().st_size
+            item["end"] = max(end, item["offset"])
+            for start, stop in split_byte_ranges(
+                item["offset"], end, workers * 4, self.min_shard_bytes
+            ):
+                tasks.append([str(path), start, stop, blob_dir])
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.encoding.name,),
+        ) as pool:
+            results = list(pool.map(_measure_shard_task, tasks))
+
+        self._finish_position(plan)
+        return results
+
     def parse_log_file(self) -> List[Dict[str, Any]]:
         """
-        Parse protocol log file
+        Parse protocol log file (rotated/compressed segments included)
 
         Returns:
             List of log entries
         """
-        entries = []
-        with self.log_file.open("r") as f:
-            for line in f:
-                if line.strip():
-                    entries.append(json.loads(line))
-        return entries
+        return list(self.iter_entries())
+
+    def _measure_phase(self, phase: str, entries: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        accumulator = PHASE_ACCUMULATORS[phase]()
+        for e in entries:
+            if e.get("metadata", {}).get("phase") == phase:
+                accumulator.add(e, self.count_entry_tokens(e))
+        return accumulator.result()
 
     def measure_initialize_phase(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -79,25 +667,7 @@ class TokenMeasurement:
         Returns:
             Measurement data
         """
-        initialize_entries = [
-            e for e in entries
-            if e.get("metadata", {}).get("phase") == "initialize"
-        ]
-
-        if not initialize_entries:
-            return {"phase": "initialize", "tokens": 0, "count": 0}
-
-        total_tokens = sum(
-            self.count_message_tokens(e["message"])
-            for e in initialize_entries
-        )
-
-        return {
-            "phase": "initialize",
-            "tokens": total_tokens,
-            "count": len(initialize_entries),
-            "messages": [e["message"].get("method") for e in initialize_entries]
-        }
+        return self._measure_phase("initialize", entries)
 
     def measure_tools_list_phase(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -109,43 +679,7 @@ class TokenMeasurement:
         Returns:
             Measurement data
         """
-        tools_list_entries = [
-            e for e in entries
-            if e.get("metadata", {}).get("phase") == "tools_list"
-        ]
-
-        if not tools_list_entries:
-            return {"phase": "tools_list", "tokens": 0, "count": 0}
-
-        # Count request and response separately
-        request_entries = [e for e in tools_list_entries if e["direction"] == "client→server"]
-        response_entries = [e for e in tools_list_entries if e["direction"] == "server→client"]
-
-        request_tokens = sum(
-            self.count_message_tokens(e["message"])
-            for e in request_entries
-        )
-
-        response_tokens = sum(
-            self.count_message_tokens(e["message"])
-            for e in response_entries
-        )
-
-        # Analyze tool count
-        tool_count = 0
-        if response_entries:
-            last_response = response_entries[-1]["message"]
-            if "result" in last_response and "tools" in last_response["result"]:
-                tool_count = len(last_response["result"]["tools"])
-
-        return {
-            "phase": "tools_list",
-            "request_tokens": request_tokens,
-            "response_tokens": response_tokens,
-            "total_tokens": request_tokens + response_tokens,
-            "count": len(tools_list_entries),
-            "tool_count": tool_count
-        }
+        return self._measure_phase("tools_list", entries)
 
     def measure_expand_schema_phase(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -157,57 +691,53 @@ class TokenMeasurement:
         Returns:
             Measurement data
         """
-        expand_entries = [
-            e for e in entries
-            if e.get("metadata", {}).get("phase") == "expand_schema"
-        ]
-
-        if not expand_entries:
-            return {"phase": "expand_schema", "tokens": 0, "count": 0, "calls": []}
-
-        # Group by tool_name
-        calls_by_tool: Dict[str, List[Dict]] = {}
-        for e in expand_entries:
-            tool_name = e.get("metadata", {}).get("tool_name", "unknown")
-            if tool_name not in calls_by_tool:
-                calls_by_tool[tool_name] = []
-            calls_by_tool[tool_name].append(e)
-
-        calls = []
-        total_tokens = 0
-
-        for tool_name, tool_entries in calls_by_tool.items():
-            call_tokens = sum(
-                self.count_message_tokens(e["message"])
-                for e in tool_entries
-            )
-            total_tokens += call_tokens
-
-            calls.append({
-                "tool_name": tool_name,
-                "tokens": call_tokens,
-                "call_count": len(tool_entries) // 2  # request + response
-            })
-
-        return {
-            "phase": "expand_schema",
-            "total_tokens": total_tokens,
-            "count": len(expand_entries),
-            "calls": calls
-        }
+        return self._measure_phase("expand_schema", entries)
 
-    def measure_all(self) -> Dict[str, Any]:
+    def measure_all(self, checkpoint_file: Optional[Path] = None, workers: int = 1) -> Dict[str, Any]:
         """
-        Measure all phases
+        Measure all phases in a single streaming pass
+
+        Args:
+            checkpoint_file: Resume from / save progress to this file (incremental runs)
+            workers: Worker processes; > 1 shards the log by byte range (see measure_parallel)
 
         Returns:
-            Complete measurement data
+            Complete measurement data (totals include previous runs when resuming)
         """
-        entries = self.parse_log_file()
+        checkpoint = load_checkpoint(checkpoint_file) if checkpoint_file else None
+        phase_states = checkpoint["phases"] if checkpoint else {}
+        accumulators = {
+            phase: accumulator(phase_states.get(phase))
+            for phase, accumulator in PHASE_ACCUMULATORS.items()
+        }
+        entry_count = checkpoint["entry_count"] if checkpoint else 0
+        new_entries = 0
+
+        if workers > 1:
+            for shard in self.measure_parallel(checkpoint, workers):
+                new_entries += shard["entry_count"]
+                for phase, state in shard["phases"].items():
+                    accumulators[phase].merge(state)
+        else:
+            for entry in self.iter_entries(checkpoint):
+                new_entries += 1
+                accumulator = accumulators.get(entry.get("metadata", {}).get("phase"))
+                if accumulator is not None:
+                    accumulator.add(entry, self.count_entry_tokens(entry))
+        entry_count += new_entries
+
+        if checkpoint_file:
+            save_checkpoint(checkpoint_file, {
+                "version": CHECKPOINT_VERSION,
+                "log_file": str(self.log_file),
+                "entry_count": entry_count,
+                **self.position,
+                "phases": {phase: accumulator.state for phase, accumulator in accumulators.items()},
+            })
 
-        initialize = self.measure_initialize_phase(entries)
-        tools_list = self.measure_tools_list_phase(entries)
-        expand_schema = self.measure_expand_schema_phase(entries)
+        initialize = accumulators["initialize"].result()
+        tools_list = accumulators["tools_list"].result()
+        expand_schema = accumulators["expand_schema"].result()
 
         total_tokens = (
             initialize.get("tokens", 0) +
@@ -218,7 +748,9 @@ class TokenMeasurement:
         return {
             "timestamp": datetime.now().isoformat(),
             "log_file": str(self.log_file),
-            "entry_count": len(entries),
+            "entry_count": entry_count,
+            "new_entries": new_entries,
+            "resumed": checkpoint is not None,
             "phases": {
                 "initialize": initialize,
                 "tools_list": tools_list,
@@ -227,14 +759,21 @@ class TokenMeasurement:
             "total_tokens": total_tokens
         }
 
-    def save_measurement(self, output_file: Path):
+    def save_measurement(
+        self,
+        output_file: Path,
+        checkpoint_file: Optional[Path] = None,
+        workers: int = 1
+    ):
         """
         Save measurement to file
 
         Args:
             output_file: Output file path
+            checkpoint_file: Checkpoint for incremental runs (optional)
+            workers: Worker processes for tokenization
         """
-        measurement = self.measure_all()
+        measurement = self.measure_all(checkpoint_file, workers)
 
         output_file.parent.mkdir(parents=True, exist_ok=True)
         with output_file.open("w") as f:
@@ -283,7 +822,7 @@ def generate_report(measurement: Dict[str, Any]) -> str:
 ### 1. Initialize Phase
 - **Tokens**: {init.get("tokens", 0):,}
 - **Messages**: {init.get("count", 0)}
-- **Methods**: {", ".join(init.get("messages", []))}
+- **Methods**: {", ".join(str(method) for method in init.get("messages", []) if method)}
 
 ### 2. tools/list Phase
 - **Request Tokens**: {tools_list.get("request_tokens", 0):,}
@@ -310,17 +849,40 @@ def generate_report(measurement: Dict[str, Any]) -> str:
     return report
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Command line options (defaults match the docker-compose measurement service)
+    """
+    parser = argparse.ArgumentParser(description="Measure token reduction from the MCP protocol log")
+    parser.add_argument("--log-file", type=Path, default=Path("apps/api/logs/protocol_messages.jsonl"))
+    parser.add_argument("--output", type=Path, default=Path("metrics/token_measurement.json"))
+    parser.add_argument("--report", type=Path, default=Path("docs/research/token_measurement_report.md"))
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="Resume from and save progress to this file (incremental runs)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Tokenize byte-range shards of the log in N processes",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
     """
     Main execution
     """
-    # Default paths
-    log_file = Path("apps/api/logs/protocol_messages.jsonl")
-    output_file = Path("metrics/token_measurement.json")
-    report_file = Path("docs/research/token_measurement_report.md")
+    args = parse_args(argv)
+    log_file = args.log_file
+    output_file = args.output
+    report_file = args.report
 
-    # Check if log file exists
-    if not log_file.exists():
+    # Check if log file (or rotated segments) exists
+    if not log_segments(log_file):
         print(f"❌ Error: Log file not found: {log_file}")
         print("\nPlease ensure:")
         print("1. Gateway is running: make up")
@@ -331,7 +893,9 @@ def main():
     # Measure
     print(f"📊 Measuring tokens from: {log_file}")
     measurer = TokenMeasurement(log_file)
-    measurement = measurer.save_measurement(output_file)
+    measurement = measurer.save_measurement(output_file, args.checkpoint, args.workers)
+    if measurement["resumed"]:
+        print(f"⏩ Resumed from checkpoint: {measurement['new_entries']} new entries")
 
     # Generate report
     report = generate_report(measurement)